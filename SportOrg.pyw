@@ -1,5 +1,9 @@
 #!/usr/bin/env python3
+from multiprocessing import freeze_support
+
 from sportorg.gui.main import Application
 
 if __name__ == '__main__':
+    # worker processes of the frozen application
+    freeze_support()
     Application().run()
@@ -1,4 +1,6 @@
 class Model(object):
+    __slots__ = ()
+
     @classmethod
     def create(cls, **kwargs):
         o = cls()
@@ -20,3 +22,29 @@ class Model(object):
     def __setitem__(self, key, val):
         if hasattr(self, key):
             setattr(self, key, val)
+
+
+class SlotsModel(Model):
+    """Model keeping its attributes in `__slots__` instead of an instance dict.
+
+    Used for small objects created in large numbers (splits, course controls).
+    Pickled as a dict of attributes, so it reads pickles of the dict-based class.
+    """
+
+    __slots__ = ()
+
+    def get_slots(self):
+        for cls in type(self).__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                yield name
+
+    def __getstate__(self):
+        return {
+            name: getattr(self, name)
+            for name in self.get_slots()
+            if hasattr(self, name)
+        }
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
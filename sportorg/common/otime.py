@@ -1,74 +1,133 @@
 import datetime
 from math import trunc
 
+DAY_MSEC = 86400000
+
+# divisor of msec for every time accuracy (quantity of digits after second)
+_ACCURACY_DIVISORS = (1000, 100, 10, 1)
+
 
 class OTime:
+    """Time of day or duration with millisecond accuracy, immutable.
+
+    The value is one int of milliseconds, so comparison, hashing and arithmetic
+    are done on ints. Negative values are wrapped by one day.
+    """
+
+    __slots__ = ('_msec',)
+
+    ZERO = None  # type: OTime
+    DAY = None  # type: OTime
+
     def __init__(self, day=0, hour=0, minute=0, sec=0, msec=0):
-        self._msec = self.get_msec(day, hour, minute, sec, msec)
-        self._args = None
+        value = day * 86400000 + hour * 3600000 + minute * 60000 + sec * 1000 + msec
+        if value < 0:
+            value += DAY_MSEC
+        _set_msec(self, value)
+
+    @classmethod
+    def from_msec(cls, msec):
+        """Fast constructor, same as `OTime(msec=msec)`"""
+        obj = cls.__new__(cls)
+        if msec < 0:
+            msec += DAY_MSEC
+        _set_msec(obj, msec)
+        return obj
+
+    def __setattr__(self, name, value):
+        raise AttributeError('OTime is immutable')
+
+    def __getstate__(self):
+        return {'_msec': self._msec}
+
+    def __setstate__(self, state):
+        _set_msec(self, state['_msec'])
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     @property
     def day(self):
-        return self.args[0]
+        return self._msec // DAY_MSEC
 
     @property
     def hour(self):
-        return self.args[1]
+        return self._msec % DAY_MSEC // 3600000
 
     @property
     def minute(self):
-        return self.args[2]
+        return self._msec % 3600000 // 60000
 
     @property
     def sec(self):
-        return self.args[3]
+        return self._msec % 60000 // 1000
 
     @property
     def msec(self):
-        return self.args[4]
+        return self._msec % 1000
 
     @property
     def args(self):
-        if self._args is None:
-            day = self._msec // 86400000
-            hour = (self._msec % 86400000) // 3600000
-            minute = ((self._msec % 86400000) % 3600000) // 60000
-            sec = (((self._msec % 86400000) % 3600000) % 60000) // 1000
-            msec = (((self._msec % 86400000) % 3600000) % 60000) % 1000
-
-            self._args = day, hour, minute, sec, msec
+        day, rest = divmod(self._msec, DAY_MSEC)
+        hour, rest = divmod(rest, 3600000)
+        minute, rest = divmod(rest, 60000)
+        sec, msec = divmod(rest, 1000)
+        return day, hour, minute, sec, msec
 
-        return self._args
+    def __hash__(self):
+        return hash(self._msec)
 
     def __eq__(self, other):
+        if other.__class__ is OTime:
+            return self._msec == other._msec
         if not other:
             return False
-        return self.to_msec() == other.to_msec()
+        return self._msec == other.to_msec()
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
 
     def __gt__(self, other):
+        if other.__class__ is OTime:
+            return self._msec > other._msec
         if not other:
             return True
-        return self.to_msec() > other.to_msec()
+        return self._msec > other.to_msec()
 
     def __ge__(self, other):
+        if other.__class__ is OTime:
+            return self._msec >= other._msec
         if not other:
             return False
-        return self.to_msec() >= other.to_msec()
+        return self._msec >= other.to_msec()
+
+    def __lt__(self, other):
+        if other.__class__ is OTime:
+            return self._msec < other._msec
+        return NotImplemented
+
+    def __le__(self, other):
+        if other.__class__ is OTime:
+            return self._msec <= other._msec
+        return NotImplemented
 
     def __add__(self, other):
-        return OTime(msec=(self.to_msec() + other.to_msec()))
+        return OTime.from_msec(self._msec + other._msec)
 
     def __sub__(self, other):
-        return OTime(msec=(self.to_msec() - other.to_msec()))
+        return OTime.from_msec(self._msec - other._msec)
 
     def __mul__(self, mlt):
-        return OTime(msec=int(self.to_msec() * mlt))
+        return OTime.from_msec(int(self._msec * mlt))
 
     def __truediv__(self, div):
-        return OTime(msec=int(self.to_msec() / div))
+        return OTime.from_msec(int(self._msec / div))
 
     def __int__(self):
-        return self.to_msec()
+        return self._msec
 
     def __str__(self):
         return self.to_str()
@@ -79,40 +138,45 @@ class OTime:
     @classmethod
     def now(cls):
         now = datetime.datetime.now()
-        return OTime(0, now.hour, now.minute, now.second, round(now.microsecond / 1000))
+        return cls.from_msec(
+            (now.hour * 3600 + now.minute * 60 + now.second) * 1000
+            + now.microsecond // 1000
+        )
 
     def replace(self, day=None, hour=None, minute=None, sec=None, msec=None):
+        args = self.args
         return OTime(
-            self.if_none(day, self.day),
-            self.if_none(hour, self.hour),
-            self.if_none(minute, self.minute),
-            self.if_none(sec, self.sec),
-            self.if_none(msec, self.msec),
+            self.if_none(day, args[0]),
+            self.if_none(hour, args[1]),
+            self.if_none(minute, args[2]),
+            self.if_none(sec, args[3]),
+            self.if_none(msec, args[4]),
         )
 
     def copy(self):
-        return OTime(msec=self.to_msec())
+        return self
 
     def to_minute(self):
-        return trunc(self.to_msec() / (1000 * 60))
+        return trunc(self._msec / (1000 * 60))
 
     def to_sec(self):
-        return trunc(self.to_msec() / 1000)
+        return trunc(self._msec / 1000)
 
     def to_msec(self, sub_sec=3):
-        if not 0 <= sub_sec <= 3:
-            sub_sec = 3
-        mlt = 10 ** (3 - sub_sec)
+        if sub_sec == 3 or not 0 <= sub_sec <= 3:
+            return self._msec
+        mlt = _ACCURACY_DIVISORS[sub_sec]
         return self._msec // mlt * mlt
 
     def to_time(self):
         return datetime.time(self.hour, self.minute, self.sec, self.msec * 1000)
 
     def to_minute_str(self):
-        minute = int(self.to_msec() / (1000 * 60))
+        minute = int(self._msec / (1000 * 60))
+        sec = self.sec
         return '{}:{}'.format(
             minute if minute > 9 else '0' + str(minute),
-            self.sec if self.sec > 9 else '0' + str(self.sec),
+            sec if sec > 9 else '0' + str(sec),
         )
 
     @staticmethod
@@ -129,17 +193,24 @@ class OTime:
         return default if val is None else val
 
     def to_str(self, time_accuracy=0):
-        hour = self.hour + self.day * 24
+        day, hour, minute, sec, msec = self.args
         if time_accuracy == 0:
+            hour += day * 24
             return '{}:{}:{}'.format(
                 hour if hour > 9 else '0' + str(hour),
-                self.minute if self.minute > 9 else '0' + str(self.minute),
-                self.sec if self.sec > 9 else '0' + str(self.sec),
+                minute if minute > 9 else '0' + str(minute),
+                sec if sec > 9 else '0' + str(sec),
             )
         else:
             return '{}:{}:{}.{}'.format(
-                ('0' + str(self.hour))[-2:],
-                ('0' + str(self.minute))[-2:],
-                ('0' + str(self.sec))[-2:],
-                ('00' + str(self.msec))[-3:][:time_accuracy],
+                ('0' + str(hour))[-2:],
+                ('0' + str(minute))[-2:],
+                ('0' + str(sec))[-2:],
+                ('00' + str(msec))[-3:][:time_accuracy],
             )
+
+
+_set_msec = OTime._msec.__set__
+
+OTime.ZERO = OTime()
+OTime.DAY = OTime(1)
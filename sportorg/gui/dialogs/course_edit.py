@@ -98,6 +98,7 @@ class CourseEditDialog(BaseDialog):
         if self.is_new:
             obj.courses.insert(0, self.current_object)
         ResultChecker.check_all()
-        ResultCalculation(obj).process_results()
-        RaceSplits(obj).generate()
-        ScoreCalculation(obj).calculate_scores()
+        rc = ResultCalculation(obj)
+        rc.process_results()
+        RaceSplits(obj, rc).generate()
+        ScoreCalculation(obj, rc).calculate_scores()
@@ -158,6 +158,7 @@ class CPDeleteDialog(QDialog):
 
         obj.clear_results()
         ResultChecker.check_all()
-        ResultCalculation(obj).process_results()
-        RaceSplits(obj).generate()
-        ScoreCalculation(obj).calculate_scores()
+        rc = ResultCalculation(obj)
+        rc.process_results()
+        RaceSplits(obj, rc).generate()
+        ScoreCalculation(obj, rc).calculate_scores()
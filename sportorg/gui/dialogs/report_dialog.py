@@ -22,6 +22,7 @@ from sportorg.gui.utils.custom_controls import AdvComboBox
 from sportorg.language import translate
 from sportorg.models.constant import RentCards
 from sportorg.models.memory import get_current_race_index, race, races
+from sportorg.models.result.can_win_calculation import CanWinCalculation
 from sportorg.models.result.result_calculation import ResultCalculation
 from sportorg.models.result.score_calculation import ScoreCalculation
 from sportorg.models.result.split_calculation import RaceSplits
@@ -140,9 +141,11 @@ class ReportDialog(QDialog):
             for i in mw.get_selected_rows():
                 selected_items[map_names[mw.current_tab]].append(cur_items[i].to_dict())
 
-        ResultCalculation(obj).process_results()
-        RaceSplits(obj).generate()
-        ScoreCalculation(obj).calculate_scores()
+        rc = ResultCalculation(obj)
+        rc.process_results()
+        RaceSplits(obj, rc).generate()
+        ScoreCalculation(obj, rc).calculate_scores()
+        CanWinCalculation(obj, rc).calculate()
 
         races_dict = [r.to_dict() for r in races()]
 
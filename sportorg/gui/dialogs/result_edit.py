@@ -299,7 +299,7 @@ class ResultEditDialog(QDialog):
                 ResultChecker.checking(result)
                 ResultChecker.calculate_penalty(result)
                 if result.person and result.person.group:
-                    GroupSplits(race(), result.person.group).generate(True)
+                    GroupSplits.get(race(), result.person.group, logged=True)
             except ResultCheckerException as e:
                 logging.error(str(e))
         ResultCalculation(race()).process_results()
@@ -54,6 +54,29 @@ class MainTab(Tab):
         self.item_auto_save.setValue(Config().configuration.get('autosave_interval'))
         self.layout.addRow(translate('Auto save') + ' (sec)', self.item_auto_save)
 
+        self.item_auto_save_generations = QSpinBox()
+        self.item_auto_save_generations.setMinimum(1)
+        self.item_auto_save_generations.setMaximum(100)
+        self.item_auto_save_generations.setValue(
+            Config().configuration.get('autosave_generations', 3)
+        )
+        self.layout.addRow(
+            translate('Auto save copies'), self.item_auto_save_generations
+        )
+
+        self.item_recheck_workers = QSpinBox()
+        self.item_recheck_workers.setMaximum(64)
+        self.item_recheck_workers.setValue(
+            Config().configuration.get('recheck_workers', 0)
+        )
+        self.layout.addRow(translate('Recheck workers'), self.item_recheck_workers)
+
+        self.item_save_journal = QCheckBox(translate('Save changes to journal'))
+        self.item_save_journal.setChecked(
+            Config().configuration.get('save_journal', False)
+        )
+        self.layout.addRow(self.item_save_journal)
+
         self.item_open_recent_file = QCheckBox(translate('Open recent file'))
         self.item_open_recent_file.setChecked(
             Config().configuration.get('open_recent_file')
@@ -73,6 +96,11 @@ class MainTab(Tab):
     def save(self):
         Config().configuration.set('current_locale', self.item_lang.currentText())
         Config().configuration.set('autosave_interval', self.item_auto_save.value())
+        Config().configuration.set(
+            'autosave_generations', self.item_auto_save_generations.value()
+        )
+        Config().configuration.set('recheck_workers', self.item_recheck_workers.value())
+        Config().configuration.set('save_journal', self.item_save_journal.isChecked())
         Config().configuration.set(
             'open_recent_file', self.item_open_recent_file.isChecked()
         )
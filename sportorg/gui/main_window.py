@@ -33,8 +33,11 @@ from sportorg.models.memory import (
     race,
     set_current_race_index,
 )
+from sportorg.models.result.can_win_calculation import CanWinCalculation
 from sportorg.models.result.result_calculation import ResultCalculation
 from sportorg.models.result.split_calculation import GroupSplits
+from sportorg.modules.backup import journal
+from sportorg.modules.backup.autosave import Autosave
 from sportorg.modules.backup.file import File
 from sportorg.modules.configs.configs import Config as Configuration
 from sportorg.modules.configs.configs import ConfigFile
@@ -82,6 +85,9 @@ class MainWindow(QMainWindow):
         logging.root.addHandler(handler)
         self.last_update = time.time()
         self.relay_number_assign = False
+        self.can_win_timer = None
+        self.autosave = Autosave()
+        self.autosave_timer = None
 
     def _set_style(self):
         try:
@@ -105,6 +111,8 @@ class MainWindow(QMainWindow):
 
     def close(self):
         self.conf_write()
+        self.autosave.wait()
+        journal.wait_all()
         Broker().produce('close')
 
     def closeEvent(self, _event):
@@ -161,6 +169,52 @@ class MainWindow(QMainWindow):
         LiveClient().init()
         self._menu_disable(self.current_tab)
 
+        self.can_win_timer = QtCore.QTimer(self)
+        self.can_win_timer.timeout.connect(self.update_who_can_win)
+        self.can_win_timer.start(60 * 1000)
+
+        self.autosave_timer = QtCore.QTimer(self)
+        self.autosave_timer.timeout.connect(self.autosave_tick)
+        self.autosave_timer.start(1000)
+
+    def update_who_can_win(self):
+        try:
+            CanWinCalculation(race()).calculate()
+        except Exception as e:
+            logging.error(str(e))
+
+    def autosave_tick(self):
+        if self.autosave.is_running():
+            return
+        result = self.autosave.pop_result()
+        if result is not None:
+            if result.error:
+                self.statusbar_message(
+                    '{}: {}'.format(translate('Auto save failed'), result.error)
+                )
+            else:
+                self.statusbar_message(
+                    '{}: {} ({} KB, {:.2f} s)'.format(
+                        translate('Auto saved'),
+                        result.file_name,
+                        round(result.size / 1024),
+                        result.duration,
+                    )
+                )
+        interval = Configuration().configuration.get('autosave_interval', 0)
+        if not interval or not self.file:
+            return
+        if time.time() - self.last_update < interval:
+            return
+        try:
+            self.autosave.generations = Configuration().configuration.get(
+                'autosave_generations', 3
+            )
+            self.autosave.start(self.file)
+            self.last_update = time.time()
+        except Exception as e:
+            logging.error(str(e))
+
     def _setup_ui(self):
         geometry = ConfigFile.GEOMETRY
         x = Configuration().parser.getint(geometry, 'x', fallback=480)
@@ -422,7 +476,12 @@ class MainWindow(QMainWindow):
                 rg = ResultSportidentGeneration(result)
                 if rg.add_result():
                     result = rg.get_result()
-                    ResultCalculation(race()).process_results()
+                    rc = ResultCalculation(race())
+                    rc.process_changed_results([result])
+                    if result.person and result.person.group:
+                        CanWinCalculation(race(), rc).calculate_group(
+                            result.person.group
+                        )
                     if race().get_setting('split_printout', False):
                         try:
                             split_printout(result)
@@ -433,7 +492,7 @@ class MainWindow(QMainWindow):
                         except Exception as e:
                             logging.error(str(e))
                     elif result.person and result.person.group:
-                        GroupSplits(race(), result.person.group).generate(True)
+                        GroupSplits.get(race(), result.person.group, rc, logged=True)
                     TelegramClient().send_result(result)
                     if result.person:
                         if result.is_status_ok():
@@ -500,7 +559,10 @@ class MainWindow(QMainWindow):
     def create_file(self, *args, update_data=True):
         file_name = get_save_file_name(
             translate('Create SportOrg file'),
-            translate('SportOrg file (*.json)'),
+            '{};;{}'.format(
+                translate('SportOrg file (*.json)'),
+                translate('SportOrg binary file (*.sportorg)'),
+            ),
             time.strftime('%Y%m%d'),
         )
         if not file_name:
@@ -509,7 +571,7 @@ class MainWindow(QMainWindow):
                     new_event([Race()])
                     set_current_race_index(0)
                 self.clear_filters(remove_condition=False)
-                File(file_name, logging.root, File.JSON).create()
+                File(file_name, logging.root, File.get_format(file_name)).create()
                 self.apply_filters()
                 self.last_update = time.time()
                 self.file = file_name
@@ -532,7 +594,12 @@ class MainWindow(QMainWindow):
         if self.file:
             try:
                 self.clear_filters(remove_condition=False)
-                File(self.file, logging.root, File.JSON).save()
+                file_format = File.get_format(self.file)
+                if file_format == File.JSON and Configuration().configuration.get(
+                    'save_journal', False
+                ):
+                    file_format = File.JOURNAL
+                File(self.file, logging.root, file_format).save()
                 self.apply_filters()
                 self.last_update = time.time()
             except Exception as e:
@@ -543,7 +610,7 @@ class MainWindow(QMainWindow):
     def open_file(self, file_name=None):
         if file_name:
             try:
-                File(file_name, logging.root, File.JSON).open()
+                File(file_name, logging.root, File.get_format(file_name)).open()
                 self.file = file_name
                 self.set_title()
                 self.add_recent_file(self.file)
@@ -2,7 +2,12 @@ import logging
 from typing import Any
 
 from PySide2 import QtCore
-from PySide2.QtWidgets import QApplication, QMessageBox
+from PySide2.QtWidgets import (
+    QApplication,
+    QMessageBox,
+    QProgressBar,
+    QProgressDialog,
+)
 
 from sportorg import config
 from sportorg.common.otime import OTime
@@ -36,7 +41,9 @@ from sportorg.gui.menu.action import Action
 from sportorg.gui.utils.custom_controls import messageBoxQuestion
 from sportorg.language import translate
 from sportorg.libs.winorient.wdb import write_wdb
+from sportorg.models.duplicates import DuplicateAudit
 from sportorg.models.memory import ResultManual, ResultStatus, find, race
+from sportorg.models.result.fingerprint import calculate_race
 from sportorg.models.result.result_calculation import ResultCalculation
 from sportorg.models.result.result_checker import ResultChecker
 from sportorg.models.start.start_preparation import (
@@ -79,7 +86,8 @@ class SaveAction(Action, metaclass=ActionFactory):
 class OpenAction(Action, metaclass=ActionFactory):
     def execute(self):
         file_name = get_open_file_name(
-            translate('Open SportOrg file'), translate('SportOrg file (*.json)')
+            translate('Open SportOrg file'),
+            translate('SportOrg file (*.json *.sportorg)'),
         )
         self.app.open_file(file_name)
 
@@ -396,6 +404,35 @@ class CopyCardNumberToBib(Action, metaclass=ActionFactory):
             self.app.refresh()
 
 
+class DuplicateAuditAction(Action, metaclass=ActionFactory):
+    def execute(self):
+        titles = {
+            DuplicateAudit.CARD_NUMBER: translate('Duplicate card numbers'),
+            DuplicateAudit.NAME: translate('Duplicate names'),
+            DuplicateAudit.BIB: translate('Duplicate bibs'),
+            DuplicateAudit.NAME_YEAR: translate('Duplicate names and years'),
+        }
+        count = 0
+        for kind, groups in race().get_duplicate_audit().run().items():
+            if not groups:
+                continue
+            logging.info(titles[kind])
+            for group in groups:
+                count += 1
+                for person in group.persons:
+                    logging.info(
+                        '{} {} {} {} {} {}'.format(
+                            person.bib,
+                            person.full_name,
+                            person.get_year(),
+                            person.group.name if person.group else '',
+                            person.organization.name if person.organization else '',
+                            person.card_number,
+                        )
+                    )
+        logging.info('{}: {}'.format(translate('Duplicates audit'), count))
+
+
 class ManualFinishAction(Action, metaclass=ActionFactory):
     def execute(self):
         result = race().new_result(ResultManual)
@@ -429,10 +466,48 @@ class SplitPrintoutAction(Action, metaclass=ActionFactory):
         self.app.split_printout_selected()
 
 
+def _recheck_progress(parent):
+    """Modal dialog of the recheck progress, :return dialog, progress(checked, total)
+
+    The dialog is repainted directly, events are not processed until the recheck
+    is over, so neither input nor readouts change the race in the middle of it.
+    """
+    bar = QProgressBar()
+    dialog = QProgressDialog(parent)
+    dialog.setWindowTitle(translate('Rechecking'))
+    dialog.setLabelText(translate('Rechecking'))
+    dialog.setBar(bar)
+    dialog.setCancelButton(None)
+    dialog.setWindowModality(QtCore.Qt.ApplicationModal)
+    dialog.show()
+    QApplication.processEvents(QtCore.QEventLoop.ExcludeUserInputEvents)
+
+    def progress(checked, total):
+        bar.setMaximum(total)
+        bar.setValue(checked)
+        dialog.repaint()
+
+    return dialog, progress
+
+
 class RecheckingAction(Action, metaclass=ActionFactory):
     def execute(self):
-        ResultChecker.check_all()
-        ResultCalculation(race()).process_results()
+        dialog, progress = _recheck_progress(self.app)
+        try:
+            ResultChecker.check_all(progress=progress)
+            ResultCalculation(race()).process_results()
+        finally:
+            dialog.close()
+        self.app.refresh()
+
+
+class RecalculateAction(Action, metaclass=ActionFactory):
+    def execute(self):
+        dialog, progress = _recheck_progress(self.app)
+        try:
+            calculate_race(race(), progress)
+        finally:
+            dialog.close()
         self.app.refresh()
 
 
@@ -448,20 +523,17 @@ class GroupFinderAction(Action, metaclass=ActionFactory):
                 break
             result = results[index]
             if result.person and result.status in [ResultStatus.MISSING_PUNCH]:
-                for group in obj.groups:
-                    if result.check(group.course):
-                        result.person.group = group
-                        result.status = ResultStatus.OK
-                        break
+                group = obj.find_group_by_punches(result)
+                if group:
+                    result.person.group = group
+                    result.status = ResultStatus.OK
         self.app.refresh()
 
 
 class PenaltyCalculationAction(Action, metaclass=ActionFactory):
     def execute(self):
         logging.debug('Penalty calculation start')
-        for result in race().results:
-            if result.person:
-                ResultChecker.calculate_penalty(result)
+        ResultChecker.calculate_penalty_all(race())
         logging.debug('Penalty calculation finish')
         ResultCalculation(race()).process_results()
         self.app.refresh()
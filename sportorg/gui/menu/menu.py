@@ -202,6 +202,10 @@ def menu_list():
                     'title': translate('Use card number as bib'),
                     'action': 'CopyCardNumberToBib',
                 },
+                {
+                    'title': translate('Duplicates audit'),
+                    'action': 'DuplicateAuditAction',
+                },
             ],
         },
         {
@@ -239,6 +243,10 @@ def menu_list():
                     'shortcut': 'Ctrl+R',
                     'action': 'RecheckingAction',
                 },
+                {
+                    'title': translate('Recalculate results'),
+                    'action': 'RecalculateAction',
+                },
                 {
                     'title': translate('Find group by punches'),
                     'tabs': [1],
@@ -9,7 +9,7 @@ from PySide2.QtCore import QAbstractTableModel, Qt
 
 from sportorg.language import translate
 from sportorg.models.constant import RentCards
-from sportorg.models.memory import race
+from sportorg.models.memory import ResultSortKey, race
 from sportorg.utils.time import time_to_hhmmss
 
 
@@ -182,13 +182,17 @@ class AbstractSportOrgMemoryModel(QAbstractTableModel):
 
         self.search_offset = -1
 
-    def sort(self, p_int, order=None):
-        """Sort table by given column number."""
-
+    def get_sort_key(self, p_int):
         def sort_key(x):
             item = self.get_item(x, p_int)
             return item is None, str(type(item)), item
 
+        return sort_key
+
+    def sort(self, p_int, order=None):
+        """Sort table by given column number."""
+        sort_key = self.get_sort_key(p_int)
+
         try:
             self.layoutAboutToBeChanged.emit()
 
@@ -402,6 +406,12 @@ class ResultMemoryModel(AbstractSportOrgMemoryModel):
             rented_card,
         ]
 
+    def get_sort_key(self, p_int):
+        if p_int == 8:
+            # result column, sort as in result list
+            return ResultSortKey(self.race)
+        return super().get_sort_key(p_int)
+
     def get_source_array(self):
         return self.race.results
 
@@ -10,6 +10,7 @@ from sportorg.gui.tabs.memory_model import ResultMemoryModel
 from sportorg.gui.tabs.table import TableView
 from sportorg.language import translate
 from sportorg.models.memory import race
+from sportorg.models.result.split_calculation import GroupSplits
 from sportorg.utils.time import time_to_hhmmss
 
 
@@ -171,6 +172,10 @@ class Widget(QtWidgets.QWidget):
         if result.is_manual():
             return
 
+        if result.person and result.person.group:
+            # legs are not generated on open if results are loaded by fingerprint
+            GroupSplits.get(race(), result.person.group)
+
         course = None
         if result.person:
             course = race().find_course(result)
@@ -327,6 +327,7 @@ class RankingTable(object):
     """
 
     RANKING = []
+    COLUMNS = {}  # qualification -> [(rank, percent)], extracted in `set`
     column_mapping = {
         Qualification.I: 1,
         Qualification.II: 2,
@@ -343,13 +344,18 @@ class RankingTable(object):
 
     def get_qual_table(self, qual):
         # get only 2 columns from whole table, corresponding to specified qualification
-        try:
-            columns = [0, self.column_mapping[qual]]
-            my_items = operator.itemgetter(*columns)
-            return [my_items(x) for x in self.RANKING]
-        except Exception as e:
-            # logging.exception(e)
+        if qual not in self.column_mapping:
             return [[0, 0]]
+        return self.COLUMNS.get(qual, [])
+
+    def set_columns(self):
+        self.COLUMNS = {}
+        for qual, column in self.column_mapping.items():
+            try:
+                my_items = operator.itemgetter(0, column)
+                self.COLUMNS[qual] = [my_items(x) for x in self.RANKING]
+            except Exception:
+                self.COLUMNS[qual] = [[0, 0]]
 
     def set(self, items):
         self.RANKING = []
@@ -361,3 +367,4 @@ class RankingTable(object):
                 else:
                     row.append(0)
             self.RANKING.append(row)
+        self.set_columns()
@@ -0,0 +1,98 @@
+import unicodedata
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def normalize_name(value):
+    """Case and whitespace insensitive form of a name, ё is read as е"""
+    if not value:
+        return ''
+    value = unicodedata.normalize('NFC', str(value)).casefold().replace('ё', 'е')
+    return ' '.join(value.split())
+
+
+class DuplicateGroup(object):
+    """Persons sharing the same key of one audit kind"""
+
+    def __init__(self, kind, key, persons):
+        self.kind = kind  # type: str
+        self.key = key  # type: Any
+        self.persons = persons  # type: List[Any]
+
+    def __repr__(self):
+        return '{} {!r}: {}'.format(self.kind, self.key, len(self.persons))
+
+    def __len__(self):
+        return len(self.persons)
+
+
+class DuplicateAudit(object):
+    """Group persons by keys that should be unique in an event.
+
+    Each kind is one pass over the persons with a dict of buckets, so the audit
+    is linear in the number of persons. Persons with an empty key are skipped.
+    Groups and persons inside a group keep the order of the person list.
+    """
+
+    CARD_NUMBER = 'card_number'
+    NAME = 'name'
+    BIB = 'bib'
+    NAME_YEAR = 'name_year'
+
+    kinds = (CARD_NUMBER, NAME, BIB, NAME_YEAR)
+
+    def __init__(self, persons):
+        self.persons = persons
+        self._groups = {}  # type: Dict[str, List[DuplicateGroup]]
+
+    @staticmethod
+    def _name_year_key(person):
+        name = normalize_name(person.full_name)
+        if not name:
+            return None
+        return name, person.get_year()
+
+    def get_key_func(self, kind):
+        # type: (str) -> Callable[[Any], Optional[Any]]
+        if kind == self.CARD_NUMBER:
+            return lambda person: person.card_number or None
+        if kind == self.NAME:
+            return lambda person: normalize_name(person.full_name) or None
+        if kind == self.BIB:
+            return lambda person: person.bib or None
+        if kind == self.NAME_YEAR:
+            return self._name_year_key
+        raise ValueError('Unknown duplicate kind: {}'.format(kind))
+
+    def get_groups(self, kind):
+        # type: (str) -> List[DuplicateGroup]
+        if kind in self._groups:
+            return self._groups[kind]
+        key_func = self.get_key_func(kind)
+        buckets = {}  # type: Dict[Any, List[Any]]
+        for person in self.persons:
+            key = key_func(person)
+            if key is None:
+                continue
+            if key in buckets:
+                buckets[key].append(person)
+            else:
+                buckets[key] = [person]
+        groups = [
+            DuplicateGroup(kind, key, persons)
+            for key, persons in buckets.items()
+            if len(persons) > 1
+        ]
+        self._groups[kind] = groups
+        return groups
+
+    def get_persons(self, kind):
+        """:return persons having a duplicate of the kind, in person list order"""
+        duplicates = set()
+        for group in self.get_groups(kind):
+            for person in group.persons:
+                duplicates.add(id(person))
+        return [person for person in self.persons if id(person) in duplicates]
+
+    def run(self, kinds=None):
+        # type: (Optional[Tuple[str, ...]]) -> Dict[str, List[DuplicateGroup]]
+        return {kind: self.get_groups(kind) for kind in kinds or self.kinds}
@@ -0,0 +1,361 @@
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+_registry = {}  # type: Dict[int, Tuple[Any, str]]
+
+
+def _prune(ref):
+    """Drop the lists of a collected race index from the registry"""
+    for key in [key for key, entry in _registry.items() if entry[0] is ref]:
+        del _registry[key]
+
+
+class Indexed(object):
+    """Mixin for objects stored in race collections.
+
+    The link to the owning race index is kept out of pickles and copies.
+    """
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_index', None)
+        state.pop('_changed', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def get_index_group(self):
+        """:return group the results of which depend on the object, if any"""
+        return None
+
+    def touch(self):
+        """Report a change not made by assignment of a field, e.g. of punches"""
+        index = self.__dict__.get('_index')
+        if index is not None:
+            index.touch(self)
+
+
+class IndexedField(object):
+    """Attribute reported to the race index holding the object on assignment.
+
+    Only `__set__` is defined, so reading the attribute is a plain instance
+    dict lookup.
+    """
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __set__(self, instance, value):
+        instance_dict = instance.__dict__
+        old = instance_dict.get(self.name)
+        instance_dict[self.name] = value
+        index = instance_dict.get('_index')
+        if index is not None:
+            index.changed(instance, self.name, old, value)
+
+
+class TrackedField(IndexedField):
+    """Attribute the results are calculated from, not indexed.
+
+    Assignment of another value is counted by the race index holding the
+    object, see `RaceIndex.touch`.
+    """
+
+    def __set__(self, instance, value):
+        instance_dict = instance.__dict__
+        old = instance_dict.get(self.name, value)
+        instance_dict[self.name] = value
+        if old is not value and old != value:
+            index = instance_dict.get('_index')
+            if index is not None:
+                index.touch(instance)
+
+
+class SavedField(IndexedField):
+    """Attribute saved with the object, the results are not calculated from it.
+
+    Assignment of another value is stamped by the race index holding the
+    object, see `RaceIndex.stamp`.
+    """
+
+    def __set__(self, instance, value):
+        instance_dict = instance.__dict__
+        old = instance_dict.get(self.name, value)
+        instance_dict[self.name] = value
+        if old is not value and old != value:
+            index = instance_dict.get('_index')
+            if index is not None:
+                index.stamp(instance)
+
+
+class IndexedCollection(object):
+    """Race attribute holding a list of objects, attached to the race index"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return instance.__dict__[self.name]
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.name] = value
+        instance.index.attach(self.name, value)
+
+
+class RaceIndex(object):
+    """Maintained secondary indexes over the collections of one race.
+
+    Every collection is indexed by the fields declared in `fields`.
+    Buckets keep the order of the underlying list, so a lookup returns the same
+    objects in the same order as a linear scan would.
+    The index is built lazily on first lookup and rebuilt whenever the list has
+    been changed behind its back (replaced, inserted or deleted directly).
+    `version` is increased on every change reported to the index, the version
+    of the last change is also kept for the group of the changed object.
+    `changes` also counts assignments of saved fields, the changed object is
+    stamped with it, so the objects changed since a save are found without
+    serialising the others.
+    """
+
+    fields = {
+        'persons': ('id', 'bib', 'card_number', 'group', 'organization'),
+        'results': ('id', 'person'),
+        'groups': ('id',),
+        'courses': ('id',),
+        'organizations': ('id',),
+        'relay_teams': ('bib_number', 'group'),
+    }
+
+    # collections the changes of which are counted by group
+    tracked = ('persons', 'results')
+
+    def __init__(self, r):
+        self._race = weakref.ref(r)
+        self._ref = weakref.ref(self, _prune)
+        self._attached = {}  # type: Dict[str, int]
+        self._maps = {}  # type: Dict[str, Dict[str, Dict[Any, List[Any]]]]
+        self._unordered = {}  # type: Dict[str, Dict[str, set]]
+        self._members = {}  # type: Dict[str, Dict[int, Any]]
+        self._positions = {}  # type: Dict[str, Optional[Dict[int, int]]]
+        self._stamps = {}  # type: Dict[str, Optional[tuple]]
+        self.version = 0
+        self.changes = 0
+        self._changes = {}  # type: Dict[int, int]
+        for name in self.fields:
+            self._stamps[name] = None
+
+    def collection(self, name):
+        return getattr(self._race(), name, None)
+
+    def attach(self, name, array):
+        old = self._attached.get(name)
+        if old is not None and old in _registry and _registry[old][0]() is self:
+            del _registry[old]
+        self._attached[name] = id(array)
+        _registry[id(array)] = (self._ref, name)
+        self.invalidate(name)
+        self.version += 1
+
+    def invalidate(self, name=None):
+        names = [name] if name else list(self.fields)
+        for item in names:
+            self._stamps[item] = None
+
+    @staticmethod
+    def _key(field, value):
+        if field == 'id':
+            return str(value)
+        return value
+
+    @staticmethod
+    def _stamp(array):
+        if not array:
+            return id(array), 0
+        return id(array), len(array), id(array[0]), id(array[-1])
+
+    def _is_synced(self, name):
+        return self._stamps[name] == self._stamp(self.collection(name))
+
+    def _build(self, name):
+        array = self.collection(name)
+        members = {}
+        maps = {}
+        for field in self.fields[name]:
+            maps[field] = {}
+        for obj in array:
+            members[id(obj)] = obj
+            obj.__dict__['_index'] = self
+            for field, buckets in maps.items():
+                key = self._key(field, obj.__dict__.get(field))
+                if key in buckets:
+                    buckets[key].append(obj)
+                else:
+                    buckets[key] = [obj]
+        self._maps[name] = maps
+        self._members[name] = members
+        self._unordered[name] = {field: set() for field in maps}
+        self._positions[name] = None
+        self._stamps[name] = self._stamp(array)
+
+    def ensure(self, name):
+        if not self._is_synced(name):
+            self._build(name)
+
+    def _position(self, name):
+        positions = self._positions[name]
+        if positions is None:
+            positions = {id(obj): i for i, obj in enumerate(self.collection(name))}
+            self._positions[name] = positions
+        return positions
+
+    def bucket(self, name, field, value):
+        """:return objects of collection `name` having `field` == `value`
+
+        Objects are in the order of the list.
+        """
+        self.ensure(name)
+        key = self._key(field, value)
+        bucket = self._maps[name][field].get(key)
+        if not bucket:
+            return []
+        unordered = self._unordered[name][field]
+        if key in unordered:
+            unordered.discard(key)
+            positions = self._position(name)
+            bucket.sort(key=lambda obj: positions.get(id(obj), -1))
+        return bucket
+
+    def first(self, name, field, value):
+        bucket = self.bucket(name, field, value)
+        if bucket:
+            return bucket[0]
+        return None
+
+    def insert(self, name, obj, first=True):
+        """Add object to the collection (at the start by default) and index it"""
+        synced = self._is_synced(name)
+        array = self.collection(name)
+        self.touch(obj)
+        if first:
+            array.insert(0, obj)
+        else:
+            array.append(obj)
+        if not synced:
+            return
+        self._members[name][id(obj)] = obj
+        obj.__dict__['_index'] = self
+        for field, buckets in self._maps[name].items():
+            key = self._key(field, obj.__dict__.get(field))
+            bucket = buckets.setdefault(key, [])
+            if first:
+                bucket.insert(0, obj)
+            else:
+                bucket.append(obj)
+        self._positions[name] = None
+        self._stamps[name] = self._stamp(array)
+
+    def delete(self, name, position):
+        """Delete object at `position` from the collection and from the index"""
+        synced = self._is_synced(name)
+        array = self.collection(name)
+        obj = array[position]
+        self.touch(obj)
+        del array[position]
+        if not synced:
+            return obj
+        del self._members[name][id(obj)]
+        for field, buckets in self._maps[name].items():
+            self._discard(buckets, self._key(field, obj.__dict__.get(field)), obj)
+        self._positions[name] = None
+        self._stamps[name] = self._stamp(array)
+        return obj
+
+    @staticmethod
+    def _discard(buckets, key, obj):
+        bucket = buckets.get(key)
+        if not bucket:
+            return
+        for i, item in enumerate(bucket):
+            if item is obj:
+                del bucket[i]
+                break
+        if not bucket:
+            del buckets[key]
+
+    def touch(self, obj):
+        """Count a change of the object and of its group"""
+        self.version += 1
+        self._mark(obj)
+        self.stamp(obj)
+
+    def stamp(self, obj):
+        """Count a change of the object, not of the results"""
+        self.changes += 1
+        obj.__dict__['_changed'] = self.changes
+
+    @staticmethod
+    def get_stamp(obj):
+        """:return value of `changes` at the last change of the object"""
+        return obj.__dict__.get('_changed', 0)
+
+    def _mark(self, obj):
+        if isinstance(obj, Indexed):
+            group = obj.get_index_group()
+            if group is not None:
+                self._changes[id(group)] = self.version
+
+    def last_change(self, group):
+        """:return version of the last change of the group, its persons or results
+
+        Objects added to the lists directly are indexed first, so their changes
+        are counted from now on.
+        """
+        for name in self.tracked:
+            self.ensure(name)
+        return self._changes.get(id(group), 0)
+
+    def changed(self, obj, field, old, new):
+        """Move object to the new bucket after assignment of an indexed field"""
+        if old is not new:
+            self.touch(obj)
+            # e.g. the old group of a person or the old person of a result
+            self._mark(old)
+        for name, members in self._members.items():
+            if members.get(id(obj)) is obj:
+                break
+        else:
+            return
+        if field not in self.fields[name] or self._stamps[name] is None:
+            return
+        buckets = self._maps[name][field]
+        old_key = self._key(field, old)
+        new_key = self._key(field, new)
+        if old_key == new_key:
+            return
+        self._discard(buckets, old_key, obj)
+        bucket = buckets.setdefault(new_key, [])
+        bucket.append(obj)
+        if len(bucket) > 1:
+            self._unordered[name][field].add(new_key)
+
+
+def lookup(iterable, kwargs):
+    """:return candidates from the race index for `find`, None if list is not indexed"""
+    entry = _registry.get(id(iterable))
+    if entry is None:
+        return None
+    index, name = entry[0](), entry[1]
+    if index is None or index.collection(name) is not iterable:
+        return None
+    fields = index.fields[name]
+    for key, value in kwargs.items():
+        if key in fields:
+            try:
+                return index.bucket(name, key, value)
+            except TypeError:
+                # unhashable value
+                continue
+    return None
@@ -1,17 +1,32 @@
 import datetime
+import json
+import logging
 import re
 import time
 import uuid
 from abc import abstractmethod
+from array import array
+from collections import Counter
+from collections.abc import MutableSequence
 from datetime import date
 from enum import Enum, IntEnum
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
 import dateutil.parser
 
-from sportorg.common.model import Model
+from sportorg.common.model import Model, SlotsModel
 from sportorg.common.otime import OTime
 from sportorg.language import translate
+from sportorg.models.duplicates import DuplicateAudit
+from sportorg.models.index import (
+    Indexed,
+    IndexedCollection,
+    IndexedField,
+    RaceIndex,
+    SavedField,
+    TrackedField,
+    lookup,
+)
 from sportorg.modules.configs.configs import Config
 from sportorg.utils.time import hhmmss_to_time
 
@@ -96,7 +111,9 @@ class ResultStatus(_TitleType):
     RESTORED = 16
 
 
-class Organization(Model):
+class Organization(Model, Indexed):
+    id = IndexedField()
+
     def __init__(self):
         self.id = uuid.uuid4()
         self.name = ''
@@ -132,7 +149,9 @@ class Organization(Model):
         self.contact = str(data['contact']) if 'contact' in data else ''
 
 
-class CourseControl(Model):
+class CourseControl(SlotsModel):
+    __slots__ = ('code', 'length', 'order')
+
     def __init__(self):
         self.code = ''
         self.length = 0
@@ -183,6 +202,204 @@ class CourseControl(Model):
         self.length = int(data['length'])
 
 
+class CompiledControl(object):
+    """Course control template parsed once for course checking"""
+
+    # ranges wider than this are kept as ranges instead of expanding to codes
+    max_expanded_range = 1024
+
+    def __init__(self, code):
+        template = str(code)
+        self.code = code
+        self.is_any = template.find('%') > -1  # non-unique control
+        self.has_star = template.find('*') > -1
+        self.is_unique = not self.is_any and self.has_star
+        self.correct_code = template.split('(')[0].strip()
+        self.has_list = False
+        self.list_error = False
+        self.list_codes = frozenset()
+        self.list_ranges = ()
+
+        ind_begin = template.find('(')
+        ind_end = template.find(')')
+        if ind_begin > 0 and ind_end > 0:
+            # any control from the list e.g. '%(31,32,35-45)'
+            self.has_list = True
+            codes = set()
+            ranges = []
+            try:
+                for cp in re.split(r'\s*,\s*', template[ind_begin + 1 : ind_end]):
+                    cp_range = re.split(r'\s*-\s*', cp)
+                    first = int(cp_range[0])
+                    codes.add(first)
+                    if len(cp_range) > 1:
+                        last = int(cp_range[-1])
+                        if last - first > self.max_expanded_range:
+                            ranges.append((first, last))
+                        else:
+                            codes.update(range(first + 1, last + 1))
+            except ValueError:
+                self.list_error = True
+            self.list_codes = frozenset(codes)
+            self.list_ranges = tuple(ranges)
+
+    def list_contains(self, code):
+        value = int(code)
+        if self.list_error:
+            raise ValueError('Incorrect control list {}'.format(self.code))
+        if value in self.list_codes:
+            return True
+        for first, last in self.list_ranges:
+            if first < value <= last:
+                return True
+        return False
+
+
+class CourseMatcher(object):
+    """Compiled controls of the course, rebuilt when the control codes change"""
+
+    def __init__(self, codes):
+        self.codes = codes
+        self.controls = [CompiledControl(code) for code in codes]
+
+
+class CourseIndex(object):
+    """Inverted index control code -> courses, used to guess the course by punches.
+
+    Only fixed controls are required codes, controls with '%', '*' or a list
+    of codes don't restrict the candidates.
+    """
+
+    def __init__(self, courses):
+        self.courses = list(courses)
+        self.matchers = [course.get_matcher() for course in self.courses]
+        self.required = []  # type: List[Counter]
+        self.by_code = {}  # type: Dict[str, List[tuple]]
+        for i, matcher in enumerate(self.matchers):
+            required = Counter(
+                control.code
+                for control in matcher.controls
+                if not control.is_any and not control.has_star and not control.has_list
+            )
+            self.required.append(required)
+            for code, count in required.items():
+                self.by_code.setdefault(code, []).append((i, count))
+
+    def is_actual(self, courses):
+        if len(courses) != len(self.courses):
+            return False
+        for i, course in enumerate(courses):
+            if course is not self.courses[i]:
+                return False
+            if course.get_matcher() is not self.matchers[i]:
+                return False
+        return True
+
+    def get_candidates(self, result, courses=None):
+        """Courses having all required codes on the card, longest first"""
+        card = Counter(str(split.code) for split in result.splits)
+        hits = Counter()
+        for code, count in card.items():
+            for i, required_count in self.by_code.get(code, ()):
+                if count >= required_count:
+                    hits[i] += 1
+
+        allowed = None
+        if courses is not None:
+            allowed = {id(course) for course in courses}
+        ret = []
+        for i, course in enumerate(self.courses):
+            if hits[i] != len(self.required[i]):
+                continue
+            if allowed is not None and id(course) not in allowed:
+                continue
+            ret.append((-len(self.matchers[i].controls), i))
+        ret.sort()
+        return [self.courses[i] for _, i in ret]
+
+    def find(self, result, courses=None):
+        """Best matching course: the course covering most of the card punches"""
+        for course in self.get_candidates(result, courses):
+            if result.check(course):
+                return course
+        return None
+
+
+def check_codes(controls, codes):
+    """Check punched codes against compiled course controls
+
+    :param controls: `CourseMatcher.controls` of the course
+    :param codes: punched codes, str
+    :return (passed, flags), flags: bytearray, bit 1 - is_correct, bit 2 - has_penalty
+    """
+    count_controls = len(controls)
+    if count_controls == 0:
+        return True, bytearray([1]) * len(codes)
+
+    # all codes are incorrect before check
+    flags = bytearray([2]) * len(codes)
+    course_index = 0
+
+    # codes matched to free order controls '*', used for uniqueness
+    free_order_codes = set()
+
+    for i, cur_code in enumerate(codes):
+        control = controls[course_index]
+        list_contains = control.has_list and control.list_contains(cur_code)
+        flag = 2
+
+        if control.is_any:
+            # non-unique control
+            if not control.has_list or list_contains:
+                # any control '%' or '%(31,32,33)' or '31%'
+                flag = 1
+
+        elif control.is_unique:
+            # unique control '*' or '*(31,32,33)' or '31*'
+            if control.has_list and not list_contains:
+                # not in list
+                continue
+            if cur_code not in free_order_codes:
+                flag = 1
+
+        elif control.has_list:
+            # control with optional codes '31(31,32,33) 989'
+            if list_contains:
+                flag = 1 if cur_code == control.correct_code else 3
+
+        elif str(cur_code) == control.code:
+            # just cp '31 989'
+            flag = 1
+
+        if flag & 1:
+            flags[i] = flag
+            course_index += 1
+            if control.has_star:
+                free_order_codes.add(cur_code)
+
+        if course_index == count_controls:
+            return True, flags
+
+    return False, flags
+
+
+def check_splits(controls, splits):
+    """Check splits against compiled course controls, set `is_correct` and `has_penalty`
+
+    :param controls: `CourseMatcher.controls` of the course
+    :param splits: objects with `code`, `is_correct`, `has_penalty`, `course_index`
+    :return True if the course is passed
+    """
+    if not controls:
+        return True
+    passed, flags = check_codes(controls, [i.code for i in splits])
+    for split, flag in zip(splits, flags):
+        split.is_correct = bool(flag & 1)
+        split.has_penalty = bool(flag & 2)
+        split.course_index = -1
+    return passed
+
+
 class ControlPoint(Model):
     """Description of independent control point. Used for score calculation in rogain"""
 
@@ -195,7 +412,9 @@ class ControlPoint(Model):
         self.altitude = 0.0
 
 
-class Course(Model):
+class Course(Model, Indexed):
+    id = IndexedField()
+
     def __init__(self):
         self.id = uuid.uuid4()
         self.name = ''
@@ -207,10 +426,17 @@ class Course(Model):
         self.count_person = 0
         self.count_group = 0
         self.corridor = 0
+        self._matcher = None  # type: CourseMatcher
 
     def __repr__(self):
         return 'Course {}'.format(self.name)
 
+    def get_matcher(self):
+        codes = tuple(control.code for control in self.controls)
+        if self._matcher is None or self._matcher.codes != codes:
+            self._matcher = CourseMatcher(codes)
+        return self._matcher
+
     def __eq__(self, other):
         if len(self.controls) != len(other.controls):
             return False
@@ -259,7 +485,12 @@ class Course(Model):
             self.controls.append(control)
 
 
-class Group(Model):
+class Group(Model, Indexed):
+    id = IndexedField()
+
+    def get_index_group(self):
+        return self
+
     def __init__(self):
         self.id = uuid.uuid4()
         self.name = ''
@@ -275,8 +506,8 @@ class Group(Model):
         self.min_age = 0
         self.max_age = 0
 
-        self.max_time = OTime()
-        self.start_interval = OTime()
+        self.max_time = OTime.ZERO
+        self.start_interval = OTime.ZERO
         self.start_corridor = 0
         self.order_in_corridor = 0
 
@@ -364,23 +595,45 @@ class Group(Model):
             self.is_any_course = bool(data['is_any_course'])
         if data['__type']:
             self.__type = RaceType(int(data['__type']))
+        if 'count_person' in data:
+            self.count_person = int(data['count_person'])
+        if 'count_finished' in data:
+            self.count_finished = int(data['count_finished'])
+
+
+class Split(SlotsModel):
+    __slots__ = (
+        'index',
+        'course_index',
+        'code',
+        'days',
+        '_time',
+        'leg_time',
+        'relative_time',
+        'leg_place',
+        'relative_place',
+        'is_correct',
+        'has_penalty',
+        'speed',
+        'length_leg',
+        'leader_time',
+    )
 
-
-class Split(Model):
     def __init__(self):
         self.index = 0
         self.course_index = -1
         self.code = ''
         self.days = 0
-        self._time = OTime()  # type: OTime
-        self.leg_time = OTime()  # type: OTime
-        self.relative_time = OTime()  # type: OTime
+        self._time = OTime.ZERO  # type: OTime
+        self.leg_time = OTime.ZERO  # type: OTime
+        self.relative_time = OTime.ZERO  # type: OTime
         self.leg_place = 0
         self.relative_place = 0
         self.is_correct = True
         self.has_penalty = False
         self.speed = ''
         self.length_leg = 0
+        self.leader_time = None  # type: OTime
 
     @property
     def time(self):
@@ -389,7 +642,7 @@ class Split(Model):
     @time.setter
     def time(self, value):
         if value is None:
-            value = OTime()
+            value = OTime.ZERO
         self._time = value
 
     def __eq__(self, other):
@@ -424,9 +677,372 @@ class Split(Model):
             self._time = OTime(msec=data['time'])
         if 'days' in data:
             self.days = int(data['days'])
+        if 'is_correct' in data:
+            self.is_correct = bool(data['is_correct'])
+        if has_legs(data):
+            # derived fields are used when the file has a valid fingerprint
+            legs = get_legs(data)
+            self.index = legs[0]
+            self.course_index = legs[1]
+            self.leg_time = OTime.from_msec(legs[2])
+            self.relative_time = OTime.from_msec(legs[3])
+            self.leg_place = legs[4]
+            self.relative_place = legs[5]
+            self.length_leg = legs[6]
+            self.speed = str(data.get('speed') or '')
+
+
+# derived fields of a split and type codes of their columns in `Punches`
+LEG_FIELDS = (
+    ('index', 'i'),
+    ('course_index', 'i'),
+    ('leg_time', 'q'),
+    ('relative_time', 'q'),
+    ('leg_place', 'i'),
+    ('relative_place', 'i'),
+    ('length_leg', 'i'),
+)
+
+
+def has_legs(data):
+    """:return True if `Split.to_dict` value has derived fields set"""
+    return any(data.get(name) for name, _ in LEG_FIELDS) or bool(data.get('speed'))
+
+
+def get_legs(data):
+    """:return derived fields of `Split.to_dict` value in the order of LEG_FIELDS"""
+    ret = [int(data.get(name) or 0) for name, _ in LEG_FIELDS]
+    # stored as index + 1
+    ret[1] -= 1
+    return ret
+
+
+_code_strings = {}  # type: Dict[int, str]
+
+
+def code_to_int(code):
+    """:return int value of a punch code, -1 if the code is not a plain number"""
+    if isinstance(code, int):
+        return code if 0 <= code < 2**31 else -1
+    if isinstance(code, str) and code.isdigit():
+        try:
+            value = int(code)
+        except ValueError:
+            return -1
+        if value < 2**31 and code == code_to_str(value):
+            return value
+    return -1
+
+
+def code_to_str(code):
+    ret = _code_strings.get(code)
+    if ret is None:
+        ret = str(code)
+        if len(_code_strings) < 10000:
+            _code_strings[code] = ret
+    return ret
+
+
+def get_split_codes(splits):
+    """:return list of codes of splits, read from the columns for `Punches`"""
+    if isinstance(splits, Punches):
+        return splits.get_codes()
+    return [i.code for i in splits]
+
+
+class Punches(MutableSequence):
+    """Punches of a card kept in parallel integer columns, used as a list of splits.
+
+    The columns are code, time in msec, days and check flags (bit 1 - is_correct,
+    bit 2 - has_penalty). `Split` objects are made on first access by index or
+    iteration and are kept while the punch is stored. Made splits are the
+    source of truth. The columns are refreshed from them before being read, so
+    a split changed in place is seen by `get_codes` and `get_times`. A code
+    that is not a plain number stays in its split.
+
+    The check, penalty, scoring and saving read the columns. Split generation
+    makes the splits of every result of the group, so the columns save memory
+    only for results of groups whose splits were not generated, e.g. after
+    open by fingerprint. Derived fields read from a file are kept in `legs`
+    until the punches are changed.
+    """
 
+    __slots__ = ('codes', 'times', 'days', 'checks', 'legs', '_splits')
+
+    def __init__(self, splits=None):
+        self.codes = array('i')
+        self.times = array('q')
+        self.days = array('i')
+        self.checks = bytearray()
+        # derived fields loaded from a file, columns of LEG_FIELDS and speeds
+        self.legs = None  # type: Optional[List[Any]]
+        self._splits = None  # type: Optional[List[Optional[Split]]]
+        if splits:
+            self.extend(splits)
+
+    @classmethod
+    def from_columns(cls, codes, times, days, checks):
+        """Punches from ready columns, codes must be plain numbers"""
+        ret = cls()
+        ret.codes = codes
+        ret.times = times
+        ret.days = days
+        ret.checks = checks
+        return ret
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __repr__(self):
+        return 'Punches({})'.format(list(self))
+
+    def __eq__(self, other):
+        if isinstance(other, Punches):
+            return (
+                self.get_codes() == other.get_codes()
+                and self.get_times() == other.get_times()
+            )
+        if isinstance(other, (list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def _split(self, i):
+        splits = self._splits
+        if splits is None:
+            splits = self._splits = [None] * len(self.codes)
+        split = splits[i]
+        if split is None:
+            split = Split()
+            split.code = code_to_str(self.codes[i])
+            split._time = OTime.from_msec(self.times[i])
+            split.days = self.days[i]
+            split.is_correct = bool(self.checks[i] & 1)
+            split.has_penalty = bool(self.checks[i] & 2)
+            if self.legs is not None:
+                self._set_legs(split, i)
+            splits[i] = split
+        return split
+
+    def _set_legs(self, split, i):
+        legs = self.legs
+        split.index = legs[0][i]
+        split.course_index = legs[1][i]
+        split.leg_time = OTime.from_msec(legs[2][i])
+        split.relative_time = OTime.from_msec(legs[3][i])
+        split.leg_place = legs[4][i]
+        split.relative_place = legs[5][i]
+        split.length_leg = legs[6][i]
+        split.speed = legs[7][i]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._split(i) for i in range(len(self.codes))[index]]
+        if index < 0:
+            index += len(self.codes)
+        if not 0 <= index < len(self.codes):
+            raise IndexError('punch index out of range')
+        return self._split(index)
+
+    def __iter__(self):
+        for i in range(len(self.codes)):
+            yield self._split(i)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            splits = list(self)
+            splits[index] = value
+            self.clear()
+            self.extend(splits)
+            return
+        if index < 0:
+            index += len(self.codes)
+        if self[index] is not value:
+            self._splits[index] = value
+            self._set_row(index, value)
+            self.legs = None
+
+    def __delitem__(self, index):
+        if isinstance(index, int) and not -len(self.codes) <= index < len(self.codes):
+            raise IndexError('punch index out of range')
+        del self.codes[index]
+        del self.times[index]
+        del self.days[index]
+        del self.checks[index]
+        if self._splits is not None:
+            del self._splits[index]
+        self.legs = None
+
+    def insert(self, index, value):
+        count = len(self.codes)
+        if index < 0:
+            index = max(0, index + count)
+        index = min(index, count)
+        self.codes.insert(index, 0)
+        self.times.insert(index, 0)
+        self.days.insert(index, 0)
+        self.checks.insert(index, 1)
+        if self._splits is None:
+            self._splits = [None] * count
+        self._splits.insert(index, value)
+        self._set_row(index, value)
+        self.legs = None
+
+    def clear(self):
+        self.codes = array('i')
+        self.times = array('q')
+        self.days = array('i')
+        self.checks = bytearray()
+        self.legs = None
+        self._splits = None
+
+    def _set_row(self, i, split):
+        self.codes[i] = code_to_int(split.code)
+        self.times[i] = split.time.to_msec() if split.time else 0
+        self.days[i] = split.days
+        self.checks[i] = int(split.is_correct) | int(split.has_penalty) << 1
+
+    def add_punch(self, code, msec, days=0):
+        """Append punch without making a split, `code` must be a plain number"""
+        value = code_to_int(code)
+        if value < 0:
+            split = Split()
+            split.code = str(code)
+            split.time = OTime(msec=msec)
+            split.days = days
+            self.append(split)
+            return
+        self.codes.append(value)
+        self.times.append(msec)
+        self.days.append(days)
+        self.checks.append(1)
+        if self._splits is not None:
+            self._splits.append(None)
+        self.legs = None
+
+    def sync(self):
+        """Refresh the columns from the made splits"""
+        if self._splits is None:
+            return
+        for i, split in enumerate(self._splits):
+            if split is not None:
+                self._set_row(i, split)
+
+    def get_codes(self):
+        """:return list of codes, str"""
+        self.sync()
+        codes = [code_to_str(i) for i in self.codes]
+        if self._splits is not None:
+            for i, code in enumerate(self.codes):
+                if code < 0:
+                    codes[i] = self._splits[i].code
+        return codes
+
+    def get_times(self):
+        """:return array of times in msec"""
+        self.sync()
+        return self.times
+
+    def get_time(self, index):
+        if self._splits is not None and self._splits[index] is not None:
+            return self._splits[index].time
+        return OTime.from_msec(self.times[index])
+
+    def set_checks(self, flags):
+        """Set check flags, see `check_codes`, `course_index` of splits is reset"""
+        self.checks[:] = flags
+        if self.legs is not None:
+            self.legs[1] = array('i', [-1]) * len(self.codes)
+        if self._splits is None:
+            return
+        for split, flag in zip(self._splits, flags):
+            if split is not None:
+                split.is_correct = bool(flag & 1)
+                split.has_penalty = bool(flag & 2)
+                split.course_index = -1
+
+    def check(self, controls):
+        """Same as `check_splits`, made on the columns"""
+        if not controls:
+            return True
+        passed, flags = check_codes(controls, self.get_codes())
+        self.set_checks(flags)
+        return passed
+
+    def to_dict(self):
+        """:return list of `Split.to_dict`, without making splits"""
+        self.sync()
+        legs = self.legs
+        ret = []
+        for i, code in enumerate(self.codes):
+            if self._splits is not None and self._splits[i] is not None:
+                ret.append(self._splits[i].to_dict())
+                continue
+            item = {
+                'object': 'Split',
+                'days': self.days[i],
+                'code': code_to_str(code),
+                'time': self.times[i],
+                'index': 0,
+                'course_index': 0,
+                'leg_time': 0,
+                'relative_time': 0,
+                'leg_place': 0,
+                'relative_place': 0,
+                'is_correct': bool(self.checks[i] & 1),
+                'speed': '',
+                'length_leg': 0,
+            }
+            if legs is not None:
+                for column, (name, _) in zip(legs, LEG_FIELDS):
+                    item[name] = column[i]
+                item['course_index'] += 1
+                item['speed'] = legs[7][i]
+            ret.append(item)
+        return ret
+
+    def update_data(self, data):
+        """Fill from list of `Split.to_dict`
+
+        Splits are made only for codes not numbers, derived fields of other
+        punches are kept in columns until the punches are changed.
+        """
+        self.clear()
+        for item in data:
+            code = str(item['code'])
+            if code_to_int(code) < 0:
+                split = Split()
+                split.update_data(item)
+                self.append(split)
+            else:
+                days = int(item['days']) if 'days' in item else 0
+                self.add_punch(code, int(item['time'] or 0), days)
+                if not item.get('is_correct', True):
+                    self.checks[-1] = 0
+        if any(has_legs(item) for item in data):
+            rows = [get_legs(item) for item in data]
+            self.legs = [
+                array(type_code, [row[i] for row in rows])
+                for i, (_, type_code) in enumerate(LEG_FIELDS)
+            ]
+            self.legs.append([str(item.get('speed') or '') for item in data])
+
+
+class Result(Indexed):
+    id = IndexedField()
+    person = IndexedField()
+    days = TrackedField()
+    bib = TrackedField()
+    start_time = TrackedField()
+    finish_time = TrackedField()
+    status = TrackedField()
+    penalty_time = TrackedField()
+    credit_time = TrackedField()
+    penalty_laps = TrackedField()
+    card_number = TrackedField()
+    splits = TrackedField()
+    status_comment = SavedField()
+    created_at = SavedField()
 
-class Result:
     def __init__(self):
         if type(self) == Result:
             raise Exception('<Result> is abstracted')
@@ -462,6 +1078,11 @@ class Result:
     def __repr__(self):
         return 'Result {} {}'.format(self.system_type, self.status)
 
+    def get_index_group(self):
+        if self.person:
+            return self.person.group
+        return None
+
     def __eq__(self, other):
         eq = self.system_type and other.system_type
 
@@ -521,7 +1142,11 @@ class Result:
             'penalty_laps': self.penalty_laps,
             'place': self.place,
             'assigned_rank': self.assigned_rank.value,
-            'splits': [split.to_dict() for split in self.splits],
+            'splits': (
+                self.splits.to_dict()
+                if isinstance(self.splits, Punches)
+                else [split.to_dict() for split in self.splits]
+            ),
             'card_number': self.card_number,
             'speed': self.speed,  # readonly
             'scores': self.scores,  # readonly
@@ -542,8 +1167,14 @@ class Result:
         self.status = ResultStatus(int(data['status']))
         self.penalty_laps = int(data['penalty_laps'])
         self.scores = data['scores']
-        if str(data['place']).isdigit():
+        if str(data['place']).lstrip('-').isdigit():
             self.place = int(data['place'])
+        if data.get('diff') is not None:
+            self.diff = OTime(msec=data['diff'])
+        if 'diff_scores' in data:
+            self.diff_scores = data['diff_scores']
+        if 'speed' in data:
+            self.speed = str(data['speed'])
         self.assigned_rank = Qualification.get_qual_by_code(data['assigned_rank'])
         if data['start_time']:
             self.start_time = OTime(msec=data['start_time'])
@@ -567,7 +1198,9 @@ class Result:
 
         if 'card_number' in data:
             self.card_number = int(data['card_number'])
-        if 'splits' in data:
+        if 'splits' in data and isinstance(self.splits, Punches):
+            self.splits.update_data(data['splits'])
+        elif 'splits' in data:
             self.splits = []
             for item in data['splits']:
                 split = Split()
@@ -614,7 +1247,7 @@ class Result:
 
         # time_accuracy = race().get_setting('time_accuracy', 0)
         start = hhmmss_to_time(self.person.comment)
-        if start == OTime():
+        if start == OTime.ZERO:
             raise ValueError
         ret += str(self.get_finish_time() - start)
         return ret
@@ -634,10 +1267,15 @@ class Result:
             and self.person.group
             and self.person.group.is_relay()
         ):
+            team = self.get_relay_team()
             cur_bib = self.person.bib - 1000
             while cur_bib > 1000:
-                prev_person = find(race().persons, bib=cur_bib)
-                res = race().find_person_result(prev_person)
+                if team:
+                    leg = team.get_leg(cur_bib // 1000)
+                    res = leg.get_result() if leg else None
+                else:
+                    prev_person = find(race().persons, bib=cur_bib)
+                    res = race().find_person_result(prev_person)
                 if res and not res.is_status_ok():
                     return res.status.get_title()
                 cur_bib -= 1000
@@ -661,7 +1299,7 @@ class Result:
         ) - self.get_start_time().to_msec(time_accuracy)
         ret_ms += self.get_penalty_time().to_msec(time_accuracy)
         ret_ms -= self.get_credit_time().to_msec(time_accuracy)
-        return OTime(msec=ret_ms)
+        return OTime.from_msec(ret_ms)
 
     def get_result_otime_relay(self):
         time_accuracy = race().get_setting('time_accuracy', 0)
@@ -670,14 +1308,27 @@ class Result:
         ) - self.get_start_time_relay().to_msec(time_accuracy)
         ret_ms += self.get_penalty_time().to_msec(time_accuracy)
         ret_ms -= self.get_credit_time().to_msec(time_accuracy)
-        return OTime(msec=ret_ms)
+        return OTime.from_msec(ret_ms)
 
     def get_start_time(self):
         if self.start_time and self.start_time.to_msec():
             return self.start_time
         if self.person and self.person.start_time and self.person.start_time.to_msec():
             return self.person.start_time
-        return OTime()
+        return OTime.ZERO
+
+    def get_relay_team(self):
+        """:return relay team of the result from the last calculation
+
+        None if the team is not found.
+        """
+        if self.person:
+            team = race().find_relay_team(self.person.bib % 1000)
+            if team:
+                leg = team.get_leg(self.person.bib // 1000)
+                if leg and leg.get_person() is self.person:
+                    return team
+        return None
 
     # Find the start time or relay team = start time of first leg
     def get_start_time_relay(self):
@@ -689,14 +1340,19 @@ class Result:
                 and self.person.group.is_relay()
             ):
                 bib_to_find = 1000 + self.person.bib % 1000
-                first_leg_person = find(race().persons, bib=bib_to_find)
+                team = self.get_relay_team()
+                first_leg = team.get_leg(1) if team else None
+                if first_leg and first_leg.get_person().bib == bib_to_find:
+                    first_leg_person = first_leg.get_person()
+                else:
+                    first_leg_person = find(race().persons, bib=bib_to_find)
             if first_leg_person:
                 if (
                     first_leg_person.start_time
                     and first_leg_person.start_time.to_msec()
                 ):
                     return first_leg_person.start_time
-        return OTime()
+        return OTime.ZERO
 
     def get_finish_time(self):
         if self.finish_time:
@@ -707,12 +1363,12 @@ class Result:
     def get_penalty_time(self):
         if self.penalty_time:
             return self.penalty_time
-        return OTime()
+        return OTime.ZERO
 
     def get_credit_time(self):
         if self.credit_time:
             return self.credit_time
-        return OTime()
+        return OTime.ZERO
 
     def get_place(self):
         """Returns text for place column in results"""
@@ -750,26 +1406,10 @@ class Result:
         """Generate statistic about unfinished athletes in the group for current person.
         Calculate, how much people can win and at what time current result will be final (nobody can win).
         """
-        if self.person and self.person.group:
-            who_can_win_count = 0
-            max_unfinished_start_time = OTime()
-
-            for cur_person in race().get_persons_by_group(self.person.group):
+        # imported here, the calculation depends on this module
+        from sportorg.models.result.can_win_calculation import CanWinCalculation
 
-                if cur_person.result_count == 0:
-                    if not cur_person.is_out_of_competition:
-                        if cur_person.start_time > self.person.start_time:
-                            if (
-                                self.get_result_otime()
-                                > OTime.now() - cur_person.start_time
-                            ):
-                                who_can_win_count += 1
-                                max_unfinished_start_time = max(
-                                    cur_person.start_time, max_unfinished_start_time
-                                )
-
-            self.can_win_count = who_can_win_count
-            self.final_result_time = max_unfinished_start_time + self.get_result_otime()
+        CanWinCalculation(race()).calculate_result(self)
 
 
 class ResultManual(Result):
@@ -784,6 +1424,24 @@ class ResultSportident(Result):
         self.__start_time = None
         self.__finish_time = None
 
+    def __setstate__(self, state):
+        splits = state.pop('splits', None)
+        super().__setstate__(state)
+        if splits is not None:
+            self.splits = splits
+
+    @property
+    def splits(self):
+        # type: () -> Punches
+        return self.__dict__['_punches']
+
+    @splits.setter
+    def splits(self, value):
+        if not isinstance(value, Punches):
+            value = Punches(value)
+        self.__dict__['_punches'] = value
+        self.touch()
+
     def __repr__(self):
         splits = ''
         for split in self.splits:
@@ -795,13 +1453,9 @@ class ResultSportident(Result):
 
     def __eq__(self, other):
         eq = self.card_number == other.card_number and super().__eq__(other)
-        if len(self.splits) == len(other.splits):
-            for i in range(len(self.splits)):
-                eq = eq and self.splits[i].code == other.splits[i].code
-                eq = eq and self.splits[i].time == other.splits[i].time
-        else:
+        if len(self.splits) != len(other.splits):
             return False
-        return eq
+        return eq and self.splits == other.splits
 
     def get_start_time(self):
         obj = race()
@@ -828,16 +1482,17 @@ class ResultSportident(Result):
             if len(self.splits):
                 start_cp_number = obj.get_setting('system_start_cp_number', 31)
                 if start_cp_number == 0:
-                    self.__start_time = self.splits[0].time
+                    self.__start_time = self.splits.get_time(0)
+                    return self.__start_time
+                codes = self.splits.get_codes()
+                if str(start_cp_number) in codes:
+                    index = codes.index(str(start_cp_number))
+                    self.__start_time = self.splits.get_time(index)
                     return self.__start_time
-                for split in self.splits:
-                    if split.code == str(start_cp_number):
-                        self.__start_time = split.time
-                        return self.__start_time
         elif start_source == 'gate':
             pass
 
-        return OTime()
+        return OTime.ZERO
 
     def get_finish_time(self):
         obj = race()
@@ -851,17 +1506,18 @@ class ResultSportident(Result):
             if len(self.splits):
                 finish_cp_number = obj.get_setting('system_finish_cp_number', 90)
                 if finish_cp_number == -1:
-                    self.__finish_time = self.splits[-1].time
+                    self.__finish_time = self.splits.get_time(len(self.splits) - 1)
                     return self.__finish_time
-                for split in reversed(self.splits):
-                    if split.code == str(finish_cp_number):
-                        self.__finish_time = split.time
+                codes = self.splits.get_codes()
+                for index in range(len(codes) - 1, -1, -1):
+                    if codes[index] == str(finish_cp_number):
+                        self.__finish_time = self.splits.get_time(index)
                         return self.__finish_time
         elif finish_source == 'beam':
             pass
 
         # return 0 to avoid incorrect results
-        return OTime()
+        return OTime.ZERO
 
     def clear(self):
         self.__start_time = None
@@ -877,117 +1533,7 @@ class ResultSportident(Result):
     def check(self, course=None):
         if not course:
             return super().check()
-        controls = course.controls
-        course_index = 0
-        count_controls = len(controls)
-        if count_controls == 0:
-            return True
-
-        # list of indexes, coincide with course, used for mixed course order
-        recognized_indexes = []
-
-        # invalidate all splits before check
-        for i in self.splits:
-            i.is_correct = False
-            i.has_penalty = True
-            i.course_index = -1
-
-        for i in range(len(self.splits)):
-            try:
-                split = self.splits[i]
-                template = str(controls[course_index].code)
-                cur_code = split.code
-
-                list_exists = False
-                list_contains = False
-                ind_begin = template.find('(')
-                ind_end = template.find(')')
-                if ind_begin > 0 and ind_end > 0:
-                    list_exists = True
-                    # any control from the list e.g. '%(31,32,35-45)'
-                    arr = re.split(r'\s*,\s*', template[ind_begin + 1 : ind_end])
-                    for cp in arr:
-                        cp_range = re.split(r'\s*-\s*', cp)
-                        if int(cur_code) == int(cp_range[0]):
-                            list_contains = True
-                        elif len(cp_range) > 1:
-                            if int(cur_code) > int(cp_range[0]) and int(
-                                cur_code
-                            ) <= int(cp_range[len(cp_range) - 1]):
-                                list_contains = True
-
-                if template.find('%') > -1:
-                    # non-unique control
-                    if not list_exists or list_contains:
-                        # any control '%' or '%(31,32,33)' or '31%'
-                        split.is_correct = True
-                        split.has_penalty = False
-                        recognized_indexes.append(i)
-                        course_index += 1
-
-                elif template.find('*') > -1:
-                    # unique control '*' or '*(31,32,33)' or '31*'
-                    if list_exists and not list_contains:
-                        # not in list
-                        continue
-                    # test previous splits
-                    is_unique = True
-                    course_index_current = -1
-                    for j in range(i):
-                        prev_split = self.splits[j]
-
-                        if prev_split.is_correct:
-                            course_index_current += 1
-
-                        if prev_split.code == cur_code and j in recognized_indexes:
-
-                            if (
-                                course_index_current < 0
-                                or str(controls[course_index_current].code).find('*')
-                                < 0
-                            ):
-                                # check only free order controls to be duplicated
-                                continue
-
-                            is_unique = False
-                            break
-                    if is_unique:
-                        split.is_correct = True
-                        split.has_penalty = False
-                        recognized_indexes.append(i)
-                        course_index += 1
-
-                else:
-                    # simple pre-ordered control '31 989' or '31(31,32,33) 989'
-                    if list_exists:
-                        # control with optional codes '31(31,32,33) 989'
-                        if list_contains:
-                            split.is_correct = True
-                            recognized_indexes.append(i)
-
-                            correct_code = (
-                                str(controls[course_index].code).split('(')[0].strip()
-                            )
-                            if split.code == correct_code:
-                                split.has_penalty = False
-
-                            course_index += 1
-                    else:
-                        # just cp '31 989'
-                        is_equal = str(cur_code) == controls[course_index].code
-                        if is_equal:
-                            split.is_correct = True
-                            split.has_penalty = False
-                            recognized_indexes.append(i)
-                            course_index += 1
-
-                if course_index == count_controls:
-                    return True
-
-            except KeyError:
-                return False
-
-        return False
+        return self.splits.check(course.get_matcher().controls)
 
     def merge_with(self, new_result):
         # Merge with new result (merge splits, backup old finish/start, use new finish/start as finish/start)
@@ -998,7 +1544,7 @@ class ResultSportident(Result):
         is_changed = False
 
         # backup old start as punch
-        if self.start_time and new_result.start_time and self.start_time > OTime():
+        if self.start_time and new_result.start_time and self.start_time > OTime.ZERO:
             if (
                 abs(new_result.start_time.to_sec() - self.start_time.to_sec())
                 > tolerance_sec
@@ -1014,7 +1560,11 @@ class ResultSportident(Result):
                 is_changed = True
 
         # backup old finish as punch
-        if self.finish_time and new_result.finish_time and self.finish_time > OTime():
+        if (
+            self.finish_time
+            and new_result.finish_time
+            and self.finish_time > OTime.ZERO
+        ):
             if (
                 abs(new_result.finish_time.to_sec() - self.finish_time.to_sec())
                 > tolerance_sec
@@ -1027,17 +1577,18 @@ class ResultSportident(Result):
                 is_changed = True
 
         # skip duplicated punches, then append different
+        old_times = {}
+        for code, msec in zip(self.splits.get_codes(), self.splits.get_times()):
+            old_times.setdefault(code, []).append(msec // 1000)
         offset = 0
-        for punch_new in new_result.splits:
+        new_splits = new_result.splits
+        for code, msec in zip(new_splits.get_codes(), new_splits.get_times()):
+            sec = msec // 1000
             exists = False
-            for punch_old in self.splits:
-                if punch_new.code == punch_old.code:
-                    if (
-                        abs(punch_new.time.to_sec() - punch_old.time.to_sec())
-                        < tolerance_sec
-                    ):
-                        exists = True
-                        break
+            for old_sec in old_times.get(code, ()):
+                if abs(sec - old_sec) < tolerance_sec:
+                    exists = True
+                    break
             if not exists:
                 break
             offset += 1
@@ -1045,6 +1596,8 @@ class ResultSportident(Result):
             is_changed = True
             for split in new_result.splits[offset:]:
                 self.splits.append(split)
+        if is_changed:
+            self.touch()
 
         return is_changed
 
@@ -1057,7 +1610,57 @@ class ResultSportiduino(ResultSportident):
     system_type = SystemType.SPORTIDUINO
 
 
-class Person(Model):
+class ResultSortKey(object):
+    """Sort key for results, gives the same order as comparison of results.
+
+    Settings are read once on creation and the key is computed once per result,
+    so use one instance per calculation.
+    """
+
+    def __init__(self, r=None):
+        if r is None:
+            r = race()
+        self.is_scores = r.get_setting('result_processing_mode', 'time') == 'scores'
+        self._keys = {}
+
+    def __call__(self, result):
+        key = self._keys.get(id(result))
+        if key is None:
+            is_ok = result.is_status_ok()
+            key = (
+                not is_ok,
+                0 if is_ok else result.status.value,
+                -result.scores if self.is_scores else 0,
+                result.get_result_otime().to_msec(),
+            )
+            self._keys[id(result)] = key
+        return key
+
+    def reset(self):
+        self._keys.clear()
+
+
+class Person(Model, Indexed):
+    id = IndexedField()
+    bib = IndexedField()
+    card_number = IndexedField()
+    group = IndexedField()
+    organization = IndexedField()
+    name = TrackedField()
+    surname = TrackedField()
+    birth_date = TrackedField()
+    qual = TrackedField()
+    is_out_of_competition = TrackedField()
+    start_time = TrackedField()
+    sex = SavedField()
+    world_code = SavedField()
+    national_code = SavedField()
+    is_paid = SavedField()
+    is_rented_card = SavedField()
+    is_personal = SavedField()
+    comment = SavedField()
+    start_group = SavedField()
+
     def __init__(self):
         self.id = uuid.uuid4()
         self.name = ''
@@ -1088,6 +1691,9 @@ class Person(Model):
     def __repr__(self):
         return '{} {} {}'.format(self.full_name, self.bib, self.group)
 
+    def get_index_group(self):
+        return self.group
+
     @property
     def year(self):
         return self.get_year()
@@ -1245,9 +1851,28 @@ class Race(Model):
         'Course': Course,
         'Organization': Organization,
     }
+    support_collection = {
+        'Person': 'persons',
+        'Result': 'results',
+        'ResultManual': 'results',
+        'ResultSportident': 'results',
+        'ResultSFR': 'results',
+        'ResultSportiduino': 'results',
+        'Group': 'groups',
+        'Course': 'courses',
+        'Organization': 'organizations',
+    }
+
+    organizations = IndexedCollection('organizations')
+    courses = IndexedCollection('courses')
+    groups = IndexedCollection('groups')
+    results = IndexedCollection('results')
+    persons = IndexedCollection('persons')
+    relay_teams = IndexedCollection('relay_teams')
 
     def __init__(self):
         self.id = uuid.uuid4()
+        self.index = RaceIndex(self)
         self.data = RaceData()
         self.organizations = []  # type: List[Organization]
         self.courses = []  # type: List[Course]
@@ -1257,6 +1882,16 @@ class Race(Model):
         self.relay_teams = []  # type: List[RelayTeam]
         self.settings = {}  # type: Dict[str, Any]
         self.controls = []  # type: List[ControlPoint]
+        self.calculation_key = None  # settings of the last result calculation
+        # data version of the last full result calculation, see get_data_version
+        self.calculated_version = None  # type: Optional[tuple]
+        # derived fields are loaded from a file with matching fingerprint
+        self.fingerprint_valid = False
+        self._course_index = None  # type: CourseIndex
+        # group id -> (version, state hash), see update_group_version
+        self.group_versions = {}  # type: Dict[str, Tuple[int, int]]
+        # group id -> (version, data calculated for the version)
+        self.group_cache = {}  # type: Dict[str, Tuple[int, Any]]
 
     def __repr__(self):
         return repr(self.data)
@@ -1275,18 +1910,20 @@ class Race(Model):
             'Organization': self.organizations,
         }
 
-    def to_dict(self):
-        return {
+    def to_dict(self, collections=None):
+        """:param collections: keys of collections with objects, all if None"""
+        ret = {
             'object': self.__class__.__name__,
             'id': str(self.id),
             'data': self.data.to_dict(),
             'settings': self.settings,
-            'organizations': [item.to_dict() for item in self.organizations],
-            'courses': [item.to_dict() for item in self.courses],
-            'groups': [item.to_dict() for item in self.groups],
-            'results': [item.to_dict() for item in self.results],
-            'persons': [item.to_dict() for item in self.persons],
         }
+        for key in ['organizations', 'courses', 'groups', 'results', 'persons']:
+            if collections is None or key in collections:
+                ret[key] = [item.to_dict() for item in getattr(self, key)]
+            else:
+                ret[key] = []
+        return ret
 
     def update_data(self, dict_obj):
         if 'object' not in dict_obj:
@@ -1311,10 +1948,23 @@ class Race(Model):
         else:
             self.update_obj(obj, dict_obj)
 
+    def load_data(self, dict_obj):
+        """Bulk load of the whole race dict into an empty race, see RaceLoader
+
+        :return: load time in seconds per section
+        """
+        loader = RaceLoader(self)
+        if 'data' in dict_obj:
+            loader.set_data(dict_obj['data'])
+        if 'settings' in dict_obj:
+            loader.set_settings(dict_obj['settings'])
+        for key in RaceLoader.key_list:
+            for item_obj in dict_obj.get(key, []):
+                loader.add(key, item_obj)
+        return loader.finish()
+
     def get_obj(self, obj_name, obj_id):
-        for item in self.list_obj[obj_name]:
-            if str(item.id) == obj_id:
-                return item
+        return self.index.first(self.support_collection[obj_name], 'id', obj_id)
 
     def update_obj(self, obj, dict_obj):
         obj.update_data(dict_obj)
@@ -1336,7 +1986,7 @@ class Race(Model):
         obj = self.support_obj[dict_obj['object']]()
         obj.id = uuid.UUID(dict_obj['id'])
         self.update_obj(obj, dict_obj)
-        self.list_obj[dict_obj['object']].insert(0, obj)
+        self.index.insert(self.support_collection[dict_obj['object']], obj)
 
     def get_type(self, group: Group):
         if group.get_type():
@@ -1357,8 +2007,8 @@ class Race(Model):
 
     def person_card_number(self, person, number=0):
         person.card_number = number
-        for p in self.persons:
-            if p.card_number == number and p != person:
+        for p in self.index.bucket('persons', 'card_number', number):
+            if p is not person:
                 p.card_number = 0
                 p.is_rented_card = False
                 return p
@@ -1367,22 +2017,18 @@ class Race(Model):
         indexes = sorted(indexes, reverse=True)
         persons = []
         for i in indexes:
-            person = self.persons[i]
+            person = self.index.delete('persons', i)
             persons.append(person)
-            for result in self.results:
-                if result.person is person:
-                    result.person = None
-                    result.bib = person.bib
-            del self.persons[i]
+            for result in list(self.index.bucket('results', 'person', person)):
+                result.person = None
+                result.bib = person.bib
         return persons
 
     def delete_results(self, indexes):
         indexes = sorted(indexes, reverse=True)
         results = []
         for i in indexes:
-            result = self.results[i]
-            results.append(result)
-            del self.results[i]
+            results.append(self.index.delete('results', i))
         return results
 
     def delete_groups(self, indexes):
@@ -1396,7 +2042,7 @@ class Race(Model):
 
         indexes = sorted(indexes, reverse=True)
         for i in indexes:
-            del self.groups[i]
+            self.index.delete('groups', i)
         return groups
 
     def delete_courses(self, indexes):
@@ -1410,7 +2056,7 @@ class Race(Model):
 
         indexes = sorted(indexes, reverse=True)
         for i in indexes:
-            del self.courses[i]
+            self.index.delete('courses', i)
         return courses
 
     def delete_organizations(self, indexes):
@@ -1424,14 +2070,11 @@ class Race(Model):
         indexes = sorted(indexes, reverse=True)
 
         for i in indexes:
-            del self.organizations[i]
+            self.index.delete('organizations', i)
         return organizations
 
     def find_person_result(self, person):
-        for i in self.results:
-            if i.person is person:
-                return i
-        return None
+        return self.index.first('results', 'person', person)
 
     def find_course(self, result):
         # first get course by number
@@ -1445,13 +2088,99 @@ class Race(Model):
             # usual connection via group
             if not ret and person.group:
                 if person.group.is_any_course:
-                    for course in self.courses:
-                        if result.check(course):
-                            return course
+                    return self.find_course_by_punches(result)
                 else:
                     ret = person.group.course
             return ret
 
+    def get_data_version(self):
+        """:return version of the data results are calculated from
+
+        Persons and results are versioned by the counter of the race index
+        (changes of indexed and tracked fields, objects added or deleted) and
+        their count, the small sections (data, settings, courses and groups) by
+        the hash of their content.
+        """
+        for name in self.index.tracked:
+            # assignments are counted only for objects in a built index
+            self.index.ensure(name)
+        state = json.dumps(
+            [
+                self.data.to_dict(),
+                self.settings,
+                [i.to_dict() for i in self.courses],
+                # counts are set by the calculation
+                [
+                    dict(i.to_dict(), count_person=0, count_finished=0)
+                    for i in self.groups
+                ],
+            ],
+            sort_keys=True,
+            default=str,
+        )
+        return (
+            self.index.version,
+            len(self.persons),
+            len(self.results),
+            hash(state),
+        )
+
+    def set_calculated(self):
+        """Remember the data version results are calculated for"""
+        self.calculated_version = self.get_data_version()
+
+    def get_group_version(self, group):
+        return self.group_versions.get(str(group.id), (0, None))[0]
+
+    def update_group_version(self, group, state):
+        """Increase the version of the group if its state differs from the last one
+
+        :param state: hash of the data the group results are calculated from
+        :return: current version of the group
+        """
+        key = str(group.id)
+        version, last_state = self.group_versions.get(key, (0, None))
+        if last_state != state:
+            version += 1
+            self.group_versions[key] = (version, state)
+        return version
+
+    def get_group_cache(self, group, version):
+        """:return data cached for the group version, None if the group was changed"""
+        cached = self.group_cache.get(str(group.id))
+        if cached and cached[0] == version:
+            return cached[1]
+        return None
+
+    def set_group_cache(self, group, version, value):
+        self.group_cache[str(group.id)] = (version, value)
+
+    def get_course_index(self):
+        if self._course_index is None or not self._course_index.is_actual(self.courses):
+            self._course_index = CourseIndex(self.courses)
+        return self._course_index
+
+    def find_course_by_punches(self, result, courses=None):
+        """Best course passed by the result, None if no course is passed"""
+        return self.get_course_index().find(result, courses)
+
+    def find_group_by_punches(self, result):
+        """First group with the course best matching the result"""
+        courses = [group.course for group in self.groups if group.course]
+        course = self.find_course_by_punches(result, courses)
+        if course:
+            for group in self.groups:
+                if group.course is course:
+                    return group
+        return None
+
+    def find_relay_team(self, number):
+        """:return relay team by the team number (bib % 1000)
+
+        Teams are from the last calculation.
+        """
+        return self.index.first('relay_teams', 'bib_number', number)
+
     def find_group(self, group_name):
         # get group by name
         ret = find(self.groups, name=str(group_name))
@@ -1482,25 +2211,25 @@ class Race(Model):
     def add_new_person(self, append_to_race=False):
         new_person = Person()
         if append_to_race:
-            self.persons.insert(0, new_person)
+            self.index.insert('persons', new_person)
         return new_person
 
     def add_new_group(self, append_to_race=False):
         new_group = Group()
         if append_to_race:
-            self.groups.insert(0, new_group)
+            self.index.insert('groups', new_group)
         return new_group
 
     def add_new_course(self, append_to_race=False):
         new_course = Course()
         if append_to_race:
-            self.courses.insert(0, new_course)
+            self.index.insert('courses', new_course)
         return new_course
 
     def add_new_organization(self, append_to_race=False):
         new_organization = Organization()
         if append_to_race:
-            self.organizations.insert(0, new_organization)
+            self.index.insert('organizations', new_organization)
         return new_organization
 
     def update_counters(self):
@@ -1542,16 +2271,13 @@ class Race(Model):
         return ret
 
     def add_new_result(self, result):
-        self.results.insert(0, result)
+        self.index.insert('results', result)
 
     def add_result(self, result):
-        add = True
-        for r in self.results:
+        for r in self.index.bucket('results', 'id', result.id):
             if r is result:
-                add = False
-                break
-        if add:
-            self.add_new_result(result)
+                return
+        self.add_new_result(result)
 
     def clear_results(self):
         for result in self.results:
@@ -1571,29 +2297,14 @@ class Race(Model):
             len(self.organizations),
         )
 
+    def get_duplicate_audit(self):
+        return DuplicateAudit(self.persons)
+
     def get_duplicate_card_numbers(self):
-        ret = []
-        for person in self.persons:
-            for p in self.persons:
-                if (
-                    person.id != p.id
-                    and person.card_number
-                    and person.card_number == p.card_number
-                ):
-                    ret.append(person)
-        return ret
+        return self.get_duplicate_audit().get_persons(DuplicateAudit.CARD_NUMBER)
 
     def get_duplicate_names(self):
-        ret = []
-        for person in self.persons:
-            for p in self.persons:
-                if (
-                    person.id != p.id
-                    and person.full_name
-                    and person.full_name == p.full_name
-                ):
-                    ret.append(person)
-        return ret
+        return self.get_duplicate_audit().get_persons(DuplicateAudit.NAME)
 
 
 class Qualification(IntEnum):
@@ -1825,9 +2536,7 @@ class RelayLeg(object):
         if self.leg > 1:
             team = self.get_relay_team()
             if team and isinstance(team, RelayTeam):
-                for cur_leg in team.legs:
-                    if cur_leg.leg == self.leg - 1:
-                        return cur_leg
+                return team.get_leg(self.leg - 1)
         return None
 
     def get_bib(self):
@@ -1932,6 +2641,9 @@ class RelayTeam(object):
         self.last_finished_leg = 0
         self.last_correct_leg = 0
         self.place = 0
+        self._legs = {}  # type: Dict[int, RelayLeg]
+        self._legs_count = 0
+        self._cache = {}  # type: Dict[str, Any]
 
     def __eq__(self, other):
         if self.get_is_status_ok() == other.get_is_status_ok():
@@ -1962,6 +2674,22 @@ class RelayTeam(object):
         leg.set_person(result.person)
         leg.leg = result.person.bib // 1000
         self.legs.append(leg)
+        self.reset()
+
+    def reset(self):
+        """Drop cached leg lookup and team time, status and lap counts"""
+        self._legs = {}
+        for leg in self.legs:
+            self._legs.setdefault(leg.leg, leg)
+        self._legs_count = len(self.legs)
+        self._cache = {}
+
+    def _cached(self, name, func):
+        if self._legs_count != len(self.legs):
+            self.reset()
+        if name not in self._cache:
+            self._cache[name] = func()
+        return self._cache[name]
 
     def set_leg_for_person(self, person, leg):
         """Set leg for person"""
@@ -1975,22 +2703,27 @@ class RelayTeam(object):
             i.set_start_time_from_previous()
 
     def get_leg(self, leg_number):
-        for i in self.legs:
-            if i.leg == leg_number:
-                return i
-        return None
+        if self._legs_count != len(self.legs):
+            self.reset()
+        return self._legs.get(leg_number)
 
     def get_time(self):
+        return self._cached('time', self._get_time)
+
+    def _get_time(self):
         if len(self.legs):
             last_correct_leg = self.get_correct_lap_count()
             if last_correct_leg > 0:
                 last_finish = self.get_leg(last_correct_leg).get_finish_time()
                 start = self.get_leg(1).get_start_time()
                 return last_finish - start
-        return OTime()
+        return OTime.ZERO
 
     def get_lap_finished(self):
         """quantity of already finished laps"""
+        return self._cached('lap_finished', self._get_lap_finished)
+
+    def _get_lap_finished(self):
         finished_qty = 0
         for leg in self.legs:
             if leg.is_finished():
@@ -1999,6 +2732,9 @@ class RelayTeam(object):
 
     def get_correct_lap_count(self):
         """quantity of successfully finished laps"""
+        return self._cached('correct_lap_count', self._get_correct_lap_count)
+
+    def _get_correct_lap_count(self):
         correct_qty = 0
         for i in range(len(self.legs)):
             leg = self.get_leg(i + 1)
@@ -2012,6 +2748,9 @@ class RelayTeam(object):
 
     def get_is_status_ok(self):
         """get the whole status of team - OK if all laps are OK"""
+        return self._cached('is_status_ok', self._get_is_status_ok)
+
+    def _get_is_status_ok(self):
         for leg in self.legs:
             if not leg.is_correct():
                 return False
@@ -2047,6 +2786,10 @@ def find(iterable: list, **kwargs):
     if len(kwargs.items()) == 0:
         return None
     return_all = kwargs.pop('return_all', False)
+    candidates = lookup(iterable, kwargs)
+    if candidates is not None:
+        # use race index to narrow the scan
+        iterable = candidates
     results = []
     for item in iterable:
         f = True
@@ -2064,6 +2807,106 @@ def find(iterable: list, **kwargs):
         return None
 
 
+class RaceLoader(object):
+    """Bulk load into an empty race fed one section or object at a time.
+
+    Objects are created in the order they come, only the ids of references
+    (group, organization, person, course) are kept and resolved in `finish`
+    via id maps, so the dicts of objects are not needed after `add`.
+    """
+
+    key_list = ['organizations', 'courses', 'groups', 'persons', 'results']
+
+    # collection -> (attribute, key of the id, collection of the reference)
+    references = {
+        'groups': [('course', 'course_id', 'courses')],
+        'persons': [
+            ('group', 'group_id', 'groups'),
+            ('organization', 'organization_id', 'organizations'),
+        ],
+        'results': [('person', 'person_id', 'persons')],
+    }
+
+    def __init__(self, obj):
+        self.race = obj
+        self.maps = {key: {} for key in self.key_list}
+        self.arrays = {key: [] for key in self.key_list}
+        self.refs = {key: [] for key in self.references}
+        self.timing = {key: 0.0 for key in self.key_list}
+
+    def set_data(self, data):
+        self.race.data.update_data(data)
+
+    def set_settings(self, settings):
+        self.race.settings = settings
+
+    def add(self, key, item_obj):
+        if item_obj.get('object') not in self.race.support_obj:
+            return
+        start = time.time()
+        id_map = self.maps[key]
+        obj = id_map.get(item_obj['id'])
+        if obj is None:
+            obj = self.race.support_obj[item_obj['object']]()
+            obj.id = uuid.UUID(item_obj['id'])
+            id_map[item_obj['id']] = obj
+            self.arrays[key].append(obj)
+        obj.update_data(item_obj)
+        for _, id_key, _ in self.references.get(key, []):
+            self.refs[key].append((obj, id_key, item_obj.get(id_key)))
+        self.timing[key] += time.time() - start
+
+    def finish(self):
+        """Resolve references and set the collections of the race
+
+        :return: load time in seconds per section
+        """
+        start = time.time()
+        for key, refs in self.refs.items():
+            attrs = {
+                id_key: (attr, self.maps[ref_key])
+                for attr, id_key, ref_key in self.references[key]
+            }
+            for obj, id_key, ref_id in refs:
+                attr, id_map = attrs[id_key]
+                setattr(obj, attr, id_map.get(ref_id))
+        for key in self.key_list:
+            setattr(self.race, key, self.arrays[key])
+        self.timing['references'] = time.time() - start
+
+        logging.debug(
+            'Race load: {}'.format(
+                ', '.join('{} {:.3f}s'.format(k, v) for k, v in self.timing.items())
+            )
+        )
+        return self.timing
+
+
+class Event(list):
+    """Races of the event, a race may be kept as a loader until first access.
+
+    A loader is any object with `load()` returning the race, e.g. a race of a
+    binary file not decoded yet. Access by index or iteration replaces loaders
+    with their races, `list.__iter__` gives the items as they are.
+    """
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(len(self))[index]]
+        item = list.__getitem__(self, index)
+        if not isinstance(item, Race):
+            item = item.load()
+            list.__setitem__(self, index, item)
+        return item
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def is_loaded(self, index):
+        return isinstance(list.__getitem__(self, index), Race)
+
+
 _event = [create(Race)]
 current_race = 0
 
@@ -2083,7 +2926,7 @@ def copy_race():
     copy = Race()
     obj = cur_race.to_dict()
     obj['id'] = str(copy.id)
-    copy.update_data(obj)
+    copy.load_data(obj)
     _event.append(copy)
 
 
@@ -0,0 +1,73 @@
+import logging
+from bisect import bisect_right
+
+from sportorg.common.otime import DAY_MSEC, OTime
+from sportorg.models.result.result_calculation import ResultCalculation
+
+
+class CanWinCalculation(object):
+    """Who can still beat the finished results of a group.
+
+    Start times of unfinished persons (no result, in competition) are kept
+    sorted per group, so every finisher is processed with a binary search.
+    """
+
+    def __init__(self, r, calculation=None):
+        self.race = r
+        self.calculation = calculation or ResultCalculation(r)
+        self._starts = {}
+
+    def get_group_starts(self, group):
+        """:return sorted start times (msec) of unfinished persons of the group"""
+        if group not in self._starts:
+            self._starts[group] = sorted(
+                person.start_time.to_msec()
+                for person in self.calculation.get_group_persons(group)
+                if person.result_count == 0
+                and not person.is_out_of_competition
+                and person.start_time
+            )
+        return self._starts[group]
+
+    def calculate(self, now=None):
+        logging.debug('Who can win calculation')
+        now = now or OTime.now()
+        for group in self.race.groups:
+            self.calculate_group(group, now)
+
+    def calculate_group(self, group, now=None):
+        now = now or OTime.now()
+        for result in self.calculation.get_group_finishes(group):
+            self.calculate_result(result, now)
+
+    def calculate_result(self, result, now=None):
+        """Set quantity of persons who can win and time when the result becomes final"""
+        if not result.person or not result.person.group:
+            return
+        now_msec = (now or OTime.now()).to_msec()
+        starts = self.get_group_starts(result.person.group)
+        result_time = result.get_result_otime()
+        result_msec = result_time.to_msec()
+        own_start = -1
+        if result.person.start_time:
+            own_start = result.person.start_time.to_msec()
+
+        # running now and still can be faster: start in (now - result, now]
+        count = 0
+        max_start = 0
+        low = max(own_start, now_msec - result_msec)
+        if low < now_msec:
+            end = bisect_right(starts, now_msec)
+            count = end - bisect_right(starts, low)
+            if count:
+                max_start = starts[end - 1]
+
+        # start after now, time of day passes midnight as in OTime
+        low = max(own_start, now_msec, now_msec - result_msec + DAY_MSEC)
+        after_count = len(starts) - bisect_right(starts, low)
+        if after_count:
+            count += after_count
+            max_start = starts[-1]
+
+        result.can_win_count = count
+        result.final_result_time = OTime(msec=max_start) + result_time
@@ -0,0 +1,95 @@
+"""Fingerprint of the result calculation saved with the race dict.
+
+The fingerprint is written only if the results were calculated after the last
+change counted by the race data version (objects added or deleted, fields the
+results are calculated from assigned, results checked, see
+`Race.get_data_version`). It keeps the version of the calculation, a hash of
+race data, settings, courses and groups and the size of every collection. On
+open, a race with a matching fingerprint is used with the derived fields stored
+in the file (status, place, diff, scores, ranks, group counts and split legs),
+so the full recalculation is skipped. Split legs are generated again per group
+when they are first needed, see `GroupSplits.get`.
+"""
+
+import hashlib
+import json
+import logging
+
+from sportorg.models.memory import RaceType
+from sportorg.models.result.result_calculation import ResultCalculation
+from sportorg.models.result.result_checker import ResultChecker
+from sportorg.models.result.score_calculation import ScoreCalculation
+from sportorg.models.result.split_calculation import RaceSplits
+
+# increase when a calculation gives other derived fields for the same data
+CALCULATION_VERSION = 1
+
+COLLECTIONS = ['organizations', 'courses', 'groups', 'persons', 'results']
+
+# sections small enough to be hashed on open
+HASHED = ['data', 'settings', 'courses', 'groups']
+
+
+def get_hash(race_dict):
+    data = json.dumps(
+        [race_dict.get(key) for key in HASHED],
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+def get_counts(race_dict):
+    return {key: len(race_dict.get(key, [])) for key in COLLECTIONS}
+
+
+def get_fingerprint(race_dict, counts=None):
+    """:param counts: size of collections, if not all objects are in `race_dict`"""
+    return {
+        'version': CALCULATION_VERSION,
+        'hash': get_hash(race_dict),
+        'counts': counts if counts is not None else get_counts(race_dict),
+    }
+
+
+def get_race_fingerprint(r, race_dict, counts=None):
+    """:return fingerprint of `race_dict` made from race `r`, None if not calculated"""
+    if r.calculated_version is None or r.calculated_version != r.get_data_version():
+        return None
+    if r.calculation_key != ResultCalculation(r).get_settings_key():
+        return None
+    return get_fingerprint(race_dict, counts)
+
+
+def is_fingerprint_valid(race_dict, counts=None):
+    """:return True if the derived fields of `race_dict` can be used"""
+    fingerprint = race_dict.get('fingerprint')
+    if not isinstance(fingerprint, dict):
+        return False
+    return fingerprint == get_fingerprint(race_dict, counts)
+
+
+def calculate_race(r, progress=None):
+    """Full calculation of the current race `r`, as done on open without fingerprint"""
+    ResultChecker.check_all(progress=progress)
+    rc = ResultCalculation(r)
+    rc.process_results()
+    RaceSplits(r, rc).generate()
+    ScoreCalculation(r, rc).calculate_scores()
+
+
+def restore_calculation(r):
+    """Set the state not stored in the file, derived fields are kept"""
+    logging.debug('Results are loaded by fingerprint')
+    rc = ResultCalculation(r)
+    r.calculation_key = rc.get_settings_key()
+    for person in r.persons:
+        person.result_count = 0
+    for result in r.results:
+        if result.person:
+            result.person.result_count += 1
+    r.relay_teams.clear()
+    for group in r.groups:
+        if r.get_type(group) == RaceType.RELAY:
+            rc.process_group(group)
+    r.set_calculated()
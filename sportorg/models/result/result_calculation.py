@@ -1,17 +1,49 @@
 import logging
+from typing import Dict, List, Optional
 
 from sportorg.common.otime import OTime
 from sportorg.models.constant import RankingTable
-from sportorg.models.memory import Group, Qualification, RaceType, RelayTeam, find
+from sportorg.models.memory import (
+    Group,
+    Person,
+    Qualification,
+    RaceType,
+    RelayTeam,
+    Result,
+    ResultSortKey,
+    find,
+)
 from sportorg.modules.configs.configs import Config
 
 
 class ResultCalculation(object):
+    # settings affecting results of all groups
+    global_settings = (
+        'result_processing_mode',
+        'time_accuracy',
+        'system_start_source',
+        'system_start_cp_number',
+        'system_finish_source',
+        'system_finish_cp_number',
+    )
+
     def __init__(self, r):
         self.race = r
+        self._finishes = None  # type: Optional[Dict[Optional[Group], List[Result]]]
+        self._persons = None  # type: Optional[Dict[Optional[Group], List[Person]]]
+        self._sorted = set()
+        self.sort_key = ResultSortKey(r)
+
+    def get_settings_key(self):
+        ret = [self.race.get_setting(i) for i in self.global_settings]
+        ret.append(self.race.data.race_type)
+        ret.append(self.race.data.relay_leg_count)
+        return tuple(ret)
 
     def process_results(self):
         logging.debug('Process results')
+        self.race.calculation_key = self.get_settings_key()
+        self.reset()
         self.race.relay_teams.clear()
         for person in self.race.persons:
             person.result_count = 0
@@ -19,35 +51,137 @@ class ResultCalculation(object):
             if result.person:
                 result.person.result_count += 1
         for i in self.race.groups:
-            if not self.race.get_type(i) == RaceType.RELAY:
-                # single race
-                array = self.get_group_finishes(i)
-                self.set_places(array)
-            else:
-                # relay
-                new_relays = self.process_relay_results(i)
-                for a in new_relays:
-                    self.race.relay_teams.append(a)
-            self.set_rank(i)
+            self.process_group(i)
+        self.race.set_calculated()
 
-    def get_group_finishes(self, group):
-        ret = []
-        for i in self.race.results:
-            person = i.person
+    def process_changed_results(self, results, old_groups=None):
+        """Recalculate only the groups of changed results.
+
+        :param results: new or changed results
+        :param old_groups: groups the persons of the results were moved from
+        Full recalculation is done if settings affecting all groups were changed
+        since the last calculation. The race is marked as calculated if no other
+        group was changed since then.
+        """
+        if self.race.calculation_key != self.get_settings_key():
+            self.process_results()
+            return
+
+        calculated = self.race.calculated_version
+        self.reset()
+        groups = list(old_groups) if old_groups else []
+        persons = []
+        for result in results:
+            person = result.person
+            if person:
+                persons.append(person)
+                if person.group and person.group not in groups:
+                    groups.append(person.group)
+        logging.debug('Process results for {} group(s)'.format(len(groups)))
+
+        for group in groups:
+            persons.extend(self.race.get_persons_by_group(group) or [])
+        for person in persons:
+            person.result_count = len(
+                self.race.index.bucket('results', 'person', person)
+            )
+
+        self.race.relay_teams[:] = [
+            team for team in self.race.relay_teams if team.group not in groups
+        ]
+        for group in groups:
+            self.process_group(group)
+        if self.is_consistent(calculated, groups):
+            self.race.set_calculated()
+
+    def is_consistent(self, calculated, groups):
+        """:return True if the results are calculated for the current data
+
+        :param calculated: data version of the last calculation
+        :param groups: groups calculated since then
+        """
+        if calculated is None:
+            return False
+        if self.race.get_setting('scores_mode', 'off') != 'off':
+            # scores are calculated for the whole race only
+            return False
+        if self.race.get_data_version()[-1] != calculated[-1]:
+            # data, settings, courses or groups were changed
+            return False
+        index = self.race.index
+        for group in self.race.groups:
+            if group not in groups and index.last_change(group) > calculated[0]:
+                return False
+        return True
+
+    def process_group(self, group):
+        if not self.race.get_type(group) == RaceType.RELAY:
+            # single race
+            array = self.get_group_finishes(group)
+            self.set_places(array)
+        else:
+            # relay
+            self.race.relay_teams.extend(self.process_relay_results(group))
+            self.race.index.invalidate('relay_teams')
+            # start times of the legs have been changed
+            self._sorted.discard(group)
+            self.sort_key.reset()
+        self.set_rank(group)
+
+    def partition(self):
+        """Split results and persons by group in one pass"""
+        self._finishes = {}
+        for result in self.race.results:
+            person = result.person
             if person:
-                if person.group is group:
-                    ret.append(i)
-        ret.sort()
-        group.count_finished = len(ret)
+                self._finishes.setdefault(person.group, []).append(result)
+        self._persons = {}
+        for person in self.race.persons:
+            self._persons.setdefault(person.group, []).append(person)
+        self._sorted = set()
+
+    def reset(self):
+        """Drop group buckets, e.g. after results or persons were changed"""
+        self._finishes = None
+        self._persons = None
+        self._sorted = set()
+        self.sort_key = ResultSortKey(self.race)
+
+    def get_group_finishes(self, group):
+        """Sorted results of the group, shared within this calculation"""
+        if self._finishes is None:
+            self.partition()
+        ret = self._finishes.setdefault(group, [])
+        if group not in self._sorted:
+            ret.sort(key=self.sort_key)
+            self._sorted.add(group)
+        if group:
+            group.count_finished = len(ret)
         return ret
 
+    def get_group_state(self, group):
+        """Hash of the data results and splits of the group are calculated from
+
+        Changes of persons and results of the group are counted by the race
+        index, see `RaceIndex.last_change`.
+        """
+        state = [self.get_settings_key(), self.race.index.last_change(group)]
+        courses = self.race.courses if group.is_any_course else [group.course]
+        for course in courses:
+            if course:
+                state.append((id(course), course.length))
+                state.extend((i.code, i.length) for i in course.controls)
+        state.extend(
+            (id(result), result.place) for result in self.get_group_finishes(group)
+        )
+        return hash(tuple(state))
+
     def get_group_persons(self, group):
-        ret = []
-        for i in self.race.persons:
-            person = i
-            if person.group is group:
-                ret.append(i)
-        group.count_person = len(ret)
+        if self._persons is None:
+            self.partition()
+        ret = self._persons.setdefault(group, [])
+        if group:
+            group.count_person = len(ret)
         return ret
 
     @staticmethod
@@ -128,27 +262,58 @@ class ResultCalculation(object):
                     else:
                         i.percent = 0
 
-            # Rank assigning for all athletes
-            for i in results:
-                result_time = i.get_result_otime()
-                place = i.place
+            self.assign_ranks(results, self.get_rank_thresholds(ranking))
 
-                if i.person.is_out_of_competition or not i.is_status_ok():
-                    continue
+    @staticmethod
+    def get_rank_thresholds(ranking):
+        """:return (max_time msec, max_place, qual) of active ranks
 
-                qual_list = sorted(
-                    ranking.rank.values(),
-                    reverse=True,
-                    key=lambda item: item.qual.get_score(),
-                )
-                for j in qual_list:
-                    if j.is_active:
-                        if isinstance(place, int) and j.max_place >= place:
-                            i.assigned_rank = j.qual
-                            break
-                        if j.max_time and j.max_time >= result_time:
-                            i.assigned_rank = j.qual
-                            break
+        The best qualification is first.
+        """
+        qual_list = sorted(
+            ranking.rank.values(),
+            reverse=True,
+            key=lambda item: item.qual.get_score(),
+        )
+        return [
+            (j.max_time.to_msec() if j.max_time else None, j.max_place, j.qual)
+            for j in qual_list
+            if j.is_active
+        ]
+
+    @staticmethod
+    def assign_ranks(results, thresholds):
+        """Rank assigning for all athletes
+
+        Every athlete gets the best qualification with place or time reached.
+
+        Results are sorted, so while places and times don't decrease, the search
+        continues from the qualification found for the previous result.
+        """
+        start = 0
+        prev_place = 0
+        prev_time = 0
+        for i in results:
+            if i.person.is_out_of_competition or not i.is_status_ok():
+                continue
+
+            result_time = i.get_result_otime().to_msec()
+            place = i.place
+            is_place = isinstance(place, int)
+            if not is_place or place < prev_place or result_time < prev_time:
+                start = 0
+            prev_place = place if is_place else 0
+            prev_time = result_time
+
+            while start < len(thresholds):
+                max_time, max_place, qual = thresholds[start]
+                if is_place and max_place >= place:
+                    i.assigned_rank = qual
+                    break
+                if max_time is not None and max_time >= result_time:
+                    i.assigned_rank = qual
+                    break
+                start += 1
 
     def get_group_leader_time(self, group):
         if self.race.get_type(group) == RaceType.RELAY:
@@ -156,14 +321,14 @@ class ResultCalculation(object):
             if isinstance(team_result, RelayTeam):
                 leader_time = team_result.get_time()
             else:
-                return OTime()
+                return OTime.ZERO
         else:
             results = self.get_group_finishes(group)
             if len(results) > 0:
                 leader_result = results[0]
                 leader_time = leader_result.get_result_otime()
             else:
-                return OTime()
+                return OTime.ZERO
         return leader_time
 
     def get_group_rank(self, group):
@@ -266,12 +431,9 @@ class ResultCalculation(object):
 
     @staticmethod
     def get_percent_for_rank(qual, rank):
-        table = RankingTable().get_qual_table(qual)
-
-        for i in range(len(table)):
-            cur_value = table[i][0]
+        for cur_value, percent in RankingTable().get_qual_table(qual):
             if cur_value <= rank:
-                return table[i][1]
+                return percent
         return 0
 
     def get_time_for_rank(self, leader_time, qual, rank):
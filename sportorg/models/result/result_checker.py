@@ -1,17 +1,69 @@
 import logging
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from sportorg.common.otime import OTime
 from sportorg.models.constant import StatusComments
-from sportorg.models.memory import Person, ResultStatus, find, race
+from sportorg.models.memory import (
+    Person,
+    ResultSportident,
+    ResultStatus,
+    check_codes,
+    get_split_codes,
+    race,
+)
+from sportorg.modules.configs.configs import Config
 
 
 class ResultCheckerException(Exception):
     pass
 
 
+class ControlScores(object):
+    """Score of every control for rogaine, built from race controls and settings"""
+
+    def __init__(self, r=None):
+        if r is None:
+            r = race()
+        self.scores = {}
+        for control in r.controls:
+            self.scores.setdefault(control.code, control.score)
+        self.is_fixed = (
+            r.get_setting('result_processing_score_mode', 'fixed') == 'fixed'
+        )
+        self.fixed_value = r.get_setting('result_processing_fixed_score_value', 1.0)
+
+    def get_score(self, code):
+        code = str(code)
+        score = self.scores.get(code)
+        if score:
+            return score
+
+        if self.is_fixed:
+            return self.fixed_value  # fixed score per control
+        else:
+            return int(code) // 10  # score = code / 10
+
+
+def check_cards(controls, cards):
+    """Check punched codes of cards against one course, runs in a worker process
+
+    :param controls: `CourseMatcher.controls` of the course
+    :param cards: list of punched codes for every result
+    :return list of (passed, flags), see `check_codes`
+    """
+    return [check_codes(controls, codes) for codes in cards]
+
+
 class ResultChecker:
-    def __init__(self, person: Person):
+    # results of one course sent to a worker process at a time
+    chunk_size = 500
+
+    def __init__(self, person: Person, control_scores=None, checked=None):
         self.person = person
+        self.control_scores = control_scores
+        # id(result) -> (course, passed) checked in worker processes
+        self.checked = checked
 
     def check_result(self, result):
         if self.person is None:
@@ -21,14 +73,20 @@ class ResultChecker:
 
         if race().get_setting('result_processing_mode', 'time') == 'scores':
             # process by score (rogain)
-            result.scores = self.calculate_scores_rogain(result)
+            result.scores = self.calculate_scores_rogain(result, self.control_scores)
             return True
 
-        course = race().find_course(result)
+        passed = None
+        if self.checked and id(result) in self.checked:
+            # splits are already checked
+            course, passed = self.checked[id(result)]
+        else:
+            course = race().find_course(result)
 
         if race().get_setting('marked_route_dont_dsq', False):
             # mode: competition without disqualification for mispunching (add penalty for missing cp)
-            result.check(course)
+            if passed is None:
+                result.check(course)
             return True
 
         if course is None:
@@ -39,13 +97,15 @@ class ResultChecker:
         if self.person.group.is_any_course:
             return True
 
+        if passed is not None:
+            return passed
         return result.check(course)
 
     @classmethod
-    def checking(cls, result):
+    def checking(cls, result, control_scores=None, checked=None):
         if result.person is None:
             raise ResultCheckerException('Not person')
-        o = cls(result.person)
+        o = cls(result.person, control_scores, checked)
         if result.status in [
             ResultStatus.OK,
             ResultStatus.MISSING_PUNCH,
@@ -63,14 +123,86 @@ class ResultChecker:
                     if race().get_setting('result_processing_mode', 'time') == 'time':
                         result.status = ResultStatus.OVERTIME
 
+        # the check resets course indexes of the splits, they are generated again
+        result.touch()
         return o
 
     @classmethod
-    def check_all(cls):
+    def check_all(cls, workers=None, progress=None):
+        """Check all results of the current race
+
+        :param workers: quantity of worker processes to check splits,
+            `recheck_workers` from the configuration by default, 0 or 1 - no workers
+        :param progress: function(checked, total) called while results are checked
+        """
         logging.debug('Checking all results')
+        if workers is None:
+            workers = Config().configuration.get('recheck_workers', 0)
+        control_scores = None
+        checked = None
+        if race().get_setting('result_processing_mode', 'time') == 'scores':
+            control_scores = ControlScores(race())
+        elif workers > 1:
+            checked = cls.check_splits_parallel(race(), workers, progress)
         for result in race().results:
             if result.person:
-                ResultChecker.checking(result)
+                ResultChecker.checking(result, control_scores, checked)
+        if progress:
+            progress(len(race().results), len(race().results))
+
+    @classmethod
+    def check_splits_parallel(cls, r, workers, progress=None):
+        """Check splits of the results against their courses in worker processes.
+
+        Results are partitioned by course, codes of the cards and the compiled
+        course are sent to the workers, flags of the splits are set from the answers.
+        :return dict id(result) -> (course, passed), None if the check failed
+        """
+        statuses = [ResultStatus.OK, ResultStatus.MISSING_PUNCH, ResultStatus.OVERTIME]
+        courses = {}
+        for result in r.results:
+            person = result.person
+            if not person or not person.group or person.group.is_any_course:
+                continue
+            if result.status not in statuses or not isinstance(
+                result, ResultSportident
+            ):
+                continue
+            course = r.find_course(result)
+            if course:
+                courses.setdefault(id(course), (course, []))[1].append(result)
+
+        total = len(r.results)
+        logging.debug(
+            'Checking splits of {} course(s) in {} processes'.format(
+                len(courses), workers
+            )
+        )
+        checked = {}
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {}
+                for course, results in courses.values():
+                    controls = course.get_matcher().controls
+                    for i in range(0, len(results), cls.chunk_size):
+                        chunk = results[i : i + cls.chunk_size]
+                        cards = [j.splits.get_codes() for j in chunk]
+                        future = executor.submit(check_cards, controls, cards)
+                        futures[future] = (course, chunk)
+
+                done = 0
+                for future in as_completed(futures):
+                    course, chunk = futures[future]
+                    for result, (passed, flags) in zip(chunk, future.result()):
+                        result.splits.set_checks(flags)
+                        checked[id(result)] = (course, passed)
+                    done += len(chunk)
+                    if progress:
+                        progress(done, total)
+        except Exception as e:
+            logging.exception(e)
+            return None
+        return checked
 
     @staticmethod
     def calculate_penalty(result):
@@ -89,9 +221,50 @@ class ResultChecker:
         if not course:
             return
 
+        ResultChecker.set_penalty(result, course, race())
+
+    @classmethod
+    def calculate_penalty_all(cls, r=None):
+        """Calculate penalty for all results of the race.
+
+        Courses named by bib are looked up in a table of course names built once.
+        """
+        if r is None:
+            r = race()
+        if r.get_setting('marked_route_mode', 'off') == 'off':
+            return
+
+        logging.debug('Penalty calculation for all results')
+        courses_by_name = {}
+        for course in r.courses:
+            courses_by_name.setdefault(course.name, course)
+
+        for result in r.results:
+            person = result.person
+            if person is None or person.group is None:
+                continue
+
+            # the same order of search as in Race.find_course
+            bib = person.bib
+            course = courses_by_name.get(str(bib))
+            if not course and bib > 1000:
+                course = courses_by_name.get('{}.{}'.format(bib % 1000, bib // 1000))
+            if not course:
+                group = person.group
+                if group.is_any_course:
+                    course = r.find_course_by_punches(result)
+                else:
+                    course = group.course
+            if course:
+                cls.set_penalty(result, course, r)
+
+    @staticmethod
+    def set_penalty(result, course, r):
+        """Set penalty laps or time of the result for the course"""
+        mode = r.get_setting('marked_route_mode', 'off')
         controls = course.controls
 
-        if race().get_setting('marked_route_dont_dsq', False):
+        if r.get_setting('marked_route_dont_dsq', False):
             # free order, don't penalty for extra cp
             penalty = ResultChecker.penalty_calculation_free_order(
                 result.splits, controls
@@ -102,7 +275,7 @@ class ResultChecker:
                 result.splits, controls, check_existence=True
             )
 
-        if race().get_setting('marked_route_max_penalty_by_cp', False):
+        if r.get_setting('marked_route_max_penalty_by_cp', False):
             # limit the penalty by quantity of controls
             penalty = min(len(controls), penalty)
 
@@ -110,7 +283,7 @@ class ResultChecker:
             result.penalty_laps = penalty
         elif mode == 'time':
             time_for_one_penalty = OTime(
-                msec=race().get_setting('marked_route_penalty_time', 60000)
+                msec=r.get_setting('marked_route_penalty_time', 60000)
             )
             result.penalty_time = time_for_one_penalty * penalty
 
@@ -140,29 +313,47 @@ class ResultChecker:
 
         wildcard support for free order
         origin: *,*,* athlete: 31; result:2
-        origin: *,*,* athlete: 31,31; result:2
-        origin: *,*,* athlete: 31,31,31,31; result:3
+        origin: *,*,* athlete: 31,31; result:1
+        origin: *,*,* athlete: 31,31,31,31; result:1
         """
-        user_array = [i.code for i in splits]
+        user_array = get_split_codes(splits)
         origin_array = [i.get_number_code() for i in controls]
         res = 0
         if check_existence and len(user_array) < len(origin_array):
             # add 1 penalty score for missing points
             res = len(origin_array) - len(user_array)
 
+        if '0' not in origin_array:
+            # every control removes one punch with its code, what is left is incorrect
+            # and duplicated values
+            return res + sum((Counter(user_array) - Counter(origin_array)).values())
+
+        # wildcard removes the first punch left, so punches are removed in order:
+        # positions of every code and the first position not removed yet
+        positions = {}
+        for index, code in enumerate(user_array):
+            positions.setdefault(code, deque()).append(index)
+        removed = [False] * len(user_array)
+        left = len(user_array)
+        first = 0
         for i in origin_array:
             # remove correct points (only one object per loop)
-
-            if i == '0' and len(user_array):
-                del user_array[0]
-
-            elif i in user_array:
-                user_array.remove(i)
-
-        # now user_array contains only incorrect and duplicated values
-        res += len(user_array)
-
-        return res
+            if i == '0':
+                while first < len(removed) and removed[first]:
+                    first += 1
+                if first == len(removed):
+                    continue
+                removed[first] = True
+                left -= 1
+            elif i in positions:
+                code_positions = positions[i]
+                while code_positions and removed[code_positions[0]]:
+                    code_positions.popleft()
+                if code_positions:
+                    removed[code_positions.popleft()] = True
+                    left -= 1
+
+        return res + left
 
     @staticmethod
     def penalty_calculation_free_order(splits, controls):
@@ -197,31 +388,23 @@ class ResultChecker:
 
     @staticmethod
     def get_control_score(code):
-        obj = race()
-        control = find(obj.controls, code=str(code))
-        if control and control.score:
-            return control.score
-
-        if obj.get_setting('result_processing_score_mode', 'fixed') == 'fixed':
-            return obj.get_setting(
-                'result_processing_fixed_score_value', 1.0
-            )  # fixed score per control
-        else:
-            return int(code) // 10  # score = code / 10
+        return ControlScores(race()).get_score(code)
 
     @staticmethod
-    def calculate_scores_rogain(result):
-        user_array = []
+    def calculate_scores_rogain(result, control_scores=None):
+        if control_scores is None:
+            control_scores = ControlScores(race())
+        user_codes = set()
         ret = 0
-        for cur_split in result.splits:
-            code = str(cur_split.code)
-            if code not in user_array:
-                user_array.append(code)
-                ret += ResultChecker.get_control_score(code)
+        for code in get_split_codes(result.splits):
+            code = str(code)
+            if code not in user_codes:
+                user_codes.add(code)
+                ret += control_scores.get_score(code)
         if result.person and result.person.group:
             user_time = result.get_result_otime()
             max_time = result.person.group.max_time
-            if OTime() < max_time < user_time:
+            if OTime.ZERO < max_time < user_time:
                 time_diff = user_time - max_time
                 seconds_diff = time_diff.to_sec()
                 minutes_diff = (seconds_diff + 59) // 60  # note, 1:01 = 2 minutes
@@ -7,24 +7,36 @@ from sportorg.models.start.relay import get_team_result
 
 
 class ScoreCalculation(object):
-    def __init__(self, r):
+    def __init__(self, r, calculation=None):
         self.race = r
+        self.calculation = calculation or ResultCalculation(r)
+        self.scores_type = self.race.get_setting('scores_mode', 'off')
+        self.scores_array = str(self.race.get_setting('scores_array', '0')).split(',')
         self.formula = None
         self.wrong_formula = False
-        if self.race.get_setting('scores_mode', 'off') == 'formula':
+        self._code = None
+        if self.scores_type == 'formula':
             self.formula = str(self.race.get_setting('scores_formula', '0'))
+        self._leader_times = {}
 
     def get_scores_by_formula(self, leader, time):
         if self.formula and not self.wrong_formula:
             try:
-                return max(eval(self.formula, {}, {'leader': leader, 'time': time}), 0)
+                if self._code is None:
+                    self._code = compile(self.formula, '<scores_formula>', 'eval')
+                return max(eval(self._code, {}, {'leader': leader, 'time': time}), 0)
             except Exception as e:
                 logging.error(str(e))
                 self.wrong_formula = True
         return 0
 
+    def reset(self):
+        """Drop leader times, e.g. after results were recalculated"""
+        self._leader_times = {}
+
     def calculate_scores(self):
         logging.debug('Score calculation')
+        self.reset()
         for i in self.race.results:
             self.calculate_scores_result(i)
 
@@ -36,11 +48,9 @@ class ScoreCalculation(object):
             ) == RaceType.RELAY and get_team_result(result.person) == OTime(0):
                 place = 0
             if place > 0:
-                scores_type = self.race.get_setting('scores_mode', 'off')
+                scores_type = self.scores_type
                 if scores_type == 'array':
-                    scores_array = str(
-                        self.race.get_setting('scores_array', '0')
-                    ).split(',')
+                    scores_array = self.scores_array
                     if len(scores_array):
                         if place > len(scores_array):
                             result.scores = int(scores_array[-1])
@@ -69,21 +79,26 @@ class ScoreCalculation(object):
         if result and isinstance(result, Result):
             if result.person and result.person.group:
                 group = result.person.group
-                results = ResultCalculation(self.race).get_group_finishes(group)
-                best_time = None
-                for cur_result in results:
-                    if not cur_result.is_status_ok():
-                        continue
-                    if self.race.get_type(group) == RaceType.RELAY:
-                        cur_time = get_team_result(cur_result.person)
-                    else:
-                        cur_time = cur_result.get_result_otime()
-                    if not best_time or cur_time < best_time:
-                        if cur_time > OTime(0):
-                            best_time = cur_time
-                return best_time
+                if group not in self._leader_times:
+                    self._leader_times[group] = self.get_group_leader_time(group)
+                return self._leader_times[group]
         return None
 
+    def get_group_leader_time(self, group):
+        is_relay = self.race.get_type(group) == RaceType.RELAY
+        best_time = None
+        for cur_result in self.calculation.get_group_finishes(group):
+            if not cur_result.is_status_ok():
+                continue
+            if is_relay:
+                cur_time = get_team_result(cur_result.person)
+            else:
+                cur_time = cur_result.get_result_otime()
+            if not best_time or cur_time < best_time:
+                if cur_time > OTime(0):
+                    best_time = cur_time
+        return best_time
+
     def get_group_team_results(self, group, team):
         ret = []
         for result in self.race.results:
@@ -1,4 +1,5 @@
 import logging
+from array import array
 
 from sportorg.models.memory import Course, Qualification, ResultStatus
 from sportorg.models.result.result_calculation import ResultCalculation
@@ -95,6 +96,15 @@ class PersonSplits(object):
 
         return None
 
+    def get_legs(self):
+        """One pass version of `get_leg_by_course_index` for all indexes"""
+        legs = {}
+        last_correct_index = self.get_last_correct_index()
+        for i in self.result.splits:
+            if i.course_index <= last_correct_index and i.course_index not in legs:
+                legs[i.course_index] = i
+        return legs
+
     def get_leg_time(self, index):
         leg = self.get_leg_by_course_index(index)
         if leg:
@@ -115,23 +125,90 @@ class PersonSplits(object):
         }
 
 
+class SplitMatrix(object):
+    """Leg and relative times of a group, course controls x persons.
+
+    Times are stored in msec, column by column, `missing` marks persons
+    without a correct split for the control.
+    """
+
+    missing = 2**63 - 1
+
+    def __init__(self, person_splits, cp_count):
+        self.count = len(person_splits)
+        self.cp_count = cp_count
+        size = self.count * cp_count
+        self.legs = [None] * size
+        self.leg_times = array('q', [self.missing]) * size
+        self.relative_times = array('q', [self.missing]) * size
+        for row, person in enumerate(person_splits):
+            for index, leg in person.get_legs().items():
+                if 0 <= index < cp_count:
+                    cell = index * self.count + row
+                    self.legs[cell] = leg
+                    self.leg_times[cell] = leg.leg_time.to_msec()
+                    self.relative_times[cell] = leg.relative_time.to_msec()
+
+    def column(self, index, relative=False):
+        start = index * self.count
+        times = self.relative_times if relative else self.leg_times
+        return times[start : start + self.count]
+
+    def get_leg(self, index, row):
+        return self.legs[index * self.count + row]
+
+    def rank(self, index, order, relative=False):
+        """Sort `order` (rows) by the column and return places
+
+        Equal times share the place. The sort is stable and missing times go
+        last, as in `GroupSplits.sort_by_leg`.
+        """
+        column = self.column(index, relative)
+        order.sort(key=column.__getitem__)
+        places = []
+        prev_time = None
+        place = 0
+        for i, row in enumerate(order):
+            time = column[row]
+            if time == self.missing:
+                break
+            if time != prev_time:
+                place = i + 1
+                prev_time = time
+            places.append((row, place))
+        return places
+
+
 class GroupSplits(object):
-    def __init__(self, r, group):
+    def __init__(self, r, group, calculation=None):
         self.race = r
         self.group = group
+        self.calculation = calculation or ResultCalculation(r)
         self.cp_count = len(self.group.course.controls) if self.group.course else 0
 
         self.person_splits = []
 
         self.leader = {}
 
+    @classmethod
+    def get(cls, r, group, calculation=None, logged=False):
+        """Generated splits of the group, reused until the group is changed"""
+        calculation = calculation or ResultCalculation(r)
+        version = r.update_group_version(group, calculation.get_group_state(group))
+        splits = r.get_group_cache(group, version)
+        if isinstance(splits, cls) and splits.group is group:
+            return splits
+        splits = cls(r, group, calculation).generate(logged)
+        r.set_group_cache(group, version, splits)
+        return splits
+
     def generate(self, logged=False):
         if logged:
             logging.debug('Group splits generate for ' + self.group.name)
         # to have group count
-        ResultCalculation(self.race).get_group_persons(self.group)
+        self.calculation.get_group_persons(self.group)
 
-        for i in ResultCalculation(self.race).get_group_finishes(self.group):
+        for i in self.calculation.get_group_finishes(self.group):
             self.person_splits.append(PersonSplits(self.race, i).generate())
 
         self.set_places()
@@ -142,16 +219,27 @@ class GroupSplits(object):
         return self
 
     def set_places(self):
-        len_persons = len(self.person_splits)
+        if not self.cp_count:
+            return
+        matrix = SplitMatrix(self.person_splits, self.cp_count)
+        order = list(range(len(self.person_splits)))
         for i in range(self.cp_count):
-            self.sort_by_leg(i)
-            self.set_places_for_leg(i)
-            if not len_persons > 0:
+            places = matrix.rank(i, order)
+            if not order:
                 continue
-            self.set_leg_leader(i, self.person_splits[0])
+            leader_time = None
+            if places:
+                leader_time = matrix.get_leg(i, order[0]).leg_time
+            for row, place in places:
+                leg = matrix.get_leg(i, row)
+                leg.leg_place = place
+                leg.leader_time = leader_time
+            self.set_leg_leader(i, self.person_splits[order[0]])
+
+            for row, place in matrix.rank(i, order, relative=True):
+                matrix.get_leg(i, row).relative_place = place
 
-            self.sort_by_leg(i, relative=True)
-            self.set_places_for_leg(i, relative=True)
+        self.person_splits = [self.person_splits[row] for row in order]
 
     def sort_by_leg(self, index, relative=False):
         if relative:
@@ -184,7 +272,7 @@ class GroupSplits(object):
             priority = 0
             if item.result.status in status_priority:
                 priority = status_priority.index(item.result.status) + 1
-            return item.result is None, priority, item.result
+            return item.result is None, priority, self.calculation.sort_key(item.result)
 
         self.person_splits = sorted(self.person_splits, key=sort_func)
 
@@ -257,11 +345,12 @@ class GroupSplits(object):
 
 
 class RaceSplits(object):
-    def __init__(self, r):
+    def __init__(self, r, calculation=None):
         self.race = r
+        self.calculation = calculation or ResultCalculation(r)
 
     def generate(self):
         logging.debug('Race splits generate')
         for group in self.race.groups:
-            GroupSplits(self.race, group).generate()
+            GroupSplits.get(self.race, group, self.calculation)
         return self
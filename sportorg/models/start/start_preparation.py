@@ -280,7 +280,7 @@ class StartNumberManager(object):
             # first find minimal start time
             first_start = min(persons, key=lambda x: x.start_time).start_time
             if not first_start:
-                first_start = OTime()
+                first_start = OTime.ZERO
 
             # find number >= initial first number and have %100 = first start minute
             minute = first_start.minute
@@ -441,7 +441,7 @@ def change_start_time(if_add, time_offset):
     obj = race()
     for person in obj.persons:
         if person.start_time is None:
-            person.start_time = OTime()
+            person.start_time = OTime.ZERO
         if if_add:
             person.start_time = person.start_time + time_offset
         else:
@@ -0,0 +1,177 @@
+"""Background autosave of the event to rotating copies next to the event file.
+
+The snapshot is taken in the caller (GUI) thread: every race is turned into the
+dicts of the JSON format, which is a consistent copy of the model at that
+moment. Encoding and writing is done in a worker thread, one small object at a
+time, so the GUI thread (and card readout) is never blocked by the disk.
+
+The newest copy is `<file>.autosave-1.json`, older copies are shifted up to
+`<file>.autosave-<generations>.json`. Each copy is written to a temporary file
+and renamed, so a copy on disk is always complete.
+"""
+
+import copy
+import json
+import logging
+import os
+import threading
+import time
+
+from boltons.fileutils import atomic_rename
+
+from sportorg import config
+from sportorg.models.memory import get_current_race_index, races
+
+
+class AutosaveResult(object):
+    def __init__(self, file_name, size=0, duration=0.0, error=None):
+        self.file_name = file_name
+        self.size = size
+        self.duration = duration
+        self.error = error
+
+    def __repr__(self):
+        return '{} {} bytes {:.3f} s'.format(self.file_name, self.size, self.duration)
+
+
+def get_file_name(file_name, generation):
+    """Copies are always in JSON format, binary event files included"""
+    name, _ = os.path.splitext(file_name)
+    return '{}.autosave-{}.json'.format(name, generation)
+
+
+def snapshot():
+    """:return event data as written by json backup, detached from the model"""
+    from sportorg.modules.backup.json import get_race_dict
+
+    race_dicts = []
+    for obj in races():
+        race_dict = get_race_dict(obj)
+        race_dict['settings'] = copy.deepcopy(race_dict['settings'])
+        race_dicts.append(race_dict)
+    return {
+        'version': config.VERSION.file,
+        'current_race': get_current_race_index(),
+        'races': race_dicts,
+    }
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+
+def _iter_list(items, iter_item=None):
+    yield '['
+    for i, item in enumerate(items):
+        if i:
+            yield ','
+        if iter_item:
+            yield from iter_item(item)
+        else:
+            yield _dumps(item)
+    yield ']'
+
+
+def _iter_race(race_dict):
+    yield '{'
+    for i, key in enumerate(sorted(race_dict)):
+        yield '{}{}:'.format(',' if i else '', _dumps(key))
+        value = race_dict[key]
+        if isinstance(value, list):
+            yield from _iter_list(value)
+        else:
+            yield _dumps(value)
+    yield '}'
+
+
+def iter_json(data):
+    """Encode event data in small chunks, one object of a race at a time"""
+    yield '{'
+    for i, key in enumerate(sorted(data)):
+        yield '{}{}:'.format(',' if i else '', _dumps(key))
+        if key == 'races':
+            yield from _iter_list(data[key], _iter_race)
+        else:
+            yield _dumps(data[key])
+    yield '}'
+
+
+class Autosave(object):
+    """Autosave of one event file at a time, at most one write is running"""
+
+    def __init__(self, generations=3):
+        self.generations = generations
+        self.thread = None
+        self.result = None  # type: AutosaveResult
+        self._lock = threading.Lock()
+
+    def is_running(self):
+        return self.thread is not None
+
+    def start(self, file_name):
+        """Take the snapshot now and write it in a thread
+
+        :return False if the previous autosave is still running
+        """
+        if self.is_running():
+            return False
+        data = snapshot()
+        self.thread = threading.Thread(
+            target=self._run, args=(file_name, data), daemon=True
+        )
+        self.thread.start()
+        return True
+
+    def pop_result(self):
+        """:return result of the finished autosave once, None while running"""
+        with self._lock:
+            result = self.result
+            self.result = None
+        return result
+
+    def wait(self):
+        thread = self.thread
+        if thread is not None:
+            thread.join()
+
+    def _run(self, file_name, data):
+        start = time.perf_counter()
+        try:
+            size = self.write(file_name, data)
+            result = AutosaveResult(
+                get_file_name(file_name, 1), size, time.perf_counter() - start
+            )
+            logging.debug('Autosave: {}'.format(result))
+        except Exception as e:
+            logging.exception(e)
+            result = AutosaveResult(get_file_name(file_name, 1), error=e)
+        with self._lock:
+            self.result = result
+            self.thread = None
+
+    def write(self, file_name, data):
+        """Write `data` as the newest copy of `file_name`
+
+        :return bytes written
+        """
+        tmp_name = get_file_name(file_name, 1) + '.tmp'
+        size = 0
+        with open(tmp_name, 'wb') as f:
+            for chunk in iter_json(data):
+                chunk = chunk.encode('utf-8')
+                f.write(chunk)
+                size += len(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        self.rotate(file_name)
+        atomic_rename(tmp_name, get_file_name(file_name, 1), overwrite=True)
+        return size
+
+    def rotate(self, file_name):
+        """Shift existing copies one generation up, the oldest is dropped"""
+        for generation in range(max(self.generations, 1), 1, -1):
+            older = get_file_name(file_name, generation - 1)
+            if os.path.exists(older):
+                atomic_rename(
+                    older, get_file_name(file_name, generation), overwrite=True
+                )
@@ -1,38 +1,478 @@
+"""Compact binary event file.
+
+Layout, little endian:
+
+    header    magic, format version u16, count of sections u32
+    table     per section: race index u16 (0xffff - event), name 16s,
+              offset u64, size u64
+    sections  zlib compressed
+
+The `event` section is JSON with the file version, the current race and the
+ids of races. Every race has a `race` section (JSON with id, data, settings and
+fingerprint), a `strings` section (string table of the race) and one section
+per collection. A collection is a table of the `to_dict` values by columns:
+ints are fixed width arrays, strings are indexes in the string table, so equal
+names, teams and groups are stored and loaded once, lists of objects (course
+controls, splits) are child tables. Splits keep only the punch data, legs are
+calculated after open.
+
+On open the current race is decoded, other races are decoded on first access,
+see `memory.Event`. Races not accessed are saved back as they were read.
+Files of the old format (pickle of the current race) are still opened.
+"""
+
+import json
 import pickle
+import struct
+import sys
 import uuid
+import zlib
+from array import array
+from itertools import accumulate
 
 from sportorg import config
 from sportorg.models import memory
+from sportorg.models.memory import Event, Punches, Race, code_to_int, code_to_str
+from sportorg.models.result.fingerprint import is_fingerprint_valid
+from sportorg.modules.backup.json import get_race_dict, load_event
 
+MAGIC = b'SPORTORG'
+FORMAT_VERSION = 1
+EXTENSION = '.sportorg'
+
+_HEADER = struct.Struct('<8sHI')
+_ENTRY = struct.Struct('<H16sQQ')
+_COUNT = struct.Struct('<I')
+_EVENT_INDEX = 0xFFFF
+
+COLLECTIONS = ['organizations', 'courses', 'groups', 'persons', 'results']
+
+# string indexes with special meaning
+NONE_INDEX = 0xFFFFFFFF
+MISSING_INDEX = 0xFFFFFFFE
+
+# value of a row without the key of a column
+MISSING = object()
+
+# null of int64 columns
+NULL = -(2**63)
+
+# data of a split stored in the file, other keys are calculated
+SPLIT_KEYS = ('code', 'time', 'days', 'is_correct')
+
+
+class BinaryFormatError(Exception):
+    pass
+
+
+def _to_bytes(arr):
+    if sys.byteorder == 'big':
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _from_bytes(typecode, data):
+    arr = array(typecode)
+    arr.frombytes(data)
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr
+
+
+def _json(value):
+    return json.dumps(value, sort_keys=True, ensure_ascii=False)
+
+
+class StringTable(object):
+    """Interned strings of one race"""
+
+    def __init__(self, strings=None):
+        self.strings = strings or []  # type: list
+        self._indexes = {value: i for i, value in enumerate(self.strings)}
+
+    def add(self, value):
+        index = self._indexes.get(value)
+        if index is None:
+            index = len(self.strings)
+            self.strings.append(value)
+            self._indexes[value] = index
+        return index
+
+    def encode(self):
+        blobs = [i.encode('utf-8') for i in self.strings]
+        lengths = array('I', [len(i) for i in blobs])
+        return _COUNT.pack(len(blobs)) + _to_bytes(lengths) + b''.join(blobs)
+
+    @classmethod
+    def decode(cls, data):
+        (count,) = _COUNT.unpack_from(data)
+        start = _COUNT.size + count * 4
+        lengths = _from_bytes('I', data[_COUNT.size : start])
+        ends = list(accumulate(lengths, initial=start))
+        strings = [data[ends[i] : ends[i + 1]].decode('utf-8') for i in range(count)]
+        return cls(strings)
+
+
+def _get_type(values):
+    """:return type of column: b - bool, i - int32, q - int64, n - int64 or None,
+    d - float, c - str of plain number, s - str or None, t - list of dicts,
+    j - JSON"""
+    kinds = set(type(i) for i in values)
+    if kinds <= {bool}:
+        return 'b'
+    if kinds <= {float}:
+        return 'd'
+    if kinds <= {int}:
+        if all(-(2**31) <= i < 2**31 for i in values):
+            return 'i'
+        return 'q' if all(-(2**63) < i < 2**63 for i in values) else 'j'
+    if kinds <= {int, type(None)}:
+        if all(i is None or -(2**63) < i < 2**63 for i in values):
+            return 'n'
+        return 'j'
+    if kinds <= {str}:
+        if all(code_to_int(i) >= 0 for i in values):
+            return 'c'
+        return 's'
+    if kinds <= {str, type(None)}:
+        return 's'
+    if kinds <= {list} and all(isinstance(j, dict) for i in values for j in i):
+        return 't'
+    return 'j'
 
-def dump(file):
-    data = {'version': config.VERSION}
-    obj = memory.race()
 
-    data['id'] = str(obj.id)
-    data['data'] = obj.data
-    data['courses'] = obj.courses
-    data['groups'] = obj.groups
-    data['persons'] = obj.persons
-    data['results'] = obj.results
-    data['organizations'] = obj.organizations
-    data['settings'] = obj.settings
-    pickle.dump(data, file)
+def encode_table(rows, strings):
+    """:return bytes of the list of dicts `rows` stored by columns"""
+    keys = []
+    for row in rows:
+        for key in row:
+            if key not in keys:
+                keys.append(key)
+    columns = []
+    blobs = []
+    for key in keys:
+        values = [row.get(key) for row in rows]
+        column_type = _get_type(values)
+        if any(key not in row for row in rows):
+            column_type = 'j'
+        if column_type == 'b':
+            blob = bytes(bytearray(values))
+        elif column_type in 'iqd':
+            blob = _to_bytes(array(column_type, values))
+        elif column_type == 'n':
+            blob = _to_bytes(array('q', [NULL if i is None else i for i in values]))
+        elif column_type == 'c':
+            blob = _to_bytes(array('i', [code_to_int(i) for i in values]))
+        elif column_type == 's':
+            blob = _to_bytes(
+                array(
+                    'I', [NONE_INDEX if i is None else strings.add(i) for i in values]
+                )
+            )
+        elif column_type == 't':
+            counts = array('I', [len(i) for i in values])
+            children = [j for i in values for j in i]
+            blob = _to_bytes(counts) + encode_table(children, strings)
+        else:
+            blob = _to_bytes(
+                array(
+                    'I',
+                    [
+                        strings.add(_json(row[key])) if key in row else MISSING_INDEX
+                        for row in rows
+                    ],
+                )
+            )
+        columns.append([key, column_type, len(blob)])
+        blobs.append(blob)
+    header = _json({'rows': len(rows), 'columns': columns}).encode('utf-8')
+    return _COUNT.pack(len(header)) + header + b''.join(blobs)
+
+
+class Table(object):
+    """Decoded columns of a table, int and code columns are arrays"""
+
+    def __init__(self, rows, columns, types, children):
+        self.rows = rows
+        self.columns = columns  # key -> list or array
+        self.types = types  # key -> column type
+        self.children = children  # key -> (counts, Table)
+
+    def get_rows(self):
+        """:return list of dicts, child tables are turned into lists of dicts"""
+        columns = {}
+        for key, values in self.columns.items():
+            if self.types.get(key) == 'c':
+                values = [code_to_str(i) for i in values]
+            elif isinstance(values, array):
+                values = values.tolist()
+            columns[key] = values
+        for key, (counts, table) in self.children.items():
+            children = table.get_rows()
+            ends = list(accumulate(counts, initial=0))
+            columns[key] = [children[ends[i] : ends[i + 1]] for i in range(self.rows)]
+        keys = list(columns)
+        rows = [dict(zip(keys, values)) for values in zip(*columns.values())]
+        if not keys:
+            rows = [{} for _ in range(self.rows)]
+        for key, values in columns.items():
+            if self.types.get(key) == 'j' and MISSING in values:
+                for row in rows:
+                    if row[key] is MISSING:
+                        del row[key]
+        return rows
+
+
+def decode_table(data, strings, offset=0):
+    """:return Table and the offset after it"""
+    (size,) = _COUNT.unpack_from(data, offset)
+    offset += _COUNT.size
+    header = json.loads(data[offset : offset + size].decode('utf-8'))
+    offset += size
+    rows = header['rows']
+    columns = {}
+    types = {}
+    children = {}
+    for key, column_type, size in header['columns']:
+        types[key] = column_type
+        blob = data[offset : offset + size]
+        offset += size
+        if column_type == 'b':
+            columns[key] = [bool(i) for i in blob]
+        elif column_type in 'iqd':
+            columns[key] = _from_bytes(column_type, blob)
+        elif column_type == 'n':
+            columns[key] = [
+                None if i == NULL else i for i in _from_bytes('q', blob).tolist()
+            ]
+        elif column_type == 'c':
+            columns[key] = _from_bytes('i', blob)
+        elif column_type == 's':
+            values = strings.strings
+            columns[key] = [
+                None if i == NONE_INDEX else values[i]
+                for i in _from_bytes('I', blob).tolist()
+            ]
+        elif column_type == 't':
+            counts = _from_bytes('I', blob[: rows * 4])
+            table, _ = decode_table(blob, strings, rows * 4)
+            children[key] = (counts, table)
+        elif column_type == 'j':
+            values = strings.strings
+            columns[key] = [
+                MISSING if i == MISSING_INDEX else json.loads(values[i])
+                for i in _from_bytes('I', blob).tolist()
+            ]
+        else:
+            raise BinaryFormatError('Unknown column type {}'.format(column_type))
+    return Table(rows, columns, types, children), offset
+
+
+def encode_race(race_dict):
+    """:return dict of section name -> bytes (not compressed)"""
+    strings = StringTable()
+    sections = {}
+    head = {key: value for key, value in race_dict.items() if key not in COLLECTIONS}
+    sections['race'] = _json(head).encode('utf-8')
+    for key in COLLECTIONS:
+        rows = race_dict.get(key, [])
+        if key == 'results':
+            rows = [
+                dict(
+                    row,
+                    splits=[
+                        {i: split.get(i) for i in SPLIT_KEYS}
+                        for split in row.get('splits', [])
+                    ],
+                )
+                for row in rows
+            ]
+        sections[key] = encode_table(rows, strings)
+    sections['strings'] = strings.encode()
+    return sections
+
+
+def _get_punches(counts, table):
+    """:return list of Punches per row or None if splits have codes not numbers"""
+    columns = table.columns
+    types = table.types
+    if table.children or set(columns) != set(SPLIT_KEYS):
+        return None
+    if table.rows and (types['code'] != 'c' or types['days'] != 'i'):
+        return None
+    codes = array('i', columns['code'])
+    if types['time'] in 'iq':
+        times = array('q', columns['time'])
+    else:
+        times = array('q', [i or 0 for i in columns['time']])
+    days = array('i', columns['days'])
+    checks = bytearray(1 if i else 0 for i in columns['is_correct'])
+    ret = []
+    start = 0
+    for count in counts:
+        end = start + count
+        ret.append(
+            Punches.from_columns(
+                codes[start:end], times[start:end], days[start:end], checks[start:end]
+            )
+        )
+        start = end
+    return ret
+
+
+def decode_race(sections):
+    """:return race from dict of section name -> bytes (not compressed)"""
+    strings = StringTable.decode(sections['strings'])
+    race_dict = json.loads(sections['race'].decode('utf-8'))
+    punches = None
+    for key in COLLECTIONS:
+        table, _ = decode_table(sections[key], strings)
+        if key == 'results' and 'splits' in table.children:
+            counts, splits = table.children['splits']
+            punches = _get_punches(counts, splits)
+            if punches is not None:
+                del table.children['splits']
+                table.columns['splits'] = [[]] * table.rows
+        race_dict[key] = table.get_rows()
+    obj = Race()
+    obj.id = uuid.UUID(str(race_dict['id']))
+    obj.load_data(race_dict)
+    if punches is not None:
+        results = {str(i.id): i for i in obj.results}
+        for row, row_punches in zip(race_dict['results'], punches):
+            result = results.get(row['id'])
+            if result is not None and isinstance(result.splits, Punches):
+                result.splits = row_punches
+    obj.fingerprint_valid = is_fingerprint_valid(race_dict)
+    return obj
+
+
+class LazyRace(object):
+    """Race of a binary file decoded on first access"""
+
+    def __init__(self, race_id, sections):
+        self.id = race_id
+        self.sections = sections  # name -> compressed bytes
+
+    def load(self):
+        return decode_race(
+            {name: zlib.decompress(data) for name, data in self.sections.items()}
+        )
+
+
+def write(file, sections):
+    """Write list of (race index, name, compressed bytes)"""
+    offset = _HEADER.size + _ENTRY.size * len(sections)
+    table = []
+    for race_index, name, data in sections:
+        table.append(_ENTRY.pack(race_index, name.encode('ascii'), offset, len(data)))
+        offset += len(data)
+    file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(sections)))
+    file.write(b''.join(table))
+    for _, _, data in sections:
+        file.write(data)
+
+
+def read(file):
+    """:return list of (race index, name, compressed bytes)"""
+    data = file.read()
+    if len(data) < _HEADER.size:
+        raise BinaryFormatError('File is too short')
+    magic, version, count = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise BinaryFormatError('Not a SportOrg binary file')
+    if version > FORMAT_VERSION:
+        raise BinaryFormatError('Unsupported format version {}'.format(version))
+    ret = []
+    for i in range(count):
+        race_index, name, offset, size = _ENTRY.unpack_from(
+            data, _HEADER.size + i * _ENTRY.size
+        )
+        ret.append(
+            (
+                race_index,
+                name.rstrip(b'\0').decode('ascii'),
+                data[offset : offset + size],
+            )
+        )
+    return ret
+
+
+def is_binary(file_name):
+    try:
+        with open(file_name, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def dump(file):
+    event = memory.races()
+    race_ids = []
+    sections = []
+    for index, item in enumerate(list.__iter__(event)):
+        if isinstance(item, LazyRace):
+            # not accessed, saved as read
+            race_ids.append(item.id)
+            for name, data in item.sections.items():
+                sections.append((index, name, data))
+            continue
+        race_ids.append(str(item.id))
+        for name, data in encode_race(get_race_dict(item)).items():
+            sections.append((index, name, zlib.compress(data)))
+    head = {
+        'version': config.VERSION.file,
+        'current_race': memory.get_current_race_index(),
+        'races': race_ids,
+    }
+    sections.insert(
+        0, (_EVENT_INDEX, 'event', zlib.compress(_json(head).encode('utf-8')))
+    )
+    write(file, sections)
 
 
 def load(file):
+    start = file.tell()
+    if file.read(len(MAGIC)) != MAGIC:
+        file.seek(start)
+        load_pickle(file)
+        return
+    file.seek(start)
+    sections = read(file)
+    head = None
+    races = {}
+    for race_index, name, data in sections:
+        if race_index == _EVENT_INDEX:
+            if name == 'event':
+                head = json.loads(zlib.decompress(data).decode('utf-8'))
+            continue
+        races.setdefault(race_index, {})[name] = data
+    if head is None:
+        raise BinaryFormatError('No event section')
+    event = Event()
+    for index, race_id in enumerate(head['races']):
+        event.append(LazyRace(race_id, races.get(index, {})))
+    current_race = int(head.get('current_race', 0))
+    if not 0 <= current_race < len(event):
+        current_race = 0
+    # the current race is decoded now
+    event[current_race]
+    load_event(event, current_race)
+
+
+def load_pickle(file):
+    """Open file of the old format with the current race"""
     data = pickle.load(file)
     if not ('version' in data):
         return
-    # FIXME
-    if True or data['version'] == config.VERSION:
-        obj = memory.race()
-        if 'id' in data:
-            obj.id = uuid.UUID(data['id'])
-        obj.data = data['data']
-        obj.courses = data['courses']
-        obj.groups = data['groups']
-        obj.persons = data['persons']
-        obj.results = data['results']
-        obj.organizations = data['organizations']
-        obj.settings = data['settings']
+    obj = memory.race()
+    if 'id' in data:
+        obj.id = uuid.UUID(data['id'])
+    obj.data = data['data']
+    obj.courses = data['courses']
+    obj.groups = data['groups']
+    obj.persons = data['persons']
+    obj.results = data['results']
+    obj.organizations = data['organizations']
+    obj.settings = data['settings']
@@ -1,11 +1,14 @@
+import os
+
 from boltons.fileutils import atomic_rename
 
-from . import binary, json
+from . import binary, journal, json
 
 
 class File:
     BINARY = 'binary'
     JSON = 'json'
+    JOURNAL = 'journal'
 
     def __init__(self, file_name, logger, ft='binary'):
         self._file_name = file_name
@@ -24,6 +27,15 @@ class File:
             self.JSON: 'r',
         }
 
+    @classmethod
+    def get_format(cls, file_name):
+        """:return format by extension, other existing files are checked by content"""
+        if file_name.endswith(binary.EXTENSION):
+            return cls.BINARY
+        if os.path.exists(file_name) and binary.is_binary(file_name):
+            return cls.BINARY
+        return cls.JSON
+
     @staticmethod
     def backup(file_name, func, mode='wb'):
         with open(file_name, mode) as f:
@@ -37,8 +49,13 @@ class File:
             self._factory_mode[self._format],
         )
         atomic_rename(self._file_name + '.tmp', self._file_name, overwrite=True)
+        journal.remove(self._file_name)
 
     def save(self):
+        if self._format == self.JOURNAL:
+            self._logger.info('Save changes ' + self._file_name)
+            journal.save(self._file_name)
+            return
         self._logger.info('Save ' + self._file_name)
         self.backup(
             self._file_name + '.tmp',
@@ -46,9 +63,11 @@ class File:
             self._factory_mode[self._format],
         )
         atomic_rename(self._file_name + '.tmp', self._file_name, overwrite=True)
+        journal.remove(self._file_name)
 
     def open(self):
         self._logger.info('Open ' + self._file_name)
+        journal.reset(self._file_name)
         self.backup(
             self._file_name,
             self._factory[self._format].load,
@@ -0,0 +1,406 @@
+"""Journal save mode: a compact base snapshot plus an append-only log of changes.
+
+The base snapshot is the usual JSON event file written without indentation,
+with the id of its journal in the `journal` key (ignored by older versions).
+The journal `<file>.journal` is a JSON line with its id, then one line per save
+with the object level changes of that save:
+
+    {"current_race": 0, "ops": [[race_id, op, payload], ...]}
+
+op is `delete` ({"object", "id"}), `insert` ([position, object dict]), `put`
+(object dict as shaped by `to_dict`), `race` ({"data", "settings"}) or `order`
+([collection, ids]). Only persons and results stamped by the race index since
+the last save are serialised. Every line is flushed to disk before the save returns.
+An incomplete last line (crash while writing) is ignored on replay.
+The base is rewritten (compacted) in a background thread when the journal grows.
+"""
+
+import copy
+import json
+import logging
+import os
+import threading
+import uuid
+
+from boltons.fileutils import atomic_rename
+
+from sportorg import config
+from sportorg.models.memory import get_current_race_index, races
+
+KEYS = ['organizations', 'courses', 'groups', 'persons', 'results']
+
+# collections the changed objects of which are found by the stamps of the index
+STAMPED = ['persons', 'results']
+
+# object dict key with the id of the referenced object, collection of the object
+REFERENCES = {
+    'groups': [('course', 'course_id', 'courses')],
+    'persons': [
+        ('group', 'group_id', 'groups'),
+        ('organization', 'organization_id', 'organizations'),
+    ],
+    'results': [('person', 'person_id', 'persons')],
+}
+
+_journals = {}  # type: dict
+_lock = threading.Lock()
+
+
+def get_journal_name(file_name):
+    return file_name + '.journal'
+
+
+def dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def write_line(file_name, line, mode='a'):
+    with open(file_name, mode, encoding='utf-8') as f:
+        f.write(line + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class RaceState(object):
+    """Race as it is on disk: order of ids per collection, dicts of the small
+    collections and the change counter of the race index at the save.
+
+    Persons and results are not kept, the objects stamped after the save are
+    changed, see `RaceIndex.stamp`.
+    """
+
+    def __init__(self, race_obj, race_dict):
+        self.data = race_dict['data']
+        self.settings = race_dict['settings']
+        self.objects = {}
+        # ids in the order of the list, the object type of every id
+        self.ids = {}
+        for key in KEYS:
+            if key not in STAMPED:
+                self.objects[key] = {item['id']: item for item in race_dict[key]}
+            self.ids[key] = {item['id']: item['object'] for item in race_dict[key]}
+        self.changes = race_obj.index.changes
+
+    def diff(self, race_obj):
+        """:return ops turning the state into the race, the state is updated"""
+        race_id = str(race_obj.id)
+        index = race_obj.index
+        deletes = []
+        inserts = []
+        puts = []
+        orders = []
+        data = race_obj.data.to_dict()
+        if data != self.data or race_obj.settings != self.settings:
+            settings = copy.deepcopy(race_obj.settings)
+            puts.append([race_id, 'race', {'data': data, 'settings': settings}])
+            self.data = data
+            self.settings = settings
+
+        for key in KEYS:
+            stamped = key in STAMPED
+            old_ids = self.ids[key]
+            objects = {}
+            ids = {}
+            kept = []
+            if stamped:
+                # objects added to the list directly are stamped from now on
+                index.ensure(key)
+            for position, obj in enumerate(getattr(race_obj, key)):
+                obj_id = str(obj.id)
+                ids[obj_id] = obj.__class__.__name__
+                if stamped and obj_id in old_ids:
+                    kept.append(obj_id)
+                    if index.get_stamp(obj) > self.changes:
+                        puts.append([race_id, 'put', obj.to_dict()])
+                    continue
+                item = obj.to_dict()
+                if not stamped:
+                    objects[obj_id] = item
+                if obj_id not in old_ids:
+                    inserts.append([race_id, 'insert', [position, item]])
+                    continue
+                kept.append(obj_id)
+                if self.objects[key][obj_id] != item:
+                    puts.append([race_id, 'put', item])
+            for obj_id, name in old_ids.items():
+                if obj_id not in ids:
+                    deletes.append([race_id, 'delete', {'object': name, 'id': obj_id}])
+            if kept != [i for i in old_ids if i in ids]:
+                # kept objects are moved, insert positions are not enough
+                orders.append([race_id, 'order', [key, list(ids)]])
+            if not stamped:
+                self.objects[key] = objects
+            self.ids[key] = ids
+
+        self.changes = index.changes
+        return deletes + inserts + puts + orders
+
+
+class Journal(object):
+    """Journal of one event file, created on the first journal save"""
+
+    # compact when the journal is bigger than this part of the base
+    compact_ratio = 0.5
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.journal_name = get_journal_name(file_name)
+        self.journal_id = None
+        self.current_race = 0
+        self.race_ids = []
+        self.states = {}
+        self.base_size = 0
+        self.journal_size = 0
+        self.pending = None
+        self.thread = None
+
+    def get_race_dicts(self):
+        ret = []
+        for obj in races():
+            for key in STAMPED:
+                # objects are stamped only in a built index
+                obj.index.ensure(key)
+            race_dict = obj.to_dict()
+            race_dict['settings'] = copy.deepcopy(race_dict['settings'])
+            ret.append(race_dict)
+        return ret
+
+    def save(self):
+        race_ids = [str(i.id) for i in races()]
+        if self.journal_id is None or race_ids != self.race_ids:
+            self.wait()
+            self.write_base(self.get_race_dicts(), new_journal_id())
+            return
+        ops = []
+        for obj in races():
+            ops.extend(self.states[str(obj.id)].diff(obj))
+        current_race = get_current_race_index()
+        if not ops and current_race == self.current_race:
+            return
+        self.current_race = current_race
+        line = dumps({'current_race': current_race, 'ops': ops})
+        with _lock:
+            write_line(self.journal_name, line)
+            self.journal_size += len(line) + 1
+            if self.pending is not None:
+                self.pending.append(line)
+        logging.debug('Journal: {} change(s) saved'.format(len(ops)))
+        if (
+            self.thread is None
+            and self.journal_size > self.base_size * self.compact_ratio
+        ):
+            self.compact(self.get_race_dicts())
+
+    def set_state(self, race_dicts, journal_id):
+        self.journal_id = journal_id
+        self.current_race = get_current_race_index()
+        self.race_ids = [i['id'] for i in race_dicts]
+        self.states = {
+            str(obj.id): RaceState(obj, race_dict)
+            for obj, race_dict in zip(races(), race_dicts)
+        }
+
+    @staticmethod
+    def get_base(race_dicts, journal_id, current_race):
+        from sportorg.modules.backup.json import race_downgrade
+
+        return dumps(
+            {
+                'version': config.VERSION.file,
+                'current_race': current_race,
+                'races': [race_downgrade(i) for i in race_dicts],
+                'journal': journal_id,
+            }
+        )
+
+    def write_base(self, race_dicts, journal_id):
+        """Write the base and an empty journal now"""
+        base = self.get_base(race_dicts, journal_id, get_current_race_index())
+        write_line(self.file_name + '.tmp', base, 'w')
+        atomic_rename(self.file_name + '.tmp', self.file_name, overwrite=True)
+        header = dumps({'journal': journal_id, 'version': config.VERSION.file})
+        write_line(self.journal_name, header, 'w')
+        self.set_state(race_dicts, journal_id)
+        self.base_size = len(base)
+        self.journal_size = len(header) + 1
+
+    def compact(self, race_dicts):
+        """Write the base from `race_dicts` in a thread.
+
+        Lines saved meanwhile go to the current journal and are copied to the new
+        one, which replaces the current journal right after the base is renamed.
+        """
+        journal_id = new_journal_id()
+        self.pending = []
+        self.thread = threading.Thread(
+            target=self._compact,
+            args=(race_dicts, journal_id, get_current_race_index()),
+            daemon=True,
+        )
+        self.thread.start()
+
+    def _compact(self, race_dicts, journal_id, current_race):
+        try:
+            base = self.get_base(race_dicts, journal_id, current_race)
+            write_line(self.file_name + '.tmp', base, 'w')
+            header = dumps({'journal': journal_id, 'version': config.VERSION.file})
+            with _lock:
+                lines = [header] + self.pending
+                write_line(self.journal_name + '.tmp', '\n'.join(lines), 'w')
+                atomic_rename(self.file_name + '.tmp', self.file_name, overwrite=True)
+                atomic_rename(
+                    self.journal_name + '.tmp', self.journal_name, overwrite=True
+                )
+                self.journal_id = journal_id
+                self.base_size = len(base)
+                self.journal_size = sum(len(i) + 1 for i in lines)
+                self.pending = None
+            logging.debug('Journal: compacted {}'.format(self.file_name))
+        except Exception as e:
+            logging.exception(e)
+            with _lock:
+                self.pending = None
+        finally:
+            self.thread = None
+
+    def wait(self):
+        thread = self.thread
+        if thread is not None:
+            thread.join()
+
+
+def new_journal_id():
+    return str(uuid.uuid4())
+
+
+def get_journal(file_name):
+    file_name = os.path.abspath(file_name)
+    if file_name not in _journals:
+        _journals[file_name] = Journal(file_name)
+    return _journals[file_name]
+
+
+def save(file_name):
+    get_journal(file_name).save()
+
+
+def reset(file_name):
+    """Forget the saved state, called when the file is opened"""
+    journal = _journals.pop(os.path.abspath(file_name), None)
+    if journal:
+        journal.wait()
+
+
+def remove(file_name):
+    """Forget the journal of the file, called when the file is saved in full"""
+    reset(file_name)
+    for name in (get_journal_name(file_name), get_journal_name(file_name) + '.tmp'):
+        if os.path.exists(name):
+            os.remove(name)
+
+
+def wait_all():
+    for journal in list(_journals.values()):
+        journal.wait()
+
+
+def read_journal(file_name, journal_id):
+    """:return batches of the journal of the base with `journal_id`
+
+    The journal is looked for in `<file>.journal` and in the copy left by an
+    interrupted compaction.
+    """
+    for name in (get_journal_name(file_name), get_journal_name(file_name) + '.tmp'):
+        if not os.path.exists(name):
+            continue
+        with open(name, encoding='utf-8') as f:
+            lines = f.read().split('\n')
+        try:
+            header = json.loads(lines[0])
+        except ValueError:
+            continue
+        if header.get('journal') != journal_id:
+            continue
+        batches = []
+        for line in lines[1:]:
+            if not line:
+                continue
+            try:
+                batches.append(json.loads(line))
+            except ValueError:
+                logging.warning('Journal: incomplete record skipped')
+                break
+        return batches
+    return []
+
+
+def replay(race_obj, ops):
+    """Apply ops of one race, references are resolved through id maps"""
+    maps = {}
+    for key in KEYS:
+        maps[key] = {str(obj.id): obj for obj in getattr(race_obj, key)}
+    arrays = {key: list(getattr(race_obj, key)) for key in KEYS}
+
+    def apply(obj, item):
+        obj.update_data(item)
+        key = race_obj.support_collection[item['object']]
+        for attr, id_key, collection in REFERENCES.get(key, []):
+            setattr(obj, attr, maps[collection].get(item.get(id_key)))
+
+    for op, payload in ops:
+        if op == 'race':
+            race_obj.data.update_data(payload['data'])
+            race_obj.settings = payload['settings']
+        elif op == 'delete':
+            key = race_obj.support_collection.get(payload['object'])
+            obj = maps[key].pop(payload['id'], None) if key else None
+            if obj is not None:
+                arrays[key] = [i for i in arrays[key] if i is not obj]
+        elif op == 'insert':
+            position, item = payload
+            if item.get('object') not in race_obj.support_obj:
+                continue
+            key = race_obj.support_collection[item['object']]
+            obj = race_obj.support_obj[item['object']]()
+            obj.id = uuid.UUID(item['id'])
+            maps[key][item['id']] = obj
+            apply(obj, item)
+            arrays[key].insert(position, obj)
+        elif op == 'put':
+            key = race_obj.support_collection.get(payload.get('object'))
+            obj = maps[key].get(payload['id']) if key else None
+            if obj is not None:
+                apply(obj, payload)
+        elif op == 'order':
+            key, ids = payload
+            ordered = [maps[key][i] for i in ids if i in maps[key]]
+            used = set(id(i) for i in ordered)
+            arrays[key] = ordered + [i for i in arrays[key] if id(i) not in used]
+
+    for key in KEYS:
+        setattr(race_obj, key, arrays[key])
+
+
+def apply_journal(file_name, journal_id, event, current_race):
+    """Replay the journal of the base on the races loaded from it
+
+    :return current race index
+    """
+    batches = read_journal(file_name, journal_id)
+    if not batches:
+        return current_race
+    by_id = {str(i.id): i for i in event}
+    ops = {}
+    for batch in batches:
+        for race_id, op, payload in batch['ops']:
+            ops.setdefault(race_id, []).append((op, payload))
+        current_race = int(batch.get('current_race', current_race))
+    for race_id, race_ops in ops.items():
+        if race_id in by_id:
+            replay(by_id[race_id], race_ops)
+    logging.info(
+        'Journal: {} save(s) replayed from {}'.format(
+            len(batches), get_journal_name(file_name)
+        )
+    )
+    return current_race
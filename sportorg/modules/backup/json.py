@@ -4,79 +4,341 @@ import uuid
 from sportorg import config
 from sportorg.models.memory import (
     Race,
+    RaceLoader,
     get_current_race_index,
     new_event,
     race,
     races,
     set_current_race_index,
 )
-from sportorg.models.result.result_calculation import ResultCalculation
-from sportorg.models.result.result_checker import ResultChecker
-from sportorg.models.result.score_calculation import ScoreCalculation
-from sportorg.models.result.split_calculation import RaceSplits
+from sportorg.models.result.fingerprint import (
+    COLLECTIONS,
+    calculate_race,
+    get_race_fingerprint,
+    is_fingerprint_valid,
+    restore_calculation,
+)
+from sportorg.modules.backup.journal import apply_journal
+
+# collections written and read one object at a time
+STREAMED = ['organizations', 'persons', 'results']
+
+# keys of the event, other keys of the top object are of a single race (old files)
+EVENT_KEYS = ['version', 'current_race', 'races', 'journal']
+
+
+def _dumps(value, level):
+    """Same text as `json.dump` with indent 2 gives for `value` at `level`"""
+    text = json.dumps(value, sort_keys=True, indent=2, ensure_ascii=False)
+    return text.replace('\n', '\n' + '  ' * level)
+
+
+class LazyList(object):
+    """List of the file made one item at a time on write"""
+
+    def __init__(self, items, to_value):
+        self.items = items
+        self.to_value = to_value
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        for item in self.items:
+            yield self.to_value(item)
+
+
+def _is_lazy(value):
+    if isinstance(value, LazyList):
+        return True
+    return isinstance(value, dict) and any(
+        isinstance(i, LazyList) for i in value.values()
+    )
+
+
+def iter_dump(value, level=0):
+    """Encode `value` in chunks, `LazyList` values are encoded item by item"""
+    if isinstance(value, LazyList) and not len(value):
+        yield '[]'
+        return
+    if not _is_lazy(value):
+        yield _dumps(value, level)
+        return
+    indent = '\n' + '  ' * (level + 1)
+    if isinstance(value, dict):
+        yield '{'
+        for i, key in enumerate(sorted(value)):
+            yield '{}{}{}: '.format(',' if i else '', indent, _dumps(key, 0))
+            yield from iter_dump(value[key], level + 1)
+        yield '\n' + '  ' * level + '}'
+    else:
+        yield '['
+        for i, item in enumerate(value):
+            yield (',' if i else '') + indent
+            yield from iter_dump(item, level + 1)
+        yield '\n' + '  ' * level + ']'
+
+
+def get_race_stream(r):
+    """:return race dict with objects of big collections made on write"""
+    ret = race_downgrade(r.to_dict(collections=['courses', 'groups']))
+    counts = {key: len(getattr(r, key)) for key in COLLECTIONS}
+    fingerprint = get_race_fingerprint(r, ret, counts)
+    if fingerprint:
+        ret['fingerprint'] = fingerprint
+    for key in STREAMED:
+        ret[key] = LazyList(getattr(r, key), _to_dict)
+    return ret
+
+
+def _to_dict(obj):
+    return obj.to_dict()
 
 
 def dump(file):
     data = {
         'version': config.VERSION.file,
         'current_race': get_current_race_index(),
-        'races': [race_downgrade(r.to_dict()) for r in races()],
+        'races': LazyList(races(), get_race_stream),
     }
-    json.dump(data, file, sort_keys=True, indent=2, ensure_ascii=False)
+    for chunk in iter_dump(data):
+        file.write(chunk)
 
 
 def load(file):
     event, current_race = get_races_from_file(file)
+    load_event(event, current_race)
+
+
+def load_event(event, current_race):
+    """Set the loaded races, results of the current race are calculated"""
     new_event(event)
     set_current_race_index(current_race)
     obj = race()
-    ResultChecker.check_all()
-    ResultCalculation(obj).process_results()
-    RaceSplits(obj).generate()
-    ScoreCalculation(obj).calculate_scores()
+    if obj.fingerprint_valid:
+        restore_calculation(obj)
+    else:
+        calculate_race(obj)
+
+
+def get_race_dict(r):
+    ret = race_downgrade(r.to_dict())
+    fingerprint = get_race_fingerprint(r, ret)
+    if fingerprint:
+        ret['fingerprint'] = fingerprint
+    return ret
+
+
+class JsonReader(object):
+    """Incremental parser of a JSON text file.
+
+    Objects and arrays are walked key by key and item by item, values are
+    decoded when asked, so only the current value is kept in memory.
+    """
+
+    chunk_size = 1 << 16
+
+    def __init__(self, file):
+        self.file = file
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        if self.eof:
+            return False
+        # the read grows with the buffer, a long value is read in few steps
+        chunk = self.file.read(max(self.chunk_size, len(self.buf) - self.pos))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """:return next char after whitespace, '' at the end"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\n\r':
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(
+                'Expecting {!r} at {!r}'.format(
+                    char, self.buf[self.pos : self.pos + 20]
+                )
+            )
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # a number may go on in the next chunk
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def iter_object(self):
+        """Yield keys, the value of each key is read by the caller"""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            char = self.peek()
+            self.pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise ValueError('Expecting \',\' or \'}\'')
+
+    def iter_array(self):
+        """Yield for each item, the item is read by the caller"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield
+            char = self.peek()
+            self.pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError('Expecting \',\' or \']\'')
+
+    def iter_values(self):
+        for _ in self.iter_array():
+            yield self.value()
+
+
+class RaceReader(object):
+    """Race read key by key, objects go to the bulk loader as they are parsed"""
+
+    def __init__(self):
+        self.race = Race()
+        self.loader = RaceLoader(self.race)
+        self.head = {}
+        self.counts = {key: 0 for key in COLLECTIONS}
+
+    def read(self, reader, key):
+        if key not in RaceLoader.key_list:
+            self.head[key] = reader.value()
+            return
+        items = []
+        for item in reader.iter_values():
+            migrate_item(key, item)
+            self.loader.add(key, item)
+            self.counts[key] += 1
+            if key not in STREAMED:
+                # kept for the fingerprint hash
+                items.append(item)
+        self.head[key] = items
+
+    def finish(self):
+        head = self.head
+        obj = self.race
+        obj.id = uuid.UUID(str(head['id']))
+        if 'data' in head:
+            self.loader.set_data(head['data'])
+        if 'settings' in head:
+            migrate_settings(head['settings'])
+            self.loader.set_settings(head['settings'])
+        self.loader.finish()
+        obj.fingerprint_valid = is_fingerprint_valid(head, self.counts)
+        return obj
+
+
+def read_race(reader):
+    race_reader = RaceReader()
+    for key in reader.iter_object():
+        race_reader.read(reader, key)
+    return race_reader.finish()
 
 
 def get_races_from_file(file):
-    data = json.load(file)
-    if 'races' not in data:
-        data = {
-            'races': [data] if not isinstance(data, list) else data,
-            'current_race': 0,
-        }
+    reader = JsonReader(file)
+    data = {}
     event = []
-    for race_dict in data['races']:
-        race_migrate(race_dict)
-        obj = Race()
-        obj.id = uuid.UUID(str(race_dict['id']))
-        obj.update_data(race_dict)
-        event.append(obj)
+    if reader.peek() == '[':
+        # old file with list of races
+        for _ in reader.iter_array():
+            event.append(read_race(reader))
+    else:
+        race_reader = None
+        for key in reader.iter_object():
+            if key == 'races':
+                for _ in reader.iter_array():
+                    event.append(read_race(reader))
+            elif key in EVENT_KEYS:
+                data[key] = reader.value()
+            else:
+                # old file with one race
+                race_reader = race_reader or RaceReader()
+                race_reader.read(reader, key)
+        if race_reader is not None:
+            event = [race_reader.finish()]
+            data = {}
+    if reader.peek():
+        raise ValueError('Extra data after the event')
     current_race = 0
     if 'current_race' in data:
         current_race = int(data['current_race'])
+    if data.get('journal') and hasattr(file, 'name'):
+        for obj in event:
+            # changes of the journal are not in the fingerprint
+            obj.fingerprint_valid = False
+        current_race = apply_journal(file.name, data['journal'], event, current_race)
     return event, current_race
 
 
 def race_migrate(data):
-    for person in data['persons']:
-        if 'sportident_card' in person:
-            person['card_number'] = person['sportident_card']
-        if 'is_rented_sportident_card' in person:
-            person['is_rented_card'] = person['is_rented_sportident_card']
-    for result in data['results']:
-        if 'sportident_card' in result:
-            result['card_number'] = result['sportident_card']
-    for group in data['groups']:
-        if 'min_year' not in group:
-            group['min_year'] = 0
-        if 'max_year' not in group:
-            group['max_year'] = 0
-    for org in data['organizations']:
-        if 'address' in org and org['address']:
-            org['country'] = org['address']['country']['name']
-            org['region'] = org['address']['state']
-            if org['contact']:
-                org['contact'] = org['contact']['value']
-    settings = data['settings']
+    for key in RaceLoader.key_list:
+        for item in data.get(key, []):
+            migrate_item(key, item)
+    migrate_settings(data['settings'])
+    return data
+
+
+def migrate_item(key, item):
+    if key == 'persons':
+        if 'sportident_card' in item:
+            item['card_number'] = item['sportident_card']
+        if 'is_rented_sportident_card' in item:
+            item['is_rented_card'] = item['is_rented_sportident_card']
+    elif key == 'results':
+        if 'sportident_card' in item:
+            item['card_number'] = item['sportident_card']
+    elif key == 'groups':
+        if 'min_year' not in item:
+            item['min_year'] = 0
+        if 'max_year' not in item:
+            item['max_year'] = 0
+    elif key == 'organizations':
+        if 'address' in item and item['address']:
+            item['country'] = item['address']['country']['name']
+            item['region'] = item['address']['state']
+            if item['contact']:
+                item['contact'] = item['contact']['value']
+
+
+def migrate_settings(settings):
     if 'sportident_zero_time' in settings:
         settings['system_zero_time'] = settings['sportident_zero_time']
     if 'sportident_start_source' in settings:
@@ -95,7 +357,6 @@ def race_migrate(data):
         settings['system_assignment_mode'] = settings['sportident_assignment_mode']
     if 'sportident_port' in settings:
         settings['system_port'] = settings['sportident_port']
-    return data
 
 
 def race_downgrade(data):
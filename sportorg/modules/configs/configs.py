@@ -79,6 +79,9 @@ class Config(metaclass=Singleton):
                     'use_birthday': False,
                     'check_updates': True,
                     'autosave_interval': 0,
+                    'autosave_generations': 3,
+                    'recheck_workers': 0,
+                    'save_journal': False,
                 }
             ),
             ConfigFile.SOUND: Configurations(
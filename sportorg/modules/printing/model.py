@@ -33,7 +33,7 @@ def split_printout(result):
             'split_template', template_dir('split', '1_split_printout.html')
         )
 
-        s = GroupSplits(obj, person.group).generate(True)
+        s = GroupSplits.get(obj, person.group, logged=True)
         result.check_who_can_win()
 
         if not str(template_path).endswith('.html') and platform.system() == 'Windows':
@@ -31,13 +31,9 @@ class ResultSportidentGeneration:
             eq = eq and self._result.finish_time == result.finish_time
         else:
             return False
-        if len(self._result.splits) == len(result.splits):
-            for i in range(len(self._result.splits)):
-                eq = eq and self._result.splits[i].code == result.splits[i].code
-                eq = eq and self._result.splits[i].time == result.splits[i].time
-        else:
+        if len(self._result.splits) != len(result.splits):
             return False
-        return eq
+        return eq and self._result.splits == result.splits
 
     def _has_result(self):
         for result in race().results:
@@ -190,10 +186,9 @@ class ResultSportidentGeneration:
         return max_bib
 
     def _find_group_by_punches(self):
-        for i in race().groups:
-            if i.course:
-                if self._result.check(i.course):
-                    return i
+        group = race().find_group_by_punches(self._result)
+        if group:
+            return group
 
         if len(race().groups) > 0:
             return race().groups[0]
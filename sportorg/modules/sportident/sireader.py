@@ -148,11 +148,11 @@ class ResultThread(QThread):
         for i in range(len(card_data['punches'])):
             t = card_data['punches'][i][1]
             if t:
-                split = memory.Split()
-                split.code = str(card_data['punches'][i][0])
-                split.time = time_to_otime(t)
-                split.days = memory.race().get_days(t)
-                result.splits.append(split)
+                result.splits.add_punch(
+                    card_data['punches'][i][0],
+                    time_to_otime(t).to_msec(),
+                    memory.race().get_days(t),
+                )
 
         if card_data['start']:
             result.start_time = time_to_otime(card_data['start'])
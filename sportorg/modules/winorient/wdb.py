@@ -18,7 +18,6 @@ from sportorg.models.memory import (
     Qualification,
     ResultSportident,
     ResultStatus,
-    Split,
     find,
     race,
 )
@@ -179,13 +178,8 @@ class WinOrientBinary:
             result.splits = []
             for i in range(chip.quantity):
                 p = chip.punch[i]
-                code = p.code
-                time = int_to_otime(p.time)
-                split = Split()
-                split.code = str(code)
-                split.time = time
-                if code > 0:
-                    result.splits.append(split)
+                if p.code > 0:
+                    result.splits.add_punch(p.code, int_to_otime(p.time).to_msec())
 
         ResultCalculation(race()).process_results()
 
@@ -0,0 +1,15 @@
+import logging
+import shutil
+
+import pytest
+
+from sportorg.modules.backup.file import File
+
+
+@pytest.fixture
+def event_file(tmp_path):
+    """Copy of tests/data/test.json opened as the current event, :return file name"""
+    file_name = str(tmp_path / 'event.json')
+    shutil.copy('tests/data/test.json', file_name)
+    File(file_name, logging.root, File.JSON).open()
+    return file_name
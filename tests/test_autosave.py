@@ -0,0 +1,60 @@
+import json
+import logging
+import os
+
+from sportorg.models.memory import Person, race
+from sportorg.modules.backup import autosave
+from sportorg.modules.backup.autosave import Autosave
+from sportorg.modules.backup.file import File
+from sportorg.modules.backup.json import get_races_from_file
+
+
+def _load(file_name):
+    with open(file_name, encoding='utf-8') as f:
+        event, current_race = get_races_from_file(f)
+    return [i.to_dict() for i in event], current_race
+
+
+def test_encoding_matches_json():
+    data = {
+        'version': [1, 2],
+        'current_race': 0,
+        'races': [
+            {'id': 'a', 'data': {'name': 'Тест'}, 'persons': [{'id': 1}, {}]},
+            {'id': 'b', 'persons': [], 'settings': {}},
+        ],
+    }
+    assert json.loads(''.join(autosave.iter_json(data))) == data
+
+
+def test_autosave_snapshot_and_generations(tmp_path, event_file):
+    file_name = event_file
+    saver = Autosave(generations=2)
+    names = [autosave.get_file_name(file_name, i) for i in (1, 2, 3)]
+    assert names[0] == str(tmp_path / 'event.autosave-1.json')
+
+    saved_name = str(tmp_path / 'saved.json')
+    File(saved_name, logging.root, File.JSON).save()
+    assert saver.start(file_name)
+    # snapshot is taken on start, later changes go to the next copy
+    person = Person()
+    person.surname = 'Autosaved'
+    race().persons.append(person)
+    saver.wait()
+    result = saver.pop_result()
+    assert result.error is None
+    assert result.size == os.path.getsize(names[0])
+    assert saver.pop_result() is None
+    assert _load(names[0]) == _load(saved_name)
+
+    saver.start(file_name)
+    saver.wait()
+    File(file_name, logging.root, File.JSON).save()
+    assert _load(names[0]) == _load(file_name)
+    assert _load(names[1]) != _load(file_name)
+
+    saver.start(file_name)
+    saver.wait()
+    assert os.path.exists(names[1])
+    assert not os.path.exists(names[2])
+    assert not os.path.exists(names[0] + '.tmp')
@@ -0,0 +1,80 @@
+import logging
+import os
+
+from sportorg.models.memory import (
+    Race,
+    ResultSportident,
+    new_event,
+    race,
+    races,
+    set_current_race_index,
+)
+from sportorg.modules.backup import binary
+from sportorg.modules.backup.binary import StringTable, decode_table, encode_table
+from sportorg.modules.backup.file import File
+
+
+def _dicts():
+    return [i.to_dict() for i in races()]
+
+
+def test_table_round_trip():
+    rows = [
+        {'id': 'a', 'n': 1, 'b': True, 'f': 1.5, 'x': None, 'l': [{'code': '31'}]},
+        {'id': 'b', 'n': 2**40, 'b': False, 'f': 2.0, 'x': {'y': 1}, 'l': []},
+        {'id': 'a', 'l': [{'code': '32'}, {'code': 'F'}]},
+    ]
+    strings = StringTable()
+    data = encode_table(rows, strings)
+    table, _ = decode_table(data, StringTable.decode(strings.encode()))
+    assert table.get_rows() == rows
+
+
+def test_save_and_open(tmp_path, event_file):
+    file_name = event_file
+    File(file_name, logging.root, File.JSON).save()
+    File(file_name, logging.root, File.JSON).open()
+    saved = _dicts()
+
+    binary_name = str(tmp_path / 'event.sportorg')
+    assert File.get_format(binary_name) == File.BINARY
+    File(binary_name, logging.root, File.BINARY).save()
+    assert binary.is_binary(binary_name)
+    assert os.path.getsize(binary_name) < os.path.getsize(file_name)
+
+    File(binary_name, logging.root, File.get_format(binary_name)).open()
+    assert race().fingerprint_valid
+    assert _dicts() == saved
+
+
+def test_not_current_race_is_lazy(tmp_path, event_file):
+    second = Race()
+    second.data.title = 'Second'
+    new_event([race(), second])
+    set_current_race_index(0)
+    binary_name = str(tmp_path / 'event.sportorg')
+    File(binary_name, logging.root, File.BINARY).save()
+
+    File(binary_name, logging.root, File.BINARY).open()
+    assert races().is_loaded(0)
+    assert not races().is_loaded(1)
+    # saved back as read
+    File(binary_name, logging.root, File.BINARY).save()
+    File(binary_name, logging.root, File.BINARY).open()
+    assert not races().is_loaded(1)
+    assert races()[1].data.title == 'Second'
+    assert races().is_loaded(1)
+
+
+def test_codes_not_numbers(tmp_path, event_file):
+    result = ResultSportident()
+    result.splits.add_punch('31', 3600000)
+    result.splits.add_punch('F', 3700000)
+    race().results.append(result)
+    saved = _dicts()
+    binary_name = str(tmp_path / 'event.sportorg')
+    File(binary_name, logging.root, File.BINARY).save()
+    File(binary_name, logging.root, File.BINARY).open()
+    codes = [[i.code for i in r.splits] for r in race().results]
+    assert ['31', 'F'] in codes
+    assert len(_dicts()[0]['results']) == len(saved[0]['results'])
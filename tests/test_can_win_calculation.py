@@ -0,0 +1,70 @@
+import random
+
+from sportorg.common.otime import OTime
+from sportorg.models.memory import (
+    Group,
+    Person,
+    Race,
+    ResultManual,
+    new_event,
+    set_current_race_index,
+)
+from sportorg.models.result.can_win_calculation import CanWinCalculation
+from sportorg.models.result.result_calculation import ResultCalculation
+
+
+def _race(seed=1, persons=80):
+    rnd = random.Random(seed)
+    r = Race()
+    new_event([r])
+    set_current_race_index(0)
+    group = Group()
+    group.name = 'M21'
+    r.groups.append(group)
+    for i in range(persons):
+        person = Person()
+        person.bib = i + 1
+        person.group = group
+        person.start_time = OTime(0, 10, rnd.randint(0, 120))
+        person.is_out_of_competition = rnd.random() < 0.1
+        r.persons.append(person)
+        if rnd.random() < 0.5:
+            result = ResultManual()
+            result.person = person
+            result.finish_time = person.start_time + OTime(0, 0, rnd.randint(20, 60))
+            r.add_new_result(result)
+    ResultCalculation(r).process_results()
+    return r, group
+
+
+def _reference(r, result, now):
+    """Straight check of all persons of the group"""
+    count = 0
+    max_start = OTime()
+    for person in r.get_persons_by_group(result.person.group):
+        if person.result_count == 0 and not person.is_out_of_competition:
+            if person.start_time > result.person.start_time:
+                if result.get_result_otime() > now - person.start_time:
+                    count += 1
+                    max_start = max(person.start_time, max_start)
+    return count, (max_start + result.get_result_otime()).to_msec()
+
+
+def test_can_win_matches_straight_check():
+    r, group = _race()
+    for minute in (0, 30, 70, 100, 150, 200):
+        now = OTime(0, 10, minute)
+        CanWinCalculation(r).calculate(now)
+        for result in r.results:
+            assert (
+                result.can_win_count,
+                result.final_result_time.to_msec(),
+            ) == _reference(r, result, now)
+
+
+def test_can_win_nobody_left():
+    r, group = _race(persons=3)
+    CanWinCalculation(r).calculate(OTime(0, 23))
+    for result in r.results:
+        assert result.can_win_count == 0
+        assert result.final_result_time == result.get_result_otime()
@@ -0,0 +1,131 @@
+import pytest
+
+from sportorg.models.memory import (
+    Course,
+    CourseControl,
+    CourseIndex,
+    Group,
+    Race,
+    ResultSportident,
+    Split,
+)
+
+
+def _course(codes):
+    course = Course()
+    if isinstance(codes, str):
+        codes = codes.split(' ') if codes else []
+    for code in codes:
+        control = CourseControl()
+        control.code = code
+        course.controls.append(control)
+    return course
+
+
+def _result(punches):
+    result = ResultSportident()
+    for code in punches.split(' ') if punches else []:
+        split = Split()
+        split.code = code
+        result.splits.append(split)
+    return result
+
+
+def _flags(values):
+    return ''.join('1' if i else '0' for i in values)
+
+
+@pytest.mark.parametrize(
+    ('course', 'punches', 'expected', 'correct', 'penalty'),
+    [
+        ('31 32 33', '31 32 33', True, '111', '000'),
+        ('31 32 33', '31 33', False, '10', '01'),
+        ('31 32 33', '31 40 32 33', True, '1011', '0100'),
+        ('31 32 33', '33 32 31', False, '001', '110'),
+        ('31 32 33', '', False, '', ''),
+        ('31 32 33', '31 32 32 33', True, '1101', '0010'),
+        ('* * *', '31 32 33', True, '111', '000'),
+        ('* * *', '31 31 32', False, '101', '010'),
+        ('* * *', '31 31 31 32 33', True, '10011', '01100'),
+        ('* * *', '31 32', False, '11', '00'),
+        ('40 * * 90', '40 31 32 90', True, '1111', '0000'),
+        ('40 * * 90', '40 31 31 90', False, '1101', '0010'),
+        ('40 * * 90', '40 40 31 90', True, '1111', '0000'),
+        ('40 * * 90', '31 40 32 33 90', True, '01111', '10000'),
+        ('% % %', '31 31 31', True, '111', '000'),
+        ('% % %', '31 32', False, '11', '00'),
+        ('%(31,32,35-40) 50', '36 50', True, '11', '00'),
+        ('%(31,32,35-40) 50', '41 50', False, '00', '11'),
+        ('%(31,32,35-40) 50', '41 35 50', True, '011', '100'),
+        ('*(31-33) *(31-33) 50', '31 31 32 50', True, '1011', '0100'),
+        ('*(31-33) *(31-33) 50', '34 31 33 50', True, '0111', '1000'),
+        ('*(31-33) *(31-33) 50', '31 34 32 50', True, '1011', '0100'),
+        ('31(31,32,33) 40', '32 40', True, '11', '10'),
+        ('31(31,32,33) 40', '31 40', True, '11', '00'),
+        ('31(31,32,33) 40', '34 40', False, '00', '11'),
+        (['31(31, 32 , 33 - 35)', '40'], '34 40', True, '11', '10'),
+        (['31(31, 32 , 33 - 35)', '40'], '36 40', False, '00', '11'),
+        ('31 * 33', '31 31 33', True, '111', '000'),
+        ('31 * 33', '31 32 33', True, '111', '000'),
+        ('* 31 * 31', '31 31 32 31', True, '1111', '0000'),
+        ('*(31-35) % *(31-35)', '31 31 31 32', True, '1101', '0010'),
+        ('%* * *', '31 31 32 33', True, '1011', '0100'),
+        ('31% 32* 33', '31 32 33', True, '111', '000'),
+        ('(31,32) 33', '32 33', False, '00', '11'),
+        ('(31,32) 33', '(31,32) 33', True, '11', '00'),
+        ('*(40-35) 50', '40 50', True, '11', '00'),
+        ('*(40-35) 50', '38 50', False, '00', '11'),
+        ('', '31', True, '1', '0'),
+    ],
+)
+def test_check(course, punches, expected, correct, penalty):
+    result = _result(punches)
+    assert result.check(_course(course)) is expected
+    assert _flags(i.is_correct for i in result.splits) == correct
+    assert _flags(i.has_penalty for i in result.splits) == penalty
+
+
+def test_matcher_recompiled_after_edit():
+    course = _course('31 32')
+    matcher = course.get_matcher()
+    assert course.get_matcher() is matcher
+    assert _result('31 33').check(course) is False
+
+    course.controls[1].code = '33'
+    assert course.get_matcher() is not matcher
+    assert _result('31 33').check(course) is True
+
+
+def test_course_index_prefers_best_coverage():
+    short, full, other = _course('31 32'), _course('31 32 33'), _course('41 42')
+    index = CourseIndex([short, full, other])
+    result = _result('31 32 33')
+    assert index.get_candidates(result) == [full, short]
+    assert index.find(result) is full
+    assert index.find(_result('31 32')) is short
+    assert index.find(_result('50')) is None
+    assert index.find(result, [short, other]) is short
+
+
+def test_course_index_free_controls_always_candidates():
+    free, fixed = _course('* %'), _course('31 32 33 34')
+    index = CourseIndex([fixed, free])
+    assert index.get_candidates(_result('31 32')) == [free]
+    assert index.find(_result('31 32')) is free
+
+
+def test_race_find_group_by_punches():
+    r = Race()
+    for codes in ('31 32', '31 32 33'):
+        course = _course(codes)
+        r.courses.append(course)
+        group = Group()
+        group.course = course
+        r.groups.append(group)
+    r.groups.insert(0, Group())
+    assert r.find_group_by_punches(_result('31 32 33')) is r.groups[2]
+    index = r.get_course_index()
+    assert r.get_course_index() is index
+    r.courses[0].controls[0].code = '35'
+    assert r.get_course_index() is not index
+    assert r.find_group_by_punches(_result('31 32')) is None
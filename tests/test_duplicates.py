@@ -0,0 +1,59 @@
+from sportorg.models.duplicates import DuplicateAudit, normalize_name
+from sportorg.models.memory import Person, Race
+
+
+def _person(surname, name, card_number=0, bib=0, year=0):
+    person = Person()
+    person.surname = surname
+    person.name = name
+    person.card_number = card_number
+    person.bib = bib
+    person.set_year(year)
+    return person
+
+
+def _race():
+    r = Race()
+    r.persons = [
+        _person('Иванов', 'Пётр', 101, 1, 2000),
+        _person('Petrov', 'Ivan', 102, 2, 1990),
+        _person(' иванов ', 'Петр', 0, 3, 2001),
+        _person('Sidorov', 'Oleg', 101, 2, 1990),
+        _person('Petrov', 'Ivan', 0, 0, 1990),
+        _person('Smirnov', 'Anna', 101, 6, 1985),
+    ]
+    return r
+
+
+def test_normalize_name():
+    assert normalize_name('  Иванов   Пётр ') == 'иванов петр'
+    assert normalize_name(None) == ''
+
+
+def test_duplicate_groups():
+    r = _race()
+    p = r.persons
+    audit = r.get_duplicate_audit()
+    groups = audit.run()
+
+    assert [(g.key, g.persons) for g in groups[DuplicateAudit.CARD_NUMBER]] == [
+        (101, [p[0], p[3], p[5]])
+    ]
+    assert [g.persons for g in groups[DuplicateAudit.NAME]] == [
+        [p[0], p[2]],
+        [p[1], p[4]],
+    ]
+    assert [g.persons for g in groups[DuplicateAudit.BIB]] == [[p[1], p[3]]]
+    assert [(g.key, g.persons) for g in groups[DuplicateAudit.NAME_YEAR]] == [
+        (('petrov ivan', 1990), [p[1], p[4]])
+    ]
+
+
+def test_race_duplicate_functions():
+    r = _race()
+    p = r.persons
+    assert r.get_duplicate_card_numbers() == [p[0], p[3], p[5]]
+    assert r.get_duplicate_names() == [p[0], p[1], p[2], p[4]]
+    r.persons = r.persons[:2]
+    assert r.get_duplicate_card_numbers() == []
+    assert r.get_duplicate_names() == []
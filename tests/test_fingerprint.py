@@ -0,0 +1,131 @@
+import json
+import logging
+
+from sportorg.common.otime import OTime
+from sportorg.models.memory import (
+    Person,
+    ResultSportident,
+    ResultStatus,
+    Split,
+    race,
+)
+from sportorg.models.result import fingerprint
+from sportorg.models.result.result_calculation import ResultCalculation
+from sportorg.models.result.split_calculation import GroupSplits, RaceSplits
+from sportorg.modules.backup import json as json_backup
+from sportorg.modules.backup.file import File
+from sportorg.modules.sportident.result_generation import ResultSportidentGeneration
+
+
+def _saved(file_name):
+    """Event file saved by this version, :return file name and saved race dict"""
+    File(file_name, logging.root, File.JSON).save()
+    return file_name, race().to_dict()
+
+
+def _open(file_name, monkeypatch):
+    calls = []
+
+    def calculate_race(r):
+        calls.append(r)
+        fingerprint.calculate_race(r)
+
+    monkeypatch.setattr(json_backup, 'calculate_race', calculate_race)
+    File(file_name, logging.root, File.JSON).open()
+    return calls
+
+
+def test_fingerprint_written_after_calculation(event_file):
+    _saved(event_file)
+    r = race()
+    race_dict = json_backup.get_race_dict(r)
+    assert fingerprint.is_fingerprint_valid(race_dict)
+
+    r.persons.append(Person())
+    assert 'fingerprint' not in json_backup.get_race_dict(r)
+    ResultCalculation(r).process_results()
+    assert 'fingerprint' in json_backup.get_race_dict(r)
+
+    r.results[0].person = None
+    assert 'fingerprint' not in json_backup.get_race_dict(r)
+    ResultCalculation(r).process_results()
+    r.groups[0].course = None
+    assert 'fingerprint' not in json_backup.get_race_dict(r)
+    ResultCalculation(r).process_results()
+    r.set_setting('time_accuracy', 1)
+    assert 'fingerprint' not in json_backup.get_race_dict(r)
+
+
+def test_open_with_fingerprint_skips_calculation(event_file, monkeypatch):
+    file_name, saved = _saved(event_file)
+    assert _open(file_name, monkeypatch) == []
+    r = race()
+    assert r.fingerprint_valid
+    assert [i.place for i in r.results] == [1, -1]
+    assert r.calculation_key is not None
+    assert r.persons[0].result_count == 2
+    # legs are generated on demand and give the same data as on full open
+    RaceSplits(r).generate()
+    assert r.to_dict() == saved
+
+
+def test_open_with_changed_data_recalculates(event_file, monkeypatch):
+    file_name, saved = _saved(event_file)
+    with open(file_name, encoding='utf-8') as f:
+        data = json.load(f)
+    data['races'][0]['settings']['time_accuracy'] = 1
+    with open(file_name, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    assert len(_open(file_name, monkeypatch)) == 1
+    assert not race().fingerprint_valid
+
+
+def test_changed_result_fields_drop_fingerprint(event_file, monkeypatch):
+    r = race()
+    ResultCalculation(r).process_results()
+    assert 'fingerprint' in json_backup.get_race_dict(r)
+    r.results[0].finish_time = r.results[0].finish_time + OTime(msec=1000)
+    assert 'fingerprint' not in json_backup.get_race_dict(r)
+    ResultCalculation(r).process_results()
+    r.persons[0].start_time = OTime(0, 9)
+    assert 'fingerprint' not in json_backup.get_race_dict(r)
+    ResultCalculation(r).process_results()
+    r.results[0].splits = [Split()]
+    assert 'fingerprint' not in json_backup.get_race_dict(r)
+
+    ResultCalculation(r).process_results()
+    r.results[0].status = ResultStatus.DISQUALIFIED
+    File(event_file, logging.root, File.JSON).save()
+    assert len(_open(event_file, monkeypatch)) == 1
+    assert race().results[0].status == ResultStatus.DISQUALIFIED
+    assert race().results[0].place == -1
+
+
+def test_readout_keeps_fingerprint(event_file, monkeypatch):
+    r = race()
+    person = r.add_new_person(True)
+    person.card_number = 123456
+    person.group = r.groups[0]
+    person.start_time = OTime(0, 11)
+    ResultCalculation(r).process_results()
+
+    result = ResultSportident()
+    result.card_number = 123456
+    result.finish_time = OTime(0, 11, 30)
+    assert ResultSportidentGeneration(result).add_result()
+    assert result.person is person
+    # as on readout in the main window
+    rc = ResultCalculation(r)
+    rc.process_changed_results([result])
+    GroupSplits.get(r, person.group, rc)
+    assert person.result_count == 1
+    assert 'fingerprint' in json_backup.get_race_dict(r)
+
+    File(event_file, logging.root, File.JSON).save()
+    assert _open(event_file, monkeypatch) == []
+    r = race()
+    assert r.fingerprint_valid
+    RaceSplits(r).generate()
+    restored = r.to_dict()
+    fingerprint.calculate_race(r)
+    assert r.to_dict() == restored
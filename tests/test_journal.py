@@ -0,0 +1,166 @@
+import json
+import logging
+
+from sportorg.common.otime import OTime
+from sportorg.models.memory import (
+    Group,
+    Person,
+    ResultManual,
+    Split,
+    race,
+)
+from sportorg.modules.backup import journal
+from sportorg.modules.backup.file import File
+from sportorg.modules.backup.json import get_races_from_file
+
+
+def _add_persons():
+    r = race()
+    for name in ('M21', 'W21'):
+        group = Group()
+        group.name = name
+        r.groups.append(group)
+        for i in range(3):
+            person = Person()
+            person.surname = '{} {}'.format(name, i)
+            person.group = group
+            r.persons.append(person)
+
+
+def _save(file_name):
+    File(file_name, logging.root, File.JOURNAL).save()
+
+
+def _lines(file_name):
+    with open(journal.get_journal_name(file_name), encoding='utf-8') as f:
+        return f.read().splitlines()
+
+
+def _load(file_name):
+    with open(file_name, encoding='utf-8') as f:
+        event, current_race = get_races_from_file(f)
+    return [i.to_dict() for i in event], current_race
+
+
+def _assert_file_matches_memory(file_name):
+    """Base with journal loads the same as the full save of the current state"""
+    full_name = file_name.replace('event', 'full')
+    File(full_name, logging.root, File.JSON).save()
+    assert _load(file_name) == _load(full_name)
+
+
+def _change(r, name):
+    person = Person()
+    person.surname = name
+    person.group = r.groups[1]
+    person.bib = 999
+    r.persons.append(person)
+    r.persons[0].surname = name + ' edited'
+    r.persons[1].group = r.groups[2]
+    del r.results[1]
+    result = ResultManual()
+    result.person = person
+    result.finish_time = OTime(0, 11)
+    split = Split()
+    split.code = '31'
+    split.time = OTime(0, 10, 30)
+    result.splits.append(split)
+    r.add_new_result(result)
+    r.set_setting('journal_test', name)
+    r.data.title = name
+
+
+def test_journal_saves_only_changes(event_file):
+    file_name = event_file
+    _add_persons()
+    r = race()
+    _save(file_name)
+    with open(file_name, encoding='utf-8') as f:
+        base = json.load(f)
+    assert _lines(file_name) == [
+        json.dumps({'journal': base['journal'], 'version': base['version']})
+        .replace(', ', ',')
+        .replace(': ', ':')
+    ]
+
+    _change(r, 'First')
+    _save(file_name)
+    _save(file_name)
+    lines = _lines(file_name)
+    assert len(lines) == 2
+    ops = json.loads(lines[1])['ops']
+    assert sorted(set(op for _, op, _ in ops)) == ['delete', 'insert', 'put', 'race']
+    assert len(ops) < 10
+
+    # persons moved: the order is saved
+    r.persons.reverse()
+    _save(file_name)
+    assert [op for _, op, _ in json.loads(_lines(file_name)[-1])['ops']] == ['order']
+    _assert_file_matches_memory(file_name)
+
+
+def test_journal_serialises_only_changed(event_file, monkeypatch):
+    file_name = event_file
+    _add_persons()
+    r = race()
+    _save(file_name)
+
+    serialised = []
+    to_dict = Person.to_dict
+
+    def counted(person):
+        serialised.append(person)
+        return to_dict(person)
+
+    monkeypatch.setattr(Person, 'to_dict', counted)
+    r.persons[2].comment = 'late entry'
+    r.persons[3].is_paid = True
+    _save(file_name)
+    assert serialised == [r.persons[2], r.persons[3]]
+    ops = json.loads(_lines(file_name)[-1])['ops']
+    assert [op for _, op, _ in ops] == ['put', 'put']
+    assert ops[0][2]['comment'] == 'late entry'
+
+    serialised.clear()
+    _save(file_name)
+    assert serialised == []
+    _assert_file_matches_memory(file_name)
+
+
+def test_journal_ignores_incomplete_record(event_file):
+    file_name = event_file
+    _add_persons()
+    r = race()
+    _save(file_name)
+    _change(r, 'Second')
+    _save(file_name)
+    with open(journal.get_journal_name(file_name), 'a', encoding='utf-8') as f:
+        f.write('{"current_race": 0, "ops": [["')
+    _assert_file_matches_memory(file_name)
+
+
+def test_journal_compaction(event_file, monkeypatch):
+    file_name = event_file
+    _add_persons()
+    r = race()
+    monkeypatch.setattr(journal.Journal, 'compact_ratio', 0.0001)
+    _save(file_name)
+    with open(file_name, encoding='utf-8') as f:
+        first_id = json.load(f)['journal']
+    _change(r, 'Third')
+    _save(file_name)
+    journal.wait_all()
+    with open(file_name, encoding='utf-8') as f:
+        second_id = json.load(f)['journal']
+    assert second_id != first_id
+    assert json.loads(_lines(file_name)[0])['journal'] == second_id
+    _assert_file_matches_memory(file_name)
+
+
+def test_full_save_removes_journal(tmp_path, event_file):
+    file_name = event_file
+    _add_persons()
+    _save(file_name)
+    File(file_name, logging.root, File.JSON).save()
+    assert not (tmp_path / 'event.json.journal').exists()
+    File(file_name, logging.root, File.JSON).open()
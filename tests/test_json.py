@@ -1,7 +1,19 @@
+import io
+import json
 import logging
+import os
 
-from sportorg.models.memory import Group, Organization, Person, race
+from sportorg.models.memory import (
+    Group,
+    Organization,
+    Person,
+    Race,
+    new_event,
+    race,
+)
+from sportorg.modules.backup import json as json_backup
 from sportorg.modules.backup.file import File
+from sportorg.modules.backup.json import JsonReader, get_races_from_file
 
 
 def test_main():
@@ -14,3 +26,69 @@ def test_main():
     assert isinstance(person, Person), 'Import person failed'
     assert isinstance(person.group, Group), 'Import group failed'
     assert isinstance(person.organization, Organization), 'Import organization failed'
+
+
+def test_load_keeps_file_order():
+    with open('tests/data/test.json') as f:
+        event, current_race = get_races_from_file(f)
+    with open('tests/data/test.json') as f:
+        data = json.load(f)['races'][0]
+    r = event[0]
+    assert [str(i.id) for i in r.results] == [i['id'] for i in data['results']]
+    for result, item in zip(r.results, data['results']):
+        if item['person_id']:
+            assert result.person is r.get_obj('Person', item['person_id'])
+    person = r.persons[0]
+    assert person.group is r.get_obj('Group', data['persons'][0]['group_id'])
+
+
+def test_dump_matches_json_dump():
+    File('tests/data/test.json', logging.root, File.JSON).open()
+    f = io.StringIO()
+    json_backup.dump(f)
+    data = json.loads(f.getvalue())
+    assert f.getvalue() == json.dumps(
+        data, sort_keys=True, indent=2, ensure_ascii=False
+    )
+    assert data['races'][0] == json_backup.get_race_dict(race())
+
+
+def test_reader_small_chunks(monkeypatch):
+    monkeypatch.setattr(JsonReader, 'chunk_size', 7)
+    text = '{"a": [1, 12345678901234, {"b": "x\\"y"}, []], "c": {}, "d": -1.5e3}'
+    reader = JsonReader(io.StringIO(text))
+    values = {}
+    for key in reader.iter_object():
+        if key == 'a':
+            values[key] = list(reader.iter_values())
+        else:
+            values[key] = reader.value()
+    assert values == json.loads(text)
+    assert reader.peek() == ''
+
+
+def test_load_old_files():
+    with open('tests/data/test.json') as f:
+        data = json.load(f)
+    expected = data['races'][0]
+    for text in [json.dumps(data['races']), json.dumps(expected)]:
+        event, current_race = get_races_from_file(io.StringIO(text))
+        assert current_race == 0
+        assert len(event) == 1
+        assert str(event[0].id) == expected['id']
+        assert len(event[0].persons) == len(expected['persons'])
+
+
+def test_save_new_race(tmp_path):
+    new_event([Race()])
+    file_name = str(tmp_path / 'new.json')
+    File(file_name, logging.root, File.JSON).create()
+    assert not os.path.exists(file_name + '.tmp')
+    with open(file_name) as f:
+        text = f.read()
+    data = json.loads(text)
+    assert text == json.dumps(data, sort_keys=True, indent=2, ensure_ascii=False)
+    assert data['races'][0]['persons'] == []
+    assert data['races'][0]['results'] == []
+    File(file_name, logging.root, File.JSON).open()
+    assert len(race().persons) == 0
@@ -0,0 +1,118 @@
+import gc
+
+from sportorg.models import index
+from sportorg.models.memory import (
+    Group,
+    Person,
+    Race,
+    ResultManual,
+    find,
+)
+
+
+def _race_with_persons(count=5):
+    r = Race()
+    group = Group()
+    group.name = 'M21'
+    r.groups.append(group)
+    for i in range(count):
+        person = Person()
+        person.bib = i + 1
+        person.card_number = 100 + i
+        person.group = group
+        r.persons.append(person)
+    return r, group
+
+
+def test_find_uses_index_and_follows_changes():
+    r, group = _race_with_persons()
+    person = find(r.persons, bib=3)
+    assert person is r.persons[2]
+
+    person.bib = 33
+    assert find(r.persons, bib=3) is None
+    assert find(r.persons, bib=33) is person
+
+    other = Group()
+    person.group = other
+    assert find(r.persons, group=group, return_all=True) == [
+        p for p in r.persons if p.group is group
+    ]
+    assert find(r.persons, group=other, return_all=True) == [person]
+
+
+def test_bucket_keeps_list_order():
+    r, group = _race_with_persons()
+    r.persons[3].card_number = 7
+    r.persons[1].card_number = 7
+    assert find(r.persons, card_number=7, return_all=True) == [
+        r.persons[1],
+        r.persons[3],
+    ]
+
+
+def test_index_rebuilds_after_direct_list_changes():
+    r, group = _race_with_persons()
+    assert find(r.persons, bib=10) is None
+    person = Person()
+    person.bib = 10
+    r.persons.insert(0, person)
+    assert find(r.persons, bib=10) is person
+
+    r.persons = list(reversed(r.persons))
+    assert find(r.persons, bib=10) is person
+    assert find(r.persons, bib=1) is r.persons[-2]
+
+
+def test_person_result_and_delete():
+    r, group = _race_with_persons()
+    person = r.persons[0]
+    assert r.find_person_result(person) is None
+
+    result = ResultManual()
+    result.person = person
+    r.add_new_result(result)
+    assert r.find_person_result(person) is result
+    r.add_result(result)
+    assert len(r.results) == 1
+
+    r.delete_persons([0])
+    assert result.person is None
+    assert result.bib == 1
+    assert r.find_person_result(person) is None
+    assert find(r.persons, bib=1) is None
+
+
+def test_person_card_number():
+    r, group = _race_with_persons()
+    first, second = r.persons[0], r.persons[1]
+    assert r.person_card_number(first, second.card_number) is second
+    assert second.card_number == 0
+    assert find(r.persons, card_number=first.card_number) is first
+
+
+def test_get_obj_after_create():
+    r = Race()
+    group = Group()
+    r.groups.append(group)
+    r.update_data(
+        {
+            'object': 'Organization',
+            'id': '2c3a1d4e-0000-4000-8000-000000000001',
+            'name': 'Club',
+        }
+    )
+    org = r.get_obj('Organization', '2c3a1d4e-0000-4000-8000-000000000001')
+    assert org is r.organizations[0]
+    assert r.get_obj('Group', str(group.id)) is group
+    assert r.get_obj('Group', None) is None
+
+
+def test_registry_drops_collected_races():
+    gc.collect()
+    count = len(index._registry)
+    r, group = _race_with_persons()
+    assert len(index._registry) > count
+    del r, group
+    gc.collect()
+    assert len(index._registry) == count
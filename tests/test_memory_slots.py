@@ -0,0 +1,83 @@
+import copy
+import logging
+import pickle
+import tracemalloc
+
+from sportorg.common.otime import OTime
+from sportorg.models.memory import CourseControl, Split
+
+TIME_FIELDS = ('_time', 'leg_time', 'relative_time')
+
+
+class _DictOTime(object):
+    """Layout of OTime before `__slots__`"""
+
+    def __init__(self, msec):
+        self._msec = msec
+        self._args = None
+
+
+class _DictSplit(object):
+    """Layout of Split before `__slots__`: attributes in an instance dict"""
+
+    def __init__(self, split):
+        for name, value in split.__getstate__().items():
+            if name in TIME_FIELDS:
+                value = _DictOTime(value.to_msec())
+            setattr(self, name, value)
+
+
+def _split(i):
+    split = Split()
+    split.code = str(31 + i % 50)
+    split.time = OTime(msec=36000000 + i * 1000)
+    split.leg_time = OTime(msec=i * 100)
+    split.relative_time = OTime(msec=i * 1000)
+    split.course_index = i % 30
+    return split
+
+
+def _bytes_per_object(factory, count=20000):
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        objects = [factory(i) for i in range(count)]
+        used = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    assert len(objects) == count
+    return used / count
+
+
+def test_split_memory_benchmark():
+    template = _split(0)
+    before = _bytes_per_object(lambda i: _DictSplit(template))
+    after = _bytes_per_object(lambda i: _split(0))
+    logging.info('split bytes: %.1f with dict, %.1f with slots', before, after)
+    assert after < before * 0.85
+
+
+def test_slots_without_instance_dict():
+    for obj in (Split(), CourseControl(), OTime()):
+        assert not hasattr(obj, '__dict__')
+
+
+def test_split_model_api():
+    split = Split.create(code='31', days=1, unknown=5)
+    assert split['code'] == '31'
+    assert split.days == 1
+    split['is_correct'] = False
+    split['unknown'] = 1
+    assert not split.is_correct
+    assert not hasattr(split, 'unknown')
+
+
+def test_slots_pickle_and_copy():
+    split = _split(3)
+    control = CourseControl.create(code='31', length=250)
+    for restored in (pickle.loads(pickle.dumps(split)), copy.deepcopy(split)):
+        assert restored.to_dict() == split.to_dict()
+    restored = pickle.loads(pickle.dumps(control))
+    assert restored.to_dict() == control.to_dict()
+    assert restored.order == 0
+    assert pickle.loads(pickle.dumps(OTime(0, 1, 2, 3))) == OTime(0, 1, 2, 3)
@@ -1,3 +1,6 @@
+import logging
+import timeit
+
 import pytest
 
 from sportorg.common.otime import OTime
@@ -50,3 +53,94 @@ def test_otime_sum():
     assert otime1 + otime2 == otime3
     assert otime1 + otime2 == otime3
     assert otime1 - otime2 == otime4
+
+
+def test_otime_value_type():
+    time = OTime(0, 10, 5, 3, 250)
+    assert hash(time) == hash(OTime.from_msec(time.to_msec()))
+    assert len({time, OTime(msec=time.to_msec()), OTime.ZERO}) == 2
+    assert OTime.ZERO == OTime()
+    assert OTime.DAY.to_msec() == 86400000
+    assert OTime.from_msec(-1000) == OTime(0, 23, 59, 59)
+    assert time.copy() is time
+    assert time.to_msec(0) == OTime(0, 10, 5, 3).to_msec()
+    assert time.to_msec(1) == OTime(0, 10, 5, 3, 200).to_msec()
+    assert time.args == (0, 10, 5, 3, 250)
+    assert time.replace(hour=11) == OTime(0, 11, 5, 3, 250)
+    with pytest.raises(AttributeError):
+        time._msec = 0
+    with pytest.raises(TypeError):
+        _ = time < None
+    assert time > None
+    assert time != None  # noqa: E711
+
+
+class _OldOTime:
+    """Hot operations of OTime before it became an int-backed value type"""
+
+    def __init__(self, day=0, hour=0, minute=0, sec=0, msec=0):
+        self._msec = self.get_msec(day, hour, minute, sec, msec)
+        self._args = None
+
+    def __eq__(self, other):
+        if not other:
+            return False
+        return self.to_msec() == other.to_msec()
+
+    def __gt__(self, other):
+        if not other:
+            return True
+        return self.to_msec() > other.to_msec()
+
+    def __sub__(self, other):
+        return _OldOTime(msec=(self.to_msec() - other.to_msec()))
+
+    def to_msec(self, sub_sec=3):
+        if not 0 <= sub_sec <= 3:
+            sub_sec = 3
+        mlt = 10 ** (3 - sub_sec)
+        return self._msec // mlt * mlt
+
+    @staticmethod
+    def get_msec(day=0, hour=0, minute=0, sec=0, msec=0):
+        ret = day * 86400000 + hour * 3600000 + minute * 60000 + sec * 1000 + msec
+        if ret < 0:
+            ret += 86400000
+        return ret
+
+
+def _to_plain(value):
+    if isinstance(value, list):
+        return [_to_plain(i) for i in value]
+    if hasattr(value, 'to_msec'):
+        return value.to_msec()
+    return value
+
+
+def _best_time(func, number=2000, repeat=5):
+    return min(timeit.repeat(func, number=number, repeat=repeat))
+
+
+@pytest.mark.parametrize(
+    'operation',
+    [
+        lambda a, b, times: a - b,
+        lambda a, b, times: a == b,
+        lambda a, b, times: a > b,
+        lambda a, b, times: a.to_msec(),
+        lambda a, b, times: sorted(times),
+    ],
+    ids=['sub', 'eq', 'gt', 'to_msec', 'sort'],
+)
+def test_otime_hot_operations_benchmark(operation):
+    """Same values as the old OTime, timings are logged, not asserted"""
+    values = []
+    for cls in (_OldOTime, OTime):
+        a = cls(0, 10, 5, 3)
+        b = cls(0, 9, 1, 2, 500)
+        times = [cls(msec=i * 7919 % 86400000) for i in range(50)]
+        values.append(_to_plain(operation(a, b, times)))
+        logging.info(
+            '%s: %.6fs', cls.__name__, _best_time(lambda: operation(a, b, times))
+        )
+    assert values[0] == values[1]
@@ -0,0 +1,198 @@
+import copy
+import pickle
+import tracemalloc
+
+import pytest
+
+from sportorg.common.otime import OTime
+from sportorg.models.memory import (
+    Course,
+    CourseControl,
+    Punches,
+    ResultSportident,
+    Split,
+    check_splits,
+)
+
+
+def _split(code, sec, days=0):
+    split = Split()
+    split.code = code
+    split.time = OTime(msec=sec * 1000)
+    split.days = days
+    return split
+
+
+def _result(codes):
+    result = ResultSportident()
+    for i, code in enumerate(codes):
+        result.splits.add_punch(code, 36000000 + i * 60000)
+    return result
+
+
+def _course(codes):
+    course = Course()
+    for code in codes:
+        control = CourseControl()
+        control.code = code
+        course.controls.append(control)
+    return course
+
+
+def test_punches_list_operations():
+    punches = Punches()
+    reference = []
+    for item in (_split('31', 10), _split('032', 20), _split('33', 30, 1)):
+        punches.append(item)
+        reference.append(item)
+    punches.add_punch(34, 40000)
+    reference.append(punches[3])
+    first = _split('10', 5)
+    punches.insert(0, first)
+    reference.insert(0, first)
+    del punches[2]
+    del reference[2]
+    punches[-1] = reference[-1] = _split('90', 50)
+    assert list(punches) == reference
+    assert [i is j for i, j in zip(punches, reference)] == [True] * len(reference)
+    assert punches[1:3] == reference[1:3]
+    assert punches.get_codes() == ['10', '31', '33', '90']
+    assert list(punches.get_times()) == [5000, 10000, 30000, 50000]
+    assert list(punches.days) == [0, 0, 1, 0]
+    assert punches.pop(0) is first
+    assert len(punches) == 3
+    punches[0:2] = [_split('41', 1)]
+    assert punches.get_codes() == ['41', '90']
+    with pytest.raises(IndexError):
+        _ = punches[2]
+
+
+def test_splits_made_on_access_and_followed():
+    result = _result([31, 32, 33])
+    assert isinstance(result.splits, Punches)
+    assert result.splits.get_codes() == ['31', '32', '33']
+    assert result.splits._splits is None
+
+    split = result.splits[1]
+    assert split.code == '32'
+    assert split.time == OTime(0, 10, 1)
+    assert result.splits[1] is split
+    split.code = '35'
+    split.time = OTime(0, 11)
+    assert result.splits.get_codes() == ['31', '35', '33']
+    assert result.splits.get_times()[1] == OTime(0, 11).to_msec()
+
+    result.splits = [_split('40', 1)]
+    assert isinstance(result.splits, Punches)
+    assert result.splits.get_codes() == ['40']
+
+
+def test_punches_dict_round_trip_without_splits():
+    result = _result([31, 32, 33])
+    result.splits[0].code = 'A1'
+    data = result.to_dict()
+    expected = [
+        split.to_dict() for split in Punches(list(_result([31, 32, 33]).splits))
+    ]
+    expected[0] = result.splits[0].to_dict()
+    assert data['splits'] == expected
+
+    loaded = ResultSportident()
+    loaded.update_data(data)
+    assert loaded.splits.get_codes() == ['A1', '32', '33']
+    assert loaded.splits._splits == [loaded.splits[0], None, None]
+    assert loaded.to_dict()['splits'] == data['splits']
+
+
+def test_punches_keep_derived_fields_of_file():
+    result = _result([31, 32, 33])
+    for i, split in enumerate(result.splits):
+        split.index = i
+        split.course_index = i
+        split.leg_time = OTime(msec=60000)
+        split.relative_time = OTime(msec=60000 * (i + 1))
+        split.leg_place = i + 1
+        split.relative_place = 3 - i
+        split.length_leg = 200
+        split.speed = '5:00/km'
+    result.splits[0].code = 'A1'
+    data = result.to_dict()
+
+    loaded = ResultSportident()
+    loaded.update_data(data)
+    assert loaded.splits._splits == [loaded.splits[0], None, None]
+    assert loaded.to_dict()['splits'] == data['splits']
+    assert loaded.splits[2].to_dict() == data['splits'][2]
+
+    loaded.splits.add_punch(34, 36300000)
+    assert loaded.splits.to_dict()[1]['leg_place'] == 0
+    assert loaded.splits[2].leg_place == 3
+
+
+@pytest.mark.parametrize(
+    ('course', 'codes'),
+    [
+        ('31,32,33', '31,35,32,33'),
+        ('31,32,33', '31,33'),
+        ('*,*', '31,31,32'),
+        ('31,32(32,34),%', '31,34,40'),
+        ('31(31,32),33*', '32,33,33'),
+        ('', '31'),
+    ],
+)
+def test_punches_check_matches_check_splits(course, codes):
+    course = _course(course.split(',') if course else [])
+    codes = codes.split(',')
+    result = _result(codes)
+    reference = [_split(code, i) for i, code in enumerate(codes)]
+    controls = course.get_matcher().controls
+    assert result.check(course) == check_splits(controls, reference)
+    assert [(i.is_correct, i.has_penalty) for i in result.splits] == [
+        (i.is_correct, i.has_penalty) for i in reference
+    ]
+
+
+def test_result_equality_and_merge():
+    first = _result([31, 32])
+    second = _result([31, 32])
+    assert first.splits == second.splits
+    assert first == second
+    second.splits.add_punch(33, 36200000)
+    assert first != second
+
+    assert first.merge_with(second)
+    assert first.splits.get_codes() == ['31', '32', '33']
+    assert not first.merge_with(second)
+
+
+def test_punches_pickle_and_copy():
+    result = _result([31, 32, 33])
+    result.splits[1].leg_place = 2
+    for restored in (pickle.loads(pickle.dumps(result)), copy.deepcopy(result)):
+        assert restored.splits == result.splits
+        assert restored.splits[1].leg_place == 2
+        assert restored.splits[1] is not result.splits[1]
+
+    # result pickled when splits were stored as a list
+    state = result.__getstate__()
+    state['splits'] = list(state.pop('_punches'))
+    restored = ResultSportident.__new__(ResultSportident)
+    restored.__setstate__(state)
+    assert restored.splits == result.splits
+
+
+def test_punch_memory():
+    count = 30000
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        punches = Punches()
+        for i in range(count):
+            punches.add_punch(31 + i % 100, 36000000 + i * 1000)
+        stored = (tracemalloc.get_traced_memory()[0] - start) / count
+        splits = list(punches)
+        made = (tracemalloc.get_traced_memory()[0] - start) / count
+    finally:
+        tracemalloc.stop()
+    assert len(splits) == count
+    assert stored * 10 < made
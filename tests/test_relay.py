@@ -0,0 +1,88 @@
+from sportorg.common.otime import OTime
+from sportorg.models.memory import (
+    Group,
+    Person,
+    Race,
+    RaceType,
+    ResultManual,
+    ResultStatus,
+    new_event,
+    set_current_race_index,
+)
+from sportorg.models.result.result_calculation import ResultCalculation
+from sportorg.models.start.relay import get_team_result
+
+
+def _relay_race(teams=3, legs=3):
+    r = Race()
+    new_event([r])
+    set_current_race_index(0)
+    r.data.relay_leg_count = legs
+    group = Group()
+    group.name = 'M21'
+    group.set_type(RaceType.RELAY)
+    r.groups.append(group)
+    for team in range(1, teams + 1):
+        finish = OTime(0, 10)
+        for leg in range(1, legs + 1):
+            person = Person()
+            person.bib = 1000 * leg + team
+            person.group = group
+            if leg == 1:
+                person.start_time = OTime(0, 10)
+            r.persons.append(person)
+            finish = finish + OTime(0, 0, 20 + team * leg)
+            result = ResultManual()
+            result.person = person
+            result.finish_time = finish
+            r.add_new_result(result)
+    return r, group
+
+
+def _relay_values(r):
+    return [
+        (
+            i.person.bib,
+            i.get_result_relay(),
+            i.get_start_time_relay().to_msec(),
+            get_team_result(i.person).to_msec(),
+        )
+        for i in r.results
+    ]
+
+
+def test_relay_teams_indexed():
+    r, group = _relay_race()
+    r.find_person_result(r.persons[4]).status = ResultStatus.DISQUALIFIED
+    ResultCalculation(r).process_results()
+
+    team = r.find_relay_team(1)
+    assert team.bib_number == 1
+    assert [team.get_leg(i).leg for i in (1, 2, 3)] == [1, 2, 3]
+    assert team.get_leg(4) is None
+    assert team.get_correct_lap_count() == 3
+    assert team.get_time() == OTime(0, 1, 6)
+    assert r.find_relay_team(2).get_correct_lap_count() == 1
+    assert r.find_relay_team(2).place == 3
+    assert r.find_person_result(r.persons[5]).get_result_relay() == (
+        ResultStatus.DISQUALIFIED.get_title()
+    )
+
+    values = _relay_values(r)
+    r.relay_teams = []
+    assert r.find_relay_team(1) is None
+    # lookups without teams scan the persons and give the same values
+    assert [i[:3] for i in _relay_values(r)] == [i[:3] for i in values]
+
+
+def test_relay_team_cache_reset_on_new_leg():
+    r, group = _relay_race(teams=1, legs=2)
+    ResultCalculation(r).process_results()
+    team = r.find_relay_team(1)
+    assert team.get_lap_finished() == 2
+    result = ResultManual()
+    result.person = Person()
+    result.person.bib = 3001
+    team.add_result(result)
+    assert team.get_lap_finished() == 3
+    assert team.get_leg(3).get_result() is result
@@ -0,0 +1,205 @@
+import pytest
+
+from sportorg.common.otime import OTime
+from sportorg.models.constant import RankingTable
+from sportorg.models.memory import (
+    Group,
+    Person,
+    Qualification,
+    Race,
+    ResultManual,
+    ResultSortKey,
+    ResultStatus,
+    new_event,
+    set_current_race_index,
+)
+from sportorg.models.result.result_calculation import ResultCalculation
+
+
+def _race():
+    r = Race()
+    new_event([r])
+    set_current_race_index(0)
+    for name in ('M21', 'W21'):
+        group = Group()
+        group.name = name
+        r.groups.append(group)
+        for i in range(4):
+            person = Person()
+            person.bib = len(r.persons) + 1
+            person.group = group
+            person.start_time = OTime(0, 10, i)
+            r.persons.append(person)
+    return r
+
+
+def _add_result(r, person, minutes):
+    result = ResultManual()
+    result.person = person
+    result.finish_time = person.start_time + OTime(0, 0, minutes)
+    r.add_new_result(result)
+    return result
+
+
+def test_process_changed_results_only_affected_group():
+    r = _race()
+    m21, w21 = r.groups
+    _add_result(r, r.persons[0], 30)
+    w21_result = _add_result(r, r.persons[4], 40)
+    ResultCalculation(r).process_results()
+    assert w21_result.place == 1
+
+    w21_result.place = 100
+    new_result = _add_result(r, r.persons[1], 20)
+    ResultCalculation(r).process_changed_results([new_result])
+
+    assert new_result.place == 1
+    assert r.find_person_result(r.persons[0]).place == 2
+    assert r.persons[1].result_count == 1
+    assert m21.count_finished == 2
+    assert w21_result.place == 100
+
+
+def test_process_changed_results_moved_person():
+    r = _race()
+    m21, w21 = r.groups
+    first = _add_result(r, r.persons[0], 30)
+    second = _add_result(r, r.persons[1], 20)
+    ResultCalculation(r).process_results()
+    assert first.place == 2
+
+    r.persons[1].group = w21
+    ResultCalculation(r).process_changed_results([second], old_groups=[m21])
+    assert first.place == 1
+    assert second.place == 1
+    assert w21.count_finished == 1
+
+
+def test_process_changed_results_marks_calculated():
+    r = _race()
+    _add_result(r, r.persons[0], 30)
+    other = _add_result(r, r.persons[4], 40)
+    ResultCalculation(r).process_results()
+
+    result = _add_result(r, r.persons[1], 20)
+    ResultCalculation(r).process_changed_results([result])
+    assert r.calculated_version == r.get_data_version()
+
+    # results of the other group are not calculated yet
+    other.finish_time = other.finish_time + OTime(0, 0, 1)
+    result = _add_result(r, r.persons[2], 25)
+    ResultCalculation(r).process_changed_results([result])
+    assert r.calculated_version != r.get_data_version()
+
+
+def test_process_changed_results_settings_fallback():
+    r = _race()
+    result = _add_result(r, r.persons[0], 30)
+    other = _add_result(r, r.persons[4], 40)
+    ResultCalculation(r).process_results()
+
+    other.place = 100
+    r.set_setting('time_accuracy', 1)
+    ResultCalculation(r).process_changed_results([result])
+    assert other.place == 1
+
+
+def test_group_buckets_shared():
+    r = _race()
+    m21, w21 = r.groups
+    slow = _add_result(r, r.persons[0], 30)
+    fast = _add_result(r, r.persons[1], 20)
+    _add_result(r, r.persons[4], 40)
+    rc = ResultCalculation(r)
+    finishes = rc.get_group_finishes(m21)
+    assert len(finishes) == 2
+    assert finishes[0] is fast
+    assert finishes[1] is slow
+    assert rc.get_group_finishes(m21) is finishes
+    assert m21.count_finished == 2
+    assert rc.get_group_persons(w21) == r.persons[4:]
+    assert w21.count_person == 4
+
+
+@pytest.mark.parametrize('mode', ['time', 'scores'])
+def test_sort_key_matches_comparison(mode):
+    r = _race()
+    r.set_setting('result_processing_mode', mode)
+    statuses = [
+        ResultStatus.OK,
+        ResultStatus.DISQUALIFIED,
+        ResultStatus.OK,
+        ResultStatus.RESTORED,
+        ResultStatus.MISSING_PUNCH,
+        ResultStatus.OK,
+        ResultStatus.DISQUALIFIED,
+        ResultStatus.OK,
+    ]
+    for i, person in enumerate(r.persons):
+        result = _add_result(r, person, 30 + (i * 7) % 5)
+        result.status = statuses[i]
+        result.scores = i % 3
+
+    expected = sorted(r.results)
+    actual = sorted(r.results, key=ResultSortKey(r))
+    assert [id(i) for i in actual] == [id(i) for i in expected]
+
+
+def _reference_ranks(ranking, results):
+    """Rank assigning as done before thresholds were precomputed"""
+    for i in results:
+        if i.person.is_out_of_competition or not i.is_status_ok():
+            continue
+        qual_list = sorted(
+            ranking.rank.values(), reverse=True, key=lambda item: item.qual.get_score()
+        )
+        for j in qual_list:
+            if j.is_active:
+                if isinstance(i.place, int) and j.max_place >= i.place:
+                    i.assigned_rank = j.qual
+                    break
+                if j.max_time and j.max_time >= i.get_result_otime():
+                    i.assigned_rank = j.qual
+                    break
+
+
+@pytest.mark.parametrize('mode', ['time', 'scores'])
+def test_assign_ranks_matches_per_result_search(mode):
+    r = _race()
+    r.set_setting('result_processing_mode', mode)
+    m21 = r.groups[0]
+    m21.ranking.is_active = True
+    for i, person in enumerate(r.persons):
+        person.group = m21
+        result = _add_result(r, person, 30 + (i * 7) % 11)
+        result.scores = i % 3
+    r.persons[2].is_out_of_competition = True
+    r.results[3].status = ResultStatus.DISQUALIFIED
+    ranking = m21.ranking
+    ranking.rank[Qualification.KMS].is_active = True
+    ranking.rank[Qualification.KMS].max_place = 1
+    for minutes, qual in ((33, Qualification.I), (36, Qualification.II)):
+        ranking.rank[qual].use_scores = False
+        ranking.rank[qual].max_time = OTime(0, 0, minutes)
+    ranking.rank[Qualification.III].use_scores = False
+    ranking.rank[Qualification.III].max_place = 6
+
+    rc = ResultCalculation(r)
+    rc.process_results()
+    actual = [i.assigned_rank for i in r.results]
+    for i in r.results:
+        i.assigned_rank = Qualification.NOT_QUALIFIED
+    _reference_ranks(ranking, rc.get_group_finishes(m21))
+    assert actual == [i.assigned_rank for i in r.results]
+    assert len(set(actual)) > 2
+
+
+def test_ranking_table_columns():
+    table = RankingTable()
+    table.set([['1000', '136', '151', '169', '', ''], ['850', '133', '148', '166']])
+    assert table.get_qual_table(Qualification.II) == [(1000, 151), (850, 148)]
+    assert table.get_qual_table(Qualification.MS) == [[0, 0]]
+    assert table.get_qual_table(Qualification.NOT_QUALIFIED) == [[0, 0]]
+    assert ResultCalculation.get_percent_for_rank(Qualification.I, 900) == 133
+    table.set([])
+    assert table.get_qual_table(Qualification.I) == []
@@ -0,0 +1,203 @@
+import random
+
+import pytest
+
+from sportorg.common.otime import OTime
+from sportorg.models.memory import (
+    ControlPoint,
+    Course,
+    CourseControl,
+    Group,
+    Person,
+    Race,
+    ResultSportident,
+    Split,
+    new_event,
+    set_current_race_index,
+)
+from sportorg.models.result.result_checker import ControlScores, ResultChecker
+
+
+def _controls(codes):
+    ret = []
+    for code in codes.split(','):
+        control = CourseControl()
+        control.code = code.strip()
+        ret.append(control)
+    return ret
+
+
+def _splits(codes):
+    ret = []
+    for code in codes.split(',') if codes else []:
+        split = Split()
+        split.code = code.strip()
+        ret.append(split)
+    return ret
+
+
+@pytest.mark.parametrize(
+    ('origin', 'athlete', 'check_existence', 'expected'),
+    [
+        ('31,41,51', '31,41,51', False, 0),
+        ('31,41,51', '31', False, 0),
+        ('31,41,51', '41,31,51', False, 0),
+        ('31,41,51', '31,42,51', False, 1),
+        ('31,41,51', '31,41,51,52', False, 1),
+        ('31,41,51', '31,42,51,52', False, 2),
+        ('31,41,51', '31,31,41,51', False, 1),
+        ('31,41,51', '31,41,51,51', False, 1),
+        ('31,41,51', '32,42,52', False, 3),
+        ('31,41,51', '31,41,51,61,71,81,91', False, 4),
+        ('31,41,51', '31,41,52,61,71,81,91', False, 5),
+        ('31,41,51', '51,61,71,81,91,31,41', False, 4),
+        ('31,41,51', '51,61,71,81,91,32,41', False, 5),
+        ('31,41,51', '51,61,71,81,91,32,42', False, 6),
+        ('31,41,51', '52,61,71,81,91,32,42', False, 7),
+        ('31,41,51', '', False, 0),
+        ('31,41,51', '31', True, 2),
+        ('31,41,51', '', True, 3),
+        ('*,*,*', '31', True, 2),
+        ('*,*,*', '31,31', True, 1),
+        ('*,*,*', '31,31,31,31', True, 1),
+    ],
+)
+def test_penalty_calculation(origin, athlete, check_existence, expected):
+    penalty = ResultChecker.penalty_calculation(
+        _splits(athlete), _controls(origin), check_existence=check_existence
+    )
+    assert penalty == expected
+
+
+def _reference_penalty(splits, controls, check_existence=False):
+    """List based calculation, removing punches one by one"""
+    user_array = [i.code for i in splits]
+    origin_array = [i.get_number_code() for i in controls]
+    res = 0
+    if check_existence and len(user_array) < len(origin_array):
+        res = len(origin_array) - len(user_array)
+    for i in origin_array:
+        if i == '0' and len(user_array):
+            del user_array[0]
+        elif i in user_array:
+            user_array.remove(i)
+    return res + len(user_array)
+
+
+def test_penalty_calculation_matches_list_removal():
+    rnd = random.Random(5)
+    codes = ['31', '32', '33', '34', '35', '*']
+    for _ in range(500):
+        origin = ','.join(rnd.choice(codes) for _ in range(rnd.randint(1, 8)))
+        athlete = ','.join(rnd.choice(codes[:-1]) for _ in range(rnd.randint(0, 9)))
+        for check_existence in (False, True):
+            args = (_splits(athlete), _controls(origin), check_existence)
+            assert ResultChecker.penalty_calculation(*args) == _reference_penalty(*args)
+
+
+def test_calculate_penalty_all():
+    r = Race()
+    new_event([r])
+    set_current_race_index(0)
+    r.set_setting('marked_route_mode', 'laps')
+    course = Course()
+    course.controls = _controls('31,41,51')
+    r.courses.append(course)
+    named = Course()
+    named.name = '2'
+    named.controls = _controls('31,41')
+    r.courses.append(named)
+    group = Group()
+    group.course = course
+    r.groups.append(group)
+    for bib, punches in ((1, '31,42,51'), (2, '31,42,51'), (3, '31,41,51')):
+        person = Person()
+        person.bib = bib
+        person.group = group
+        r.persons.append(person)
+        result = ResultSportident()
+        result.person = person
+        result.finish_time = OTime(0, 11)
+        result.splits = _splits(punches)
+        r.add_new_result(result)
+
+    ResultChecker.calculate_penalty_all(r)
+    expected = [i.penalty_laps for i in r.results]
+    assert sorted(expected) == [0, 1, 2]
+    for result in r.results:
+        result.penalty_laps = 0
+        ResultChecker.calculate_penalty(result)
+    assert [i.penalty_laps for i in r.results] == expected
+
+
+def test_rogaine_scores():
+    r = Race()
+    new_event([r])
+    set_current_race_index(0)
+    r.set_setting('result_processing_mode', 'scores')
+    for code, score in (('31', 5), ('32', 0)):
+        control = ControlPoint()
+        control.code = code
+        control.score = score
+        r.controls.append(control)
+    group = Group()
+    r.groups.append(group)
+    person = Person()
+    person.group = group
+    r.persons.append(person)
+    result = ResultSportident()
+    result.person = person
+    result.finish_time = OTime(0, 11)
+    result.splits = _splits('31,32,31,45')
+    r.add_new_result(result)
+
+    scores = ControlScores(r)
+    assert scores.get_score(31) == 5
+    assert scores.get_score('32') == 1.0
+    ResultChecker.check_all()
+    assert result.scores == 7
+
+    r.set_setting('result_processing_score_mode', 'code')
+    assert ResultChecker.calculate_scores_rogain(result) == 5 + 3 + 4
+
+
+def test_check_all_in_worker_processes():
+    r = Race()
+    new_event([r])
+    set_current_race_index(0)
+    courses = []
+    for codes in ('31,32,33', '*,*', '31,32(32,34),%'):
+        course = Course()
+        course.controls = _controls(codes)
+        r.courses.append(course)
+        group = Group()
+        group.course = course
+        r.groups.append(group)
+        courses.append(course)
+    for i, punches in enumerate(
+        ('31,32,33', '31,33', '31,35,32,33', '31,31', '31,32', '31,34,40', '')
+    ):
+        person = Person()
+        person.bib = i + 1
+        person.group = r.groups[i % 3]
+        r.persons.append(person)
+        result = ResultSportident()
+        result.person = person
+        result.finish_time = OTime(0, 11)
+        result.splits = _splits(punches)
+        r.add_new_result(result)
+
+    ResultChecker.check_all(workers=0)
+    expected = [
+        (i.status, [(j.is_correct, j.has_penalty) for j in i.splits]) for i in r.results
+    ]
+    for result in r.results:
+        for split in result.splits:
+            split.is_correct = not split.is_correct
+
+    calls = []
+    ResultChecker.check_all(workers=2, progress=lambda *args: calls.append(args))
+    assert [
+        (i.status, [(j.is_correct, j.has_penalty) for j in i.splits]) for i in r.results
+    ] == expected
+    assert calls[-1] == (len(r.results), len(r.results))
@@ -0,0 +1,72 @@
+from sportorg.common.otime import OTime
+from sportorg.models.memory import (
+    Group,
+    Person,
+    Race,
+    ResultManual,
+    new_event,
+    set_current_race_index,
+)
+from sportorg.models.result.result_calculation import ResultCalculation
+from sportorg.models.result.score_calculation import ScoreCalculation
+
+
+def _race(minutes):
+    r = Race()
+    new_event([r])
+    set_current_race_index(0)
+    for name, times in minutes.items():
+        group = Group()
+        group.name = name
+        r.groups.append(group)
+        for i in times:
+            person = Person()
+            person.bib = len(r.persons) + 1
+            person.group = group
+            person.start_time = OTime(0, 10)
+            r.persons.append(person)
+            result = ResultManual()
+            result.person = person
+            result.finish_time = person.start_time + OTime(0, 0, i)
+            r.add_new_result(result)
+    return r
+
+
+def test_formula_scores_use_group_leader():
+    r = _race({'M21': [30, 40, 60], 'W21': [50, 100]})
+    r.set_setting('scores_mode', 'formula')
+    r.set_setting('scores_formula', '100 * leader // time')
+    rc = ResultCalculation(r)
+    rc.process_results()
+    ScoreCalculation(r, rc).calculate_scores()
+    scores = {
+        (i.person.group.name, i.get_result_otime().to_minute()): i.scores
+        for i in r.results
+    }
+    assert scores == {
+        ('M21', 30): 100,
+        ('M21', 40): 75,
+        ('M21', 60): 50,
+        ('W21', 50): 100,
+        ('W21', 100): 50,
+    }
+
+
+def test_wrong_formula():
+    r = _race({'M21': [30, 40]})
+    r.set_setting('scores_mode', 'formula')
+    r.set_setting('scores_formula', 'leader +')
+    ResultCalculation(r).process_results()
+    calculation = ScoreCalculation(r)
+    calculation.calculate_scores()
+    assert calculation.wrong_formula
+    assert [i.scores for i in r.results] == [0, 0]
+
+
+def test_array_scores():
+    r = _race({'M21': [30, 40, 50]})
+    r.set_setting('scores_mode', 'array')
+    r.set_setting('scores_array', '10,5')
+    ResultCalculation(r).process_results()
+    ScoreCalculation(r).calculate_scores()
+    assert sorted(i.scores for i in r.results) == [5, 5, 10]
@@ -0,0 +1,151 @@
+import random
+
+from sportorg.common.otime import OTime
+from sportorg.models.memory import (
+    Course,
+    CourseControl,
+    Group,
+    Person,
+    Race,
+    ResultSportident,
+    Split,
+    new_event,
+    set_current_race_index,
+)
+from sportorg.models.result.result_calculation import ResultCalculation
+from sportorg.models.result.result_checker import ResultChecker
+from sportorg.models.result.split_calculation import GroupSplits, RaceSplits
+
+
+def _race(persons=60, controls=8, seed=1):
+    rnd = random.Random(seed)
+    r = Race()
+    new_event([r])
+    set_current_race_index(0)
+    course = Course()
+    for i in range(controls):
+        control = CourseControl()
+        control.code = str(31 + i)
+        course.controls.append(control)
+    r.courses.append(course)
+    group = Group()
+    group.name = 'M21'
+    group.course = course
+    r.groups.append(group)
+    for i in range(persons):
+        person = Person()
+        person.bib = i + 1
+        person.group = group
+        person.start_time = OTime(0, 10)
+        r.persons.append(person)
+        result = ResultSportident()
+        result.person = person
+        time = person.start_time
+        for j in range(rnd.randint(controls - 2, controls)):
+            # whole minutes to get a lot of equal times
+            time = time + OTime(0, 0, rnd.randint(1, 4))
+            split = Split()
+            split.code = str(31 + j)
+            split.time = time
+            split.is_correct = rnd.random() > 0.05
+            result.splits.append(split)
+        result.finish_time = time + OTime(0, 0, 1)
+        r.add_new_result(result)
+    return r, group
+
+
+def _reference_places(splits):
+    """Places calculated control by control with sorting as before the matrix"""
+    for i in range(splits.cp_count):
+        splits.sort_by_leg(i)
+        splits.set_places_for_leg(i)
+        splits.set_leg_leader(i, splits.person_splits[0])
+        splits.sort_by_leg(i, relative=True)
+        splits.set_places_for_leg(i, relative=True)
+
+
+def _snapshot(r, splits):
+    legs = []
+    for result in r.results:
+        for split in result.splits:
+            leader_time = getattr(split, 'leader_time', None)
+            legs.append(
+                (
+                    split.leg_place,
+                    split.relative_place,
+                    leader_time.to_msec() if leader_time else None,
+                )
+            )
+            split.leg_place = split.relative_place = 0
+            split.leader_time = None
+    order = [id(i.result) for i in splits.person_splits]
+    return legs, order, dict(splits.leader)
+
+
+def test_split_matrix_places_match_sorting():
+    r, group = _race()
+    splits = GroupSplits(r, group)
+    splits.set_places = lambda: _reference_places(splits)
+    splits.generate()
+    expected = _snapshot(r, splits)
+
+    splits = GroupSplits(r, group, ResultCalculation(r)).generate()
+    assert _snapshot(r, splits) == expected
+
+
+def test_split_matrix_tied_leg_places():
+    r, group = _race(persons=3, controls=1)
+    for result in r.results:
+        split = Split()
+        split.code = '31'
+        split.time = OTime(0, 10, 5)
+        result.splits = [split]
+    r.results[2].splits[0].time = OTime(0, 10, 3)
+    GroupSplits(r, group).generate()
+    assert [i.splits[0].leg_place for i in r.results] == [2, 2, 1]
+    assert r.results[0].splits[0].leader_time == OTime(0, 0, 3)
+
+
+def test_group_splits_cached_until_group_changed():
+    r, group = _race(persons=5, controls=3)
+    ResultCalculation(r).process_results()
+    splits = GroupSplits.get(r, group)
+    version = r.get_group_version(group)
+
+    rc = ResultCalculation(r)
+    rc.process_results()
+    assert GroupSplits.get(r, group, rc) is splits
+    assert r.get_group_version(group) == version
+
+    r.results[0].splits[0].time = r.results[0].splits[0].time + OTime(msec=1000)
+    ResultChecker.checking(r.results[0])
+    changed = GroupSplits.get(r, group)
+    assert changed is not splits
+    assert r.get_group_version(group) == version + 1
+
+    r.persons[0].name = 'Leader'
+    renamed = GroupSplits.get(r, group)
+    assert renamed is not changed
+
+    group.course.controls[0].code = '99'
+    assert GroupSplits.get(r, group) is not renamed
+
+
+def test_group_splits_generated_after_check():
+    r, group = _race(persons=20, controls=3)
+    # statuses are not changed by the next check
+    r.results = [i for i in r.results if len(i.splits) == 3]
+    ResultChecker.check_all()
+    rc = ResultCalculation(r)
+    rc.process_results()
+    RaceSplits(r, rc).generate()
+    indexes = [[i.course_index for i in result.splits] for result in r.results]
+    assert any(i >= 0 for row in indexes for i in row)
+
+    ResultChecker.check_all()
+    rc = ResultCalculation(r)
+    rc.process_results()
+    RaceSplits(r, rc).generate()
+    assert [[i.course_index for i in result.splits] for result in r.results] == (
+        indexes
+    )